@@ -0,0 +1,80 @@
+import os
+import glob
+import time
+import argparse
+import statistics
+from pipeline.html_parsing import available_parser_backends, CONTENT_CLASSES, CONTENT_STRAINER
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None  # selectolax is optional; it is only benchmarked when installed
+
+# Constants
+EXPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports')
+DEFAULT_REPEAT = 3  # Parses per file; the fastest one is kept
+
+def build_parsers():
+    """Return (name, parse function) for every installed backend, full and strained"""
+    parsers = []
+    for backend in available_parser_backends():
+        parsers.append((backend, lambda content, backend=backend: BeautifulSoup(content, backend)))
+        parsers.append((f"{backend} + strainer", lambda content, backend=backend: BeautifulSoup(content, backend, parse_only=CONTENT_STRAINER)))
+    if HTMLParser is not None:
+        selector = ", ".join(f".{name}" for name in CONTENT_CLASSES)
+        parsers.append(("selectolax", lambda content: HTMLParser(content).css(selector)))
+    return parsers
+
+def time_parser(parse, contents, repeat):
+    """Return the best-of-`repeat` parse time in seconds for each document"""
+    times = []
+    for content in contents:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse(content)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best)
+    return times
+
+def benchmark_directory(html_dir, parsers, limit, repeat):
+    """Print per-file parse times for one exported HTML set"""
+    files = sorted(glob.glob(os.path.join(html_dir, "*.html")))
+    if limit is not None:
+        files = files[:limit]
+    if not files:
+        print(f"No HTML files found in {html_dir}")
+        return
+    
+    contents = []
+    for file_path in files:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            contents.append(f.read())
+    
+    print(f"\n{os.path.basename(html_dir)}: {len(files)} files, {sum(len(c) for c in contents) / len(contents) / 1024:.1f} KB average")
+    print(f"{'Backend':<24}{'Mean ms/file':>14}{'Median ms/file':>16}{'Files/sec':>12}{'Speedup':>10}")
+    
+    baseline = None
+    for name, parse in parsers:
+        times = time_parser(parse, contents, repeat)
+        mean = statistics.mean(times)
+        baseline = baseline or mean
+        print(f"{name:<24}{mean * 1000:>14.2f}{statistics.median(times) * 1000:>16.2f}{1 / mean:>12.1f}{baseline / mean:>9.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare per-file HTML parse time across parser backends on the exported HTML sets.')
+    parser.add_argument('html_dirs', nargs='*', help='Directories of exported HTML (default: every exports/html_* directory)')
+    parser.add_argument('--limit', type=int, help='Only parse the first N files of each directory')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Parses per file; the fastest is reported')
+    args = parser.parse_args()
+    
+    html_dirs = args.html_dirs or sorted(d for d in glob.glob(os.path.join(EXPORTS_DIR, 'html_*')) if os.path.isdir(d))
+    parsers = build_parsers()
+    print(f"Backends: {', '.join(name for name, _ in parsers)}")
+    if HTMLParser is None:
+        print("selectolax is not installed; skipping it (pip install selectolax)")
+    
+    for html_dir in html_dirs:
+        benchmark_directory(html_dir, parsers, args.limit, args.repeat)
@@ -0,0 +1,199 @@
+import io
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import contextlib
+import requests
+from runPipeline import DATASETS, build_dataset
+from pipeline.engine import PipelineEngine
+from pipeline.ollama_client import OllamaClient
+from pipeline.adaptive_concurrency import AdaptiveConcurrency, percentile
+from pipeline.prompt_templates import PROMPT_MODES
+
+# Constants
+MOCK_SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mockOllamaServer.py')
+MOCK_STARTUP_TIMEOUT = 10  # Seconds to wait for the mock server to answer
+STAGES = ["parse", "llm", "write", "checkpoint"]
+
+class StageTimer:
+    """Collects call durations per pipeline stage, from any thread"""
+    
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self._lock = threading.Lock()
+    
+    def wrap(self, stage, func):
+        """Return func timed under `stage`"""
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.samples[stage].append(elapsed)
+        return timed
+    
+    def summary(self):
+        """Return {stage: {calls, total, mean_ms, p95_ms}}"""
+        result = {}
+        with self._lock:
+            for stage, samples in self.samples.items():
+                if not samples:
+                    continue
+                result[stage] = {
+                    "calls": len(samples),
+                    "total": sum(samples),
+                    "mean_ms": sum(samples) / len(samples) * 1000,
+                    "p95_ms": percentile(samples, 95) * 1000
+                }
+        return result
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_mock_process(args):
+    """Run mockOllamaServer.py in its own process so it does not compete with the pipeline for the GIL"""
+    port = free_port()
+    command = [sys.executable, MOCK_SERVER_SCRIPT, "--port", str(port), "--latency", str(args.latency),
+               "--tokens-per-second", str(args.tokens_per_second), "--broken-rate", str(args.broken_rate), "--seed", "0"]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + MOCK_STARTUP_TIMEOUT
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/tags", timeout=1).status_code == 200:
+                return process, f"http://127.0.0.1:{port}/api/generate"
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Mock Ollama server did not start")
+
+def run_benchmark(args, work_dir):
+    """Run one dataset against the mock server with every stage timed; return the measurements"""
+    dataset = build_dataset(args.dataset)
+    if args.html_dir:
+        dataset.html_dir = args.html_dir
+    if args.prompt:
+        dataset.prompt_templates.mode = args.prompt
+    # Keep outputs and checkpoints away from the real exports so every run starts from scratch
+    dataset.output_dir = os.path.join(work_dir, "output")
+    dataset.checkpoint_file = os.path.join(work_dir, "checkpoint.json")
+    dataset.error_log_file = os.path.join(work_dir, "errors.log")
+    dataset.manifest_file = os.path.join(work_dir, "manifest.jsonl")
+    dataset.timings_file = os.path.join(work_dir, "timings.jsonl")
+    if dataset.results_stream_file:
+        dataset.results_stream_file = os.path.join(dataset.output_dir, "all_processed_questions.jsonl")
+        dataset.legacy_results_file = None
+    
+    timer = StageTimer()
+    dataset.load = timer.wrap("parse", dataset.load)
+    
+    process, client = None, None
+    if dataset.uses_llm:
+        process, url = start_mock_process(args)
+        client = OllamaClient(url, pool_size=max(args.concurrency, 4))
+        client.use_streaming(args.stream)
+        # A fixed limit, so the numbers measure the pipeline rather than the controller's ramp-up
+        client.use_concurrency_controller(AdaptiveConcurrency(max_limit=args.concurrency, min_limit=args.concurrency, initial=args.concurrency))
+    
+    engine = PipelineEngine(dataset, client=client, concurrency=args.concurrency, structured=args.structured)
+    if dataset.uses_llm:
+        engine.generate = timer.wrap("llm", engine.generate)
+    engine.save_result = timer.wrap("write", engine.save_result)
+    engine.finish_item = timer.wrap("checkpoint", engine.finish_item)
+    
+    log = io.StringIO()
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log if not args.verbose else sys.stdout):
+            stats = engine.run(limit=args.limit)
+    finally:
+        wall = time.perf_counter() - started
+        if client is not None:
+            client.close()
+        if process is not None:
+            process.terminate()
+            process.wait()
+    
+    return {
+        "dataset": args.dataset,
+        "concurrency": args.concurrency,
+        "latency": args.latency,
+        "stream": args.stream,
+        "structured": args.structured,
+        "prompt": dataset.prompt_templates.mode,
+        "items": stats["items"],
+        "failed": stats["failed"],
+        "wall_seconds": wall,
+        "items_per_second": stats["items"] / wall if wall > 0 else 0,
+        "stages": timer.summary()
+    }
+
+def print_report(result, baseline=None):
+    """Print throughput and per-stage timings, with the change against a baseline run if given"""
+    print(f"\nPipeline benchmark: {result['dataset']} (concurrency {result['concurrency']}, mock latency {result['latency']}s"
+          f"{', streaming' if result['stream'] else ''}{', structured' if result['structured'] else ''}, {result['prompt']} prompt)")
+    print(f"Items saved: {result['items']} ({result['failed']} failed) in {result['wall_seconds']:.2f} seconds")
+    line = f"Throughput: {result['items_per_second']:.2f} items/sec"
+    if baseline and baseline.get("items_per_second"):
+        line += f" ({(result['items_per_second'] / baseline['items_per_second'] - 1) * 100:+.1f}% vs baseline)"
+    print(line)
+    
+    print(f"\n{'Stage':<12}{'Calls':>8}{'Total s':>10}{'Mean ms':>10}{'p95 ms':>10}{'Baseline ms':>13}")
+    for stage in STAGES:
+        timing = result["stages"].get(stage)
+        if timing is None:
+            continue
+        base = (baseline or {}).get("stages", {}).get(stage)
+        base_text = f"{base['mean_ms']:.2f}" if base else "-"
+        print(f"{stage:<12}{timing['calls']:>8}{timing['total']:>10.3f}{timing['mean_ms']:>10.2f}{timing['p95_ms']:>10.2f}{base_text:>13}")
+    
+    # Everything but the model wait is Python-side cost
+    python_seconds = sum(t["total"] for stage, t in result["stages"].items() if stage != "llm")
+    llm = result["stages"].get("llm")
+    if llm:
+        llm_overhead_ms = llm["mean_ms"] - result["latency"] * 1000
+        print(f"\nLLM stage beyond the mock latency: {llm_overhead_ms:.2f} ms per call (HTTP, JSON decoding, prompt building)")
+    if result["items"]:
+        print(f"Parse + write + checkpoint: {python_seconds / result['items'] * 1000:.2f} ms per item")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure pipeline throughput and per-stage timings against a mock Ollama server.')
+    parser.add_argument('--dataset', choices=sorted(DATASETS), default='specific', help='Dataset to run (default: specific, the processWithMistral_sequential.py set)')
+    parser.add_argument('--html-dir', help='Read the HTML from this directory instead of the dataset\'s export directory')
+    parser.add_argument('--limit', type=int, default=None, help='Limit the number of files to process')
+    parser.add_argument('--concurrency', type=int, default=1, help='Ollama requests in flight')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mock latency per request in seconds (0 measures pure pipeline overhead)')
+    parser.add_argument('--tokens-per-second', type=float, default=0, help='Mock generation speed (0 sends all tokens at once)')
+    parser.add_argument('--broken-rate', type=float, default=0.0, help='Fraction of mock responses that are broken JSON or prose')
+    parser.add_argument('--stream', action='store_true', help='Stream generations and stop at the closing brace')
+    parser.add_argument('--structured', action='store_true', help='Send the response JSON schema as `format`')
+    parser.add_argument('--prompt', choices=PROMPT_MODES, help='Prompt template to send (default: the dataset script\'s PROMPT_TEMPLATE)')
+    parser.add_argument('--json', help='Write the measurements to this JSON file')
+    parser.add_argument('--baseline', help='Compare against measurements written earlier with --json')
+    parser.add_argument('--verbose', action='store_true', help='Show the pipeline\'s own output')
+    args = parser.parse_args()
+    
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    
+    with tempfile.TemporaryDirectory(prefix="pipeline_benchmark_") as work_dir:
+        result = run_benchmark(args, work_dir)
+    print_report(result, baseline)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nMeasurements written to {args.json}")
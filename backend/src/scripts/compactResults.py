@@ -0,0 +1,28 @@
+import os
+import argparse
+from pipeline.results_stream import compact_results
+
+# Constants
+STREAM_FILE_NAME = "all_processed_questions.jsonl"
+COMPACT_FILE_NAME = "all_processed_questions.json"
+
+def compact_directory(output_dir, key):
+    """Compact the results stream in one output directory"""
+    jsonl_path = os.path.join(output_dir, STREAM_FILE_NAME)
+    json_path = os.path.join(output_dir, COMPACT_FILE_NAME)
+    
+    if not os.path.exists(jsonl_path):
+        print(f"No results stream found at {jsonl_path}")
+        return
+    
+    count = compact_results(jsonl_path, json_path, key=key)
+    print(f"Wrote {count} results to {json_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compact all_processed_questions.jsonl streams into all_processed_questions.json arrays.')
+    parser.add_argument('output_dirs', nargs='+', help='Output directories written by the processing scripts')
+    parser.add_argument('--key', default='question_number', help='Field identifying a result; the latest line per key wins')
+    args = parser.parse_args()
+    
+    for output_dir in args.output_dirs:
+        compact_directory(output_dir, args.key)
@@ -0,0 +1,94 @@
+import os
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pipeline.passage_store import PassageStore, PASSAGES_DIR_NAME, RECORD_PATTERN
+
+# Constants
+EXPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports')
+DEFAULT_REPEAT = 3  # Timed writes per layout in --benchmark; the fastest one is kept
+
+def directory_bytes(output_dir):
+    """Size of the question records and shared passages of an RC output directory"""
+    paths = glob.glob(os.path.join(output_dir, RECORD_PATTERN)) + glob.glob(os.path.join(output_dir, PASSAGES_DIR_NAME, "*.json"))
+    return sum(os.path.getsize(path) for path in paths)
+
+def write_embedded(output_dir, records):
+    """Write records the way the RC scripts always have, one indented file per question"""
+    for file_name, record in records:
+        with open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+
+def write_shared(output_dir, records):
+    store = PassageStore(output_dir)
+    for file_name, record in records:
+        store.save(os.path.join(output_dir, file_name), record)
+
+def time_layout(write, records, repeat):
+    """Best-of-`repeat` seconds to write all records into a fresh directory, and the bytes written"""
+    best = None
+    size = 0
+    for _ in range(repeat):
+        output_dir = tempfile.mkdtemp(prefix="rc_layout_")
+        try:
+            start = time.perf_counter()
+            write(output_dir, records)
+            elapsed = time.perf_counter() - start
+            size = directory_bytes(output_dir)
+        finally:
+            shutil.rmtree(output_dir)
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+def benchmark(output_dir, repeat):
+    """Compare the disk use and write time of both layouts on an output directory's records"""
+    store = PassageStore(output_dir)
+    records = [(os.path.basename(path), record) for path, record in store.iter_records()]
+    if not records:
+        print(f"No RC records found in {output_dir}")
+        return
+    passages = len({record.get("passage_text") for _, record in records})
+    embedded_seconds, embedded_bytes = time_layout(write_embedded, records, repeat)
+    shared_seconds, shared_bytes = time_layout(write_shared, records, repeat)
+    print(f"\n{os.path.basename(os.path.normpath(output_dir))}: {len(records)} questions over {passages} passages")
+    print(f"  {'Layout':<12}{'KB':>10}{'Write ms':>10}{'ms/record':>11}")
+    for layout, size, seconds in (("embedded", embedded_bytes, embedded_seconds), ("shared", shared_bytes, shared_seconds)):
+        print(f"  {layout:<12}{size / 1024:>10.1f}{seconds * 1000:>10.1f}{seconds * 1000 / len(records):>11.3f}")
+    print(f"  Shared layout saves {(1 - shared_bytes / max(embedded_bytes, 1)) * 100:.1f}% of the disk space and {(1 - shared_seconds / embedded_seconds) * 100:.1f}% of the write time")
+
+def convert(output_dir, expand):
+    """Rewrite an output directory's records in the shared layout, or back to embedded passages with `expand`"""
+    store = PassageStore(output_dir)
+    before = directory_bytes(output_dir)
+    start = time.perf_counter()
+    count = 0
+    for file_path, record in store.iter_records():
+        if expand:
+            write_embedded(output_dir, [(os.path.basename(file_path), record)])
+        else:
+            store.save(file_path, record)
+        count += 1
+    if expand and os.path.isdir(store.passages_dir):
+        shutil.rmtree(store.passages_dir)
+    print(f"{output_dir}: rewrote {count} records in {time.perf_counter() - start:.2f} seconds, {before / 1024:.1f} KB -> {directory_bytes(output_dir) / 1024:.1f} KB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert RC output directories between embedded passages and the shared passage layout, or compare the two.')
+    parser.add_argument('output_dirs', nargs='*', help='RC output directories (default: every exports/processed_rc_* directory)')
+    parser.add_argument('--expand', action='store_true', help='Convert back to one self-contained file per question and remove the passages directory')
+    parser.add_argument('--benchmark', action='store_true', help='Only measure disk use and write time of both layouts in a temporary directory')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timed writes per layout with --benchmark')
+    args = parser.parse_args()
+    
+    output_dirs = args.output_dirs or sorted(path for path in glob.glob(os.path.join(EXPORTS_DIR, 'processed_rc_*')) if os.path.isdir(path))
+    if not output_dirs:
+        print(f"No RC output directories found under {EXPORTS_DIR}")
+    
+    for output_dir in output_dirs:
+        if args.benchmark:
+            benchmark(output_dir, args.repeat)
+        else:
+            convert(output_dir, args.expand)
@@ -0,0 +1,48 @@
+import os
+import time
+import argparse
+from runPipeline import DATASETS, RESULTS_DB_FILE, build_dataset
+from pipeline.results_store import ResultsStore
+
+def print_datasets(counts):
+    """Print the records, attempts and errors stored per dataset"""
+    print(f"{'Dataset':<24}{'Valid':>8}{'Invalid':>9}{'Attempts':>10}{'Errors':>8}")
+    for dataset in sorted(counts):
+        row = counts[dataset]
+        print(f"{dataset:<24}{row['valid']:>8}{row['invalid']:>9}{row['attempts']:>10}{row['errors']:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export results stored with runPipeline.py --results-db to the usual one-JSON-file-per-item layout.')
+    parser.add_argument('--db', default=RESULTS_DB_FILE, help='Results database to read')
+    parser.add_argument('--datasets', nargs='+', default=None, help='Datasets to export (default: every dataset in the database)')
+    parser.add_argument('--output-dir', default=None, help='Directory to write to when exporting a single dataset (default: the dataset\'s output directory)')
+    parser.add_argument('--list', action='store_true', help='Only list the datasets in the database with their record, attempt and error counts')
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found; run runPipeline.py with --results-db first")
+    store = ResultsStore(args.db)
+    counts = store.datasets()
+    if args.list:
+        print_datasets(counts)
+        store.close()
+        raise SystemExit(0)
+    
+    datasets = args.datasets or sorted(counts)
+    if args.output_dir is not None and len(datasets) != 1:
+        parser.error("--output-dir needs exactly one dataset")
+    for name in datasets:
+        if name not in counts:
+            print(f"No records for {name} in {args.db}")
+            continue
+        if args.output_dir is not None:
+            output_dir = args.output_dir
+        elif name in DATASETS:
+            output_dir = build_dataset(name).output_dir
+        else:
+            print(f"Unknown dataset {name}; pass --datasets {name} --output-dir <dir> to export it")
+            continue
+        started = time.time()
+        count = store.export(name, output_dir)
+        print(f"{name}: wrote {count} records to {output_dir} in {time.time() - started:.2f} seconds ({counts[name]['invalid']} invalid records not exported)")
+    store.close()
@@ -0,0 +1,73 @@
+import os
+import glob
+import time
+import argparse
+from runPipeline import DATASETS, NEAR_DUPLICATES_FILE, build_dataset
+from pipeline.near_duplicates import NearDuplicateIndex, write_cluster_report, SIMILARITY_THRESHOLD
+from pipeline.html_parsing import PARSER_BACKENDS, DEFAULT_PARSER_BACKEND, set_parser_backend
+
+# Constants
+DEFAULT_SOURCES = ["specific_og", "specific", "specific_exampacks", "cr_ogquestions", "cr_gmatprep"]  # Earlier sources provide the representative
+SHOW_CLUSTERS = 20  # Largest clusters printed with their members
+
+def index_source(index, name):
+    """Add every question of one dataset to the index and return how many were added"""
+    dataset = build_dataset(name)
+    if dataset.dedup_text is None:
+        raise ValueError(f"Dataset {name} has more than one question per file and cannot be indexed")
+    html_files = sorted(glob.glob(os.path.join(dataset.html_dir, dataset.file_pattern)))
+    added = 0
+    for file_path in html_files:
+        try:
+            question_data = dataset.load(file_path)
+        except Exception as e:
+            print(f"Error loading {file_path}: {str(e)}")
+            continue
+        if question_data:
+            index.add(f"{name}/{os.path.basename(file_path)}", dataset.dedup_text(question_data), dataset.dedup_group)
+            added += 1
+    print(f"{name}: {added} questions from {dataset.html_dir}")
+    return added
+
+def print_report(clusters, questions, show):
+    """Print cluster counts, the LLM calls a deduplicated run saves and the largest clusters"""
+    duplicates = sum(len(cluster["members"]) - 1 for cluster in clusters)
+    cross_source = sum(1 for cluster in clusters if len({member["key"].split("/", 1)[0] for member in cluster["members"]}) > 1)
+    print(f"\nNear-duplicate clusters: {len(clusters)} ({cross_source} spanning more than one source)")
+    print(f"Questions in clusters: {duplicates + len(clusters)} of {questions}")
+    print(f"LLM calls saved with --dedup: {duplicates} ({duplicates / max(questions, 1) * 100:.1f}% of all questions)")
+    for cluster in clusters[:show]:
+        print(f"\nCluster {cluster['id']} ({len(cluster['members'])} questions), representative {cluster['representative']}")
+        for member in cluster["members"][1:]:
+            print(f"  {member['key']:<50} similarity {member['similarity']:.3f}")
+    if len(clusters) > show:
+        print(f"\n... {len(clusters) - show} more clusters")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Group near-duplicate questions across the exported sources with MinHash/LSH and write the clusters for runPipeline.py --dedup.')
+    parser.add_argument('--sources', nargs='+', choices=sorted(DATASETS), default=DEFAULT_SOURCES, help='Datasets to index; the representative of a cluster comes from the earliest one listed')
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD, help='Word-shingle Jaccard similarity at which two questions count as duplicates')
+    parser.add_argument('--output', default=NEAR_DUPLICATES_FILE, help='Where to write the cluster report')
+    parser.add_argument('--show', type=int, default=SHOW_CLUSTERS, help='Number of largest clusters to print')
+    parser.add_argument('--html-parser', choices=PARSER_BACKENDS, default=DEFAULT_PARSER_BACKEND, help='BeautifulSoup tree builder used to parse the exported HTML')
+    args = parser.parse_args()
+    
+    try:
+        set_parser_backend(args.html_parser)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    start_time = time.time()
+    index = NearDuplicateIndex(threshold=args.threshold)
+    questions = 0
+    for name in args.sources:
+        try:
+            questions += index_source(index, name)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    clusters = index.clusters(source_order=args.sources)
+    write_cluster_report(args.output, clusters, args.sources, args.threshold, questions)
+    print_report(clusters, questions, args.show)
+    print(f"\nCompared {index.candidates} candidate pairs in {time.time() - start_time:.2f} seconds")
+    print(f"Cluster report saved to {args.output}")
@@ -0,0 +1,219 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Defaults for the mock server
+DEFAULT_PORT = 11434
+DEFAULT_LATENCY = 0.05  # Seconds before the first token (prompt evaluation)
+DEFAULT_TOKENS_PER_SECOND = 0  # Generation speed; 0 sends every token at once
+MODEL_LOAD_DURATION = 2_000_000  # Nanoseconds reported as load_duration; the model is always loaded already
+CHARS_PER_TOKEN = 4  # Rough token size used for counts and streaming chunks
+BROKEN_KINDS = ["truncated", "prose", "missing_keys", "invalid_json"]
+
+# Canned text for every field the scripts ask for
+CANNED_FIELDS = {
+    "question": "What is the value of x?",
+    "question_text": "Which of the following best describes the main idea of the passage?",
+    "argument": "The city council argues that the new park will reduce crime.",
+    "question_stem": "Which of the following, if true, most seriously weakens the argument?",
+    "explanation": "Option B follows directly from the information given, while the other options do not.",
+    "question_type": "Problem Solving",
+    "rc_specific_type": "Main Idea",
+    "cr_specific_type": "Weaken"
+}
+CANNED_OPTIONS = {letter: f"Option {letter} text" for letter in "ABCDE"}
+CANNED_ANSWER = "B"
+TRAILING_TEXT = "\n\nI hope this helps! Let me know if you have any other questions about this problem."
+
+def canned_record(question_number=None):
+    """A response record carrying every field any of the scripts expects"""
+    record = dict(CANNED_FIELDS, options=dict(CANNED_OPTIONS), correct_answer=CANNED_ANSWER)
+    if question_number is not None:
+        record["question_number"] = question_number
+    return record
+
+def value_for_schema(schema, key, question_numbers):
+    """Build a value that satisfies the schema subset used for Ollama's `format`"""
+    schema_type = schema.get("type")
+    if "enum" in schema:
+        return CANNED_ANSWER if CANNED_ANSWER in schema["enum"] else schema["enum"][0]
+    if schema_type == "object":
+        return {name: value_for_schema(sub, name, question_numbers) for name, sub in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        item_schema = schema.get("items", {})
+        values = []
+        for number in question_numbers or [1]:
+            value = value_for_schema(item_schema, key, [number])
+            if isinstance(value, dict) and "question_number" in value:
+                value["question_number"] = number
+            values.append(value)
+        return values
+    if schema_type == "integer":
+        return question_numbers[0] if question_numbers else 1
+    if key in CANNED_OPTIONS:
+        return CANNED_OPTIONS[key]
+    return CANNED_FIELDS.get(key, f"Mock {key}")
+
+def build_response(payload, broken_kind=None):
+    """Return the generated text for a payload: schema-shaped with `format`, canned JSON plus chatter otherwise"""
+    prompt = payload.get("prompt", "")
+    question_numbers = [int(n) for n in re.findall(r"Question #(\d+):", prompt)]
+    schema = payload.get("format")
+    if isinstance(schema, dict):
+        data = value_for_schema(schema, None, question_numbers)
+    elif '"questions": [' in prompt:
+        data = {"questions": [canned_record(number) for number in question_numbers or [1]]}
+    else:
+        data = canned_record()
+    
+    if broken_kind == "missing_keys":
+        target = data["questions"][0] if "questions" in data and data["questions"] else data
+        for key in ("explanation", "correct_answer"):
+            target.pop(key, None)
+    text = json.dumps(data, indent=2)
+    if broken_kind == "truncated":
+        text = text[:len(text) // 2]
+    elif broken_kind == "prose":
+        text = "The correct answer is B because it follows directly from the passage."
+    elif broken_kind == "invalid_json":
+        text = text.replace('",\n', '"\n', 1)
+    
+    # Real models rarely stop at the closing brace unless constrained by `format`
+    if schema is None and broken_kind is None:
+        text += TRAILING_TEXT
+    return text
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate (streaming and not) and /api/tags like a local Ollama"""
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def send_json(self, status, body):
+        out = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+    
+    def do_GET(self):
+        if self.path.rstrip("/") == "/api/tags":
+            self.send_json(200, {"models": [{"name": "mistral:7b"}]})
+        else:
+            self.send_json(404, {"error": "not found"})
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": "invalid request body"})
+            return
+        if self.path.rstrip("/") != "/api/generate":
+            self.send_json(404, {"error": "not found"})
+            return
+        
+        config = self.server.config
+        stats = self.server.stats
+        with self.server.lock:
+            stats["requests"] += 1
+            roll = self.server.random.random()
+            fail = roll < config["error_rate"]
+            broken_kind = None
+            if fail:
+                stats["errors"] += 1
+            elif roll < config["error_rate"] + config["broken_rate"]:
+                broken_kind = self.server.random.choice(BROKEN_KINDS)
+                stats["broken"] += 1
+        
+        time.sleep(config["latency"])
+        if fail:
+            self.send_json(500, {"error": "mock server error"})
+            return
+        
+        text = build_response(payload, broken_kind)
+        num_predict = payload.get("options", {}).get("num_predict")
+        if num_predict is not None and num_predict >= 0:
+            text = text[:num_predict * CHARS_PER_TOKEN]
+        prompt_tokens = max(len(payload.get("prompt", "")) // CHARS_PER_TOKEN, 1)
+        metrics = {
+            "model": payload.get("model"),
+            "done": True,
+            "done_reason": "stop",
+            "context": list(range(prompt_tokens)),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(config["latency"] * 1e9),
+            "load_duration": MODEL_LOAD_DURATION
+        }
+        
+        tokens = [text[i:i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+        token_delay = 1.0 / config["tokens_per_second"] if config["tokens_per_second"] > 0 else 0
+        if payload.get("stream", True):
+            self.stream_tokens(payload, tokens, token_delay, metrics)
+            return
+        
+        time.sleep(token_delay * len(tokens))
+        self.send_json(200, dict(metrics, response=text, eval_count=len(tokens), eval_duration=int(token_delay * len(tokens) * 1e9),
+                                 total_duration=int((config["latency"] + token_delay * len(tokens)) * 1e9)))
+    
+    def stream_tokens(self, payload, tokens, token_delay, metrics):
+        """Send NDJSON chunks one token at a time, like Ollama with stream=true"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        started = time.time()
+        try:
+            for token in tokens:
+                self.write_chunk({"model": payload.get("model"), "response": token, "done": False})
+                if token_delay:
+                    time.sleep(token_delay)
+            elapsed = time.time() - started
+            self.write_chunk(dict(metrics, response="", eval_count=len(tokens), eval_duration=int(elapsed * 1e9),
+                                  total_duration=metrics["prompt_eval_duration"] + int(elapsed * 1e9)))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early (for instance once its JSON object was complete)
+            with self.server.lock:
+                self.server.stats["cancelled"] += 1
+    
+    def write_chunk(self, body):
+        data = json.dumps(body).encode() + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+def start_mock_server(port=0, latency=DEFAULT_LATENCY, tokens_per_second=DEFAULT_TOKENS_PER_SECOND, broken_rate=0.0, error_rate=0.0, seed=None):
+    """Start the mock server on a daemon thread and return it; port=0 picks a free port (see server.server_port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockOllamaHandler)
+    server.daemon_threads = True
+    server.config = {"latency": latency, "tokens_per_second": tokens_per_second, "broken_rate": broken_rate, "error_rate": error_rate}
+    server.stats = {"requests": 0, "broken": 0, "errors": 0, "cancelled": 0}
+    server.lock = threading.Lock()
+    server.random = random.Random(seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a mock Ollama server that answers /api/generate with canned question JSON.')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY, help='Seconds before the first token of every response')
+    parser.add_argument('--tokens-per-second', type=float, default=DEFAULT_TOKENS_PER_SECOND, help='Generation speed (0 sends all tokens at once)')
+    parser.add_argument('--broken-rate', type=float, default=0.0, help='Fraction of responses that are truncated, prose, missing keys or invalid JSON')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for broken and failed responses')
+    args = parser.parse_args()
+    
+    server = start_mock_server(args.port, args.latency, args.tokens_per_second, args.broken_rate, args.error_rate, args.seed)
+    print(f"Mock Ollama listening on http://127.0.0.1:{server.server_port}/api/generate (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"Served {server.stats['requests']} requests ({server.stats['broken']} broken, {server.stats['errors']} errors, {server.stats['cancelled']} streams cancelled)")
+        server.shutdown()
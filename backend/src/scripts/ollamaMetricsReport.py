@@ -0,0 +1,63 @@
+import os
+import glob
+import argparse
+from pipeline.ollama_metrics import load_metrics, summarize_metrics, item_costs, template_breakdown, print_template_breakdown, METRICS_FILE_NAME, RELOAD_THRESHOLD
+
+# Constants
+EXPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports')
+TOP_ITEMS = 10  # Most expensive items listed per dataset
+
+def format_rate(value, unit):
+    return f"{value:.1f} {unit}" if value is not None else "n/a"
+
+def format_share(value):
+    return f"{value * 100:.1f}%" if value is not None else "n/a"
+
+def report_dataset(output_dir, records, reload_threshold, top):
+    """Print token rates, prompt-eval share, reload events and the most expensive items of one dataset"""
+    summary = summarize_metrics(records, reload_threshold)
+    runs = sorted({record.get("run") for record in records if record.get("run")})
+    print(f"\n{os.path.basename(os.path.normpath(output_dir))} ({len(runs)} runs, {summary['generations']} generations)")
+    print(f"  Prompt tokens: {summary['prompt_tokens']} at {format_rate(summary['prompt_tokens_per_second'], 'tokens/sec')}")
+    print(f"  Output tokens: {summary['output_tokens']} at {format_rate(summary['output_tokens_per_second'], 'tokens/sec')}")
+    print(f"  Model time: {summary['total_seconds']:.1f}s, prompt evaluation {format_share(summary['prompt_share'])}, model loading {format_share(summary['load_share'])}")
+    if summary["partial"]:
+        print(f"  Streams stopped early (no server timings): {summary['partial']}")
+    
+    print(f"  Model reloads (load_duration >= {reload_threshold}s): {len(summary['reloads'])}")
+    for record in summary["reloads"]:
+        print(f"    run {record.get('run')}, item {record.get('item')}: {record['load_duration'] / 1e9:.2f}s on {record.get('endpoint') or record.get('model')}")
+    
+    breakdown = template_breakdown(records)
+    if breakdown:
+        print(f"  Prompt tokens by template:")
+        print_template_breakdown(breakdown, indent="    ")
+    
+    costs = item_costs(records)[:top]
+    if costs:
+        print(f"  {'Most expensive items':<40}{'Calls':>6}{'Prompt tok':>12}{'Output tok':>12}{'Model s':>10}")
+        for item in costs:
+            print(f"  {str(item['item']):<40}{item['generations']:>6}{item['prompt_tokens']:>12}{item['output_tokens']:>12}{item['seconds']:>10.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Aggregate the ollama_metrics.jsonl files written next to processed results into a per-dataset report.')
+    parser.add_argument('output_dirs', nargs='*', help='Output directories to report on (default: every directory under exports/ with a metrics file)')
+    parser.add_argument('--reload-threshold', type=float, default=RELOAD_THRESHOLD, help='Seconds of load_duration counted as a model reload')
+    parser.add_argument('--top', type=int, default=TOP_ITEMS, help='Number of most expensive items to list per dataset')
+    parser.add_argument('--latest', action='store_true', help='Only count the most recent run of each dataset')
+    args = parser.parse_args()
+    
+    output_dirs = args.output_dirs or sorted(os.path.dirname(path) for path in glob.glob(os.path.join(EXPORTS_DIR, '*', METRICS_FILE_NAME)))
+    if not output_dirs:
+        print(f"No {METRICS_FILE_NAME} files found under {EXPORTS_DIR}")
+    
+    for output_dir in output_dirs:
+        metrics_path = os.path.join(output_dir, METRICS_FILE_NAME)
+        if not os.path.exists(metrics_path):
+            print(f"No metrics file found at {metrics_path}")
+            continue
+        records = load_metrics(metrics_path)
+        if args.latest and records:
+            latest = max(record.get("run") or "" for record in records)
+            records = [record for record in records if record.get("run") == latest]
+        report_dataset(output_dir, records, args.reload_threshold, args.top)
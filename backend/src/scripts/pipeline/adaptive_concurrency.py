@@ -0,0 +1,161 @@
+import random
+import statistics
+import threading
+import time
+import requests
+
+LATENCY_WINDOW = 8  # Successful requests observed between limit adjustments
+LATENCY_TOLERANCE = 1.5  # p50/p95 may grow to this multiple of the best window before the limit stops rising
+DECREASE_FACTOR = 0.5  # Multiplicative decrease on a timeout, 5xx or refused connection
+MAX_RETRIES = 3  # Retries for a request that failed with a transport error
+RETRY_DELAY = 3  # Base backoff in seconds, doubled for every consecutive overload
+MAX_BACKOFF = 60  # Upper bound for the backoff in seconds
+
+def is_overload(error):
+    """True for errors that mean Ollama is saturated or down rather than that the request was bad"""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+def request_failure(error):
+    """Error message for a failed request, with the attempts AdaptiveConcurrency.run made when it sent it"""
+    attempts = getattr(error, "attempts", None)
+    if attempts is None:
+        return f"API request failed: {str(error)}"
+    return f"API request failed after {attempts} attempt{'s' if attempts != 1 else ''}: {str(error)}"
+
+class AdaptiveConcurrency:
+    """AIMD limit on the number of Ollama requests in flight.
+    
+    Every request waits for a free slot under the current limit. After each
+    LATENCY_WINDOW successful requests the window's p50 and p95 latency are
+    compared with the best window seen so far: while both stay within
+    LATENCY_TOLERANCE of it the limit grows by one, and once they climb it
+    drops back by one. A timeout, 5xx or refused connection halves the limit
+    and starts a cooldown that every caller waits out before sending, with
+    the backoff doubling on consecutive overloads. Requests that fail this
+    way are retried up to max_retries times; other errors are raised at once.
+    A raised error carries the number of attempts made as `attempts`.
+    """
+    
+    def __init__(self, max_limit=1, min_limit=1, initial=1, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY):
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = max(min(min_limit, self.max_limit), 1)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._window = []
+        self._baseline = None
+        self._consecutive_overloads = 0
+        self._cooldown_until = 0.0
+        self.latencies = []
+        self.stats = {"increases": 0, "decreases": 0, "overloads": 0, "retries": 0, "peak_limit": self.limit, "cooldown_seconds": 0.0}
+    
+    def acquire(self):
+        """Wait out any cooldown, then block until a slot under the current limit is free"""
+        while True:
+            wait = self._cooldown_until - time.time()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+    
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+    
+    def record_success(self, latency):
+        """Add a latency sample and adjust the limit once a full window has been observed"""
+        with self._condition:
+            self._consecutive_overloads = 0
+            self.latencies.append(latency)
+            self._window.append(latency)
+            if len(self._window) < LATENCY_WINDOW:
+                return
+            p50, p95 = percentile(self._window, 50), percentile(self._window, 95)
+            self._window = []
+            if self._baseline is None:
+                self._baseline = (p50, p95)
+            if p50 <= self._baseline[0] * LATENCY_TOLERANCE and p95 <= self._baseline[1] * LATENCY_TOLERANCE:
+                self._baseline = (min(self._baseline[0], p50), min(self._baseline[1], p95))
+                if self.limit < self.max_limit:
+                    self.limit += 1
+                    self.stats["increases"] += 1
+                    self.stats["peak_limit"] = max(self.stats["peak_limit"], self.limit)
+                    print(f"Latency flat (p50 {p50:.2f}s, p95 {p95:.2f}s); raising concurrency to {self.limit}")
+                    self._condition.notify_all()
+            elif self.limit > self.min_limit:
+                self.limit -= 1
+                self.stats["decreases"] += 1
+                print(f"Latency rising (p50 {p50:.2f}s, p95 {p95:.2f}s); lowering concurrency to {self.limit}")
+    
+    def record_overload(self, error):
+        """Halve the limit and start a cooldown after a timeout, 5xx or refused connection"""
+        with self._condition:
+            self.stats["overloads"] += 1
+            self._consecutive_overloads += 1
+            self._window = []
+            new_limit = max(int(self.limit * DECREASE_FACTOR), self.min_limit)
+            if new_limit < self.limit:
+                self.limit = new_limit
+                self.stats["decreases"] += 1
+            backoff = min(self.retry_delay * (2 ** (self._consecutive_overloads - 1)), MAX_BACKOFF) + random.uniform(0, 1)
+            self._cooldown_until = max(self._cooldown_until, time.time() + backoff)
+            self.stats["cooldown_seconds"] += backoff
+        print(f"Ollama overloaded ({type(error).__name__}: {str(error)}); concurrency {self.limit}, backing off {backoff:.2f} seconds")
+    
+    def run(self, send):
+        """Call send() under the limit, retrying transport failures, and return its result"""
+        attempt = 0
+        while True:
+            self.acquire()
+            started = time.time()
+            try:
+                result = send()
+            except requests.exceptions.RequestException as e:
+                # Lets the caller report how often the request was actually sent (see request_failure)
+                e.attempts = attempt + 1
+                if not is_overload(e):
+                    raise
+                self.record_overload(e)
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._condition:
+                    self.stats["retries"] += 1
+                print(f"Retrying request (attempt {attempt}/{self.max_retries})")
+                continue
+            finally:
+                self.release()
+            self.record_success(time.time() - started)
+            return result
+    
+    def print_summary(self):
+        """Print limit changes, overloads and latency percentiles for the run summary"""
+        with self._condition:
+            latencies = list(self.latencies)
+            stats = dict(self.stats)
+            limit = self.limit
+        print(f"\nAdaptive Concurrency Statistics:")
+        print(f"Concurrency limit: {limit} (peak {stats['peak_limit']}, max {self.max_limit})")
+        print(f"Limit increases: {stats['increases']}, decreases: {stats['decreases']}")
+        print(f"Overloads (timeouts, 5xx, refused connections): {stats['overloads']}")
+        print(f"Retries: {stats['retries']}")
+        print(f"Backoff imposed after overloads: {stats['cooldown_seconds']:.2f} seconds")
+        if latencies:
+            print(f"Request latency p50: {percentile(latencies, 50):.2f}s, p95: {percentile(latencies, 95):.2f}s")
+
+def percentile(values, pct):
+    """Linearly interpolated percentile (1-100) of a non-empty list"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    return statistics.quantiles(ordered, n=100, method="inclusive")[pct - 1] if pct < 100 else ordered[-1]
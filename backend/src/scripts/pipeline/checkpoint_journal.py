@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+
+FSYNC_EVERY = 20  # fsync the journal after this many appended entries
+FSYNC_INTERVAL = 5.0  # ...or after this many seconds, whichever comes first
+COMPACT_THRESHOLD = 1000  # Rewrite the journal once it holds this many redundant lines
+
+class CheckpointJournal:
+    """Append-only record of completed items, loaded into sets on startup.
+    
+    Each completed item is one JSON line {"kind": ..., "item": ...} appended to
+    <checkpoint>.jsonl, so recording progress costs one short write instead of
+    re-serialising the whole checkpoint. Appends are flushed immediately and
+    fsynced in batches. A legacy <checkpoint>.json with lists per kind (the
+    format the scripts used to rewrite after every item) is imported the first
+    time. The journal is compacted to one line per item on load, on close and
+    whenever it has accumulated COMPACT_THRESHOLD redundant lines. With an
+    InputManifest (use_manifest) checkpointed files whose content changed
+    are processed again.
+    """
+    
+    def __init__(self, checkpoint_file, kinds=("processed_files",)):
+        base, ext = os.path.splitext(checkpoint_file)
+        self.journal_path = base + ".jsonl"
+        self.legacy_path = checkpoint_file if ext == ".json" else None
+        self.sets = {kind: set() for kind in kinds}
+        self._lock = threading.Lock()
+        self._line_count = 0
+        self._unsynced = 0
+        self._last_sync = time.time()
+        self._file = None
+        self.manifest = None
+        self._load()
+    
+    def _load(self):
+        """Read the legacy checkpoint and the journal into memory"""
+        if not os.path.exists(self.journal_path) and self.legacy_path and os.path.exists(self.legacy_path):
+            try:
+                with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                    legacy = json.load(f)
+                for kind, items in legacy.items():
+                    if isinstance(items, list):
+                        self.sets.setdefault(kind, set()).update(items)
+                print(f"Imported legacy checkpoint {self.legacy_path}")
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Error loading legacy checkpoint: {str(e)}")
+        
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from an interrupted write
+                        continue
+                    self.sets.setdefault(entry["kind"], set()).add(entry["item"])
+                    self._line_count += 1
+        
+        self.compact()
+    
+    def use_manifest(self, manifest, question_prefix=None):
+        """Forget checkpointed files the InputManifest reports as changed and record files as they are checkpointed.
+        
+        question_prefix(file_name) gives the prefix of the file's ids in
+        processed_questions, for scripts that checkpoint questions separately.
+        Returns the changed file names.
+        """
+        self.manifest = manifest
+        changed = manifest.reconcile(self.items("processed_files"))
+        with self._lock:
+            for file_name in changed:
+                self.sets["processed_files"].discard(file_name)
+                if question_prefix is not None and "processed_questions" in self.sets:
+                    prefix = question_prefix(file_name)
+                    self.sets["processed_questions"].difference_update(
+                        [item for item in self.sets["processed_questions"] if str(item).startswith(prefix)])
+        return changed
+    
+    def items(self, kind):
+        """Live set of completed items of a kind (updated by add)"""
+        return self.sets.setdefault(kind, set())
+    
+    def add(self, kind, item):
+        """Record a completed item"""
+        with self._lock:
+            self.sets.setdefault(kind, set()).add(item)
+            self._file.write(json.dumps({"kind": kind, "item": item}, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self._line_count += 1
+            self._unsynced += 1
+            if kind == "processed_files" and self.manifest is not None:
+                self.manifest.record(item)
+            if self._unsynced >= FSYNC_EVERY or time.time() - self._last_sync >= FSYNC_INTERVAL:
+                self._sync()
+            if self._line_count - self._unique_count() >= COMPACT_THRESHOLD:
+                self._compact()
+    
+    def _unique_count(self):
+        return sum(len(items) for items in self.sets.values())
+    
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+    
+    def compact(self):
+        """Rewrite the journal with exactly one line per completed item"""
+        with self._lock:
+            self._compact()
+    
+    def _compact(self):
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for kind, items in self.sets.items():
+                for item in sorted(items, key=str):
+                    f.write(json.dumps({"kind": kind, "item": item}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._line_count = self._unique_count()
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._unsynced = 0
+        self._last_sync = time.time()
+    
+    def close(self):
+        """fsync outstanding entries, compact and close the journal"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._sync()
+            self._compact()
+            self._file.close()
+            self._file = None
+        if self.manifest is not None:
+            self.manifest.close()
@@ -0,0 +1,153 @@
+import threading
+import time
+import requests
+from pipeline.adaptive_concurrency import is_overload
+
+GENERATE_PATH = "/api/generate"
+HEALTH_PATH = "/api/tags"  # Cheap endpoint every Ollama server answers
+HEALTH_TIMEOUT = 3  # Seconds to wait for a health check
+EJECT_AFTER = 2  # Consecutive failures before an endpoint is taken out of rotation
+EJECT_SECONDS = 30  # First ejection period, doubled each time the endpoint fails its health check again
+MAX_EJECT_SECONDS = 300
+
+def normalize_endpoint(url):
+    """Accept either a server URL (http://host:11434) or its /api/generate URL"""
+    url = url.rstrip("/")
+    if not url.startswith(("http://", "https://")):
+        url = "http://" + url
+    return url if url.endswith(GENERATE_PATH) else url + GENERATE_PATH
+
+class Endpoint:
+    """One Ollama server and its load, health and throughput counters"""
+    
+    def __init__(self, url):
+        self.url = normalize_endpoint(url)
+        self.base_url = self.url[:-len(GENERATE_PATH)]
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.eject_seconds = EJECT_SECONDS
+        self.busy_seconds = 0.0
+        self.eval_count = 0
+        self.eval_ns = 0
+    
+    @property
+    def ejected(self):
+        return self.ejected_until > 0
+
+class EndpointPool:
+    """Routes each request to the least-loaded healthy Ollama endpoint.
+    
+    The endpoint with the fewest requests in flight wins, ties going to the
+    one that has served fewest requests. A request may prefer an endpoint
+    (for instance the one holding a passage's KV context), which is used
+    whenever it is healthy. After EJECT_AFTER consecutive timeouts, 5xx
+    responses or refused connections an endpoint is ejected; once its
+    ejection period is over it must pass a health check before it gets
+    traffic again, and every failed check doubles the period. When no
+    endpoint is available a ConnectionError is raised so the caller's
+    backoff applies.
+    """
+    
+    def __init__(self, urls):
+        if not urls:
+            raise ValueError("At least one Ollama endpoint is required")
+        self.endpoints = []
+        for url in urls:
+            endpoint = Endpoint(url)
+            if all(existing.url != endpoint.url for existing in self.endpoints):
+                self.endpoints.append(endpoint)
+        self._lock = threading.Lock()
+        self.started = time.time()
+    
+    def check_health(self, endpoint):
+        """True if the endpoint answers its health check"""
+        try:
+            response = requests.get(endpoint.base_url + HEALTH_PATH, timeout=HEALTH_TIMEOUT)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+    
+    def check_all(self):
+        """Health-check every endpoint up front and eject the ones that fail"""
+        for endpoint in self.endpoints:
+            if self.check_health(endpoint):
+                print(f"Ollama endpoint {endpoint.base_url} is healthy")
+            else:
+                with self._lock:
+                    self._eject(endpoint, "failed its health check")
+    
+    def _eject(self, endpoint, reason):
+        if endpoint.ejected:
+            endpoint.eject_seconds = min(endpoint.eject_seconds * 2, MAX_EJECT_SECONDS)
+        endpoint.ejected_until = time.time() + endpoint.eject_seconds
+        endpoint.ejections += 1
+        print(f"Ejecting Ollama endpoint {endpoint.base_url} for {endpoint.eject_seconds} seconds: {reason}")
+    
+    def _reinstate_due(self):
+        """Health-check ejected endpoints whose ejection period is over"""
+        now = time.time()
+        with self._lock:
+            due = [e for e in self.endpoints if e.ejected and e.ejected_until <= now]
+            # Push the deadline out so concurrent callers do not probe the same endpoint
+            for endpoint in due:
+                endpoint.ejected_until = now + HEALTH_TIMEOUT
+        for endpoint in due:
+            healthy = self.check_health(endpoint)
+            with self._lock:
+                if healthy:
+                    endpoint.ejected_until = 0.0
+                    endpoint.eject_seconds = EJECT_SECONDS
+                    endpoint.consecutive_failures = 0
+                    print(f"Ollama endpoint {endpoint.base_url} passed its health check; back in rotation")
+                else:
+                    self._eject(endpoint, "still failing its health check")
+    
+    def acquire(self, preferred=None):
+        """Pick an endpoint for the next request and count it as in flight"""
+        self._reinstate_due()
+        with self._lock:
+            healthy = [e for e in self.endpoints if not e.ejected]
+            if not healthy:
+                raise requests.exceptions.ConnectionError("No healthy Ollama endpoints")
+            endpoint = next((e for e in healthy if preferred is not None and e.url == preferred), None)
+            if endpoint is None:
+                endpoint = min(healthy, key=lambda e: (e.in_flight, e.requests))
+            endpoint.in_flight += 1
+            return endpoint
+    
+    def release(self, endpoint, elapsed, result=None, error=None):
+        """Record the outcome of a request sent to `endpoint`"""
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.busy_seconds += elapsed
+            if error is None:
+                endpoint.requests += 1
+                endpoint.consecutive_failures = 0
+                if result is not None:
+                    endpoint.eval_count += result.get("eval_count", 0) or 0
+                    endpoint.eval_ns += result.get("eval_duration", 0) or 0
+                return
+            endpoint.failures += 1
+            if is_overload(error):
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= EJECT_AFTER and not endpoint.ejected:
+                    self._eject(endpoint, f"{endpoint.consecutive_failures} consecutive failures ({type(error).__name__})")
+    
+    def print_summary(self):
+        """Print requests, failures, ejections and throughput per endpoint"""
+        elapsed = time.time() - self.started
+        with self._lock:
+            total = sum(e.requests for e in self.endpoints)
+            print(f"\nEndpoint Statistics:")
+            print(f"{'Endpoint':<32}{'Requests':>10}{'Share':>8}{'Failures':>10}{'Ejections':>11}{'Req/min':>9}{'Avg s':>8}{'Tokens/s':>10}")
+            for e in self.endpoints:
+                share = e.requests / total * 100 if total else 0
+                per_minute = e.requests / elapsed * 60 if elapsed > 0 else 0
+                average = e.busy_seconds / e.requests if e.requests else 0
+                tokens_per_second = f"{e.eval_count / (e.eval_ns / 1e9):.1f}" if e.eval_ns else "n/a"
+                status = " (ejected)" if e.ejected else ""
+                print(f"{e.base_url + status:<32}{e.requests:>10}{share:>7.1f}%{e.failures:>10}{e.ejections:>11}{per_minute:>9.1f}{average:>8.2f}{tokens_per_second:>10}")
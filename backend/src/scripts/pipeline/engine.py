@@ -0,0 +1,772 @@
+import glob
+import json
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+import requests
+from pipeline import html_parsing
+from pipeline.adaptive_concurrency import request_failure
+from pipeline.checkpoint_journal import CheckpointJournal
+from pipeline.input_manifest import InputManifest
+from pipeline.results_stream import ResultsStream
+from pipeline.structured_output import StructuredOutput, SchemaViolation
+from pipeline.stage_timing import StageTimings
+from pipeline.throughput import ThroughputTracker
+from pipeline.ollama_metrics import OllamaMetricsLog, METRICS_FILE_NAME
+from pipeline.prompt_templates import PromptTemplates
+from pipeline.explanation_only import ExplanationOnly
+
+DEFAULT_MODEL = "mistral:7b"
+DEFAULT_TIMEOUT = 60  # Read timeout in seconds for a single generation
+REPORT_EVERY = 10  # Print progress after this many finished items
+TIERED_MODES = ["answers", "explanations"]  # What use_tiered does with items the HTML extraction already answers
+PREFIX_NUM_PREDICT = 1  # Output tokens for the call that only evaluates a passage prefix
+
+# Set in each process-pool worker by _init_worker
+_worker_dataset = None
+
+def _init_worker(rebuild, parser_backend):
+    """Build the dataset in a pool worker, with the parent's parser backend"""
+    global _worker_dataset
+    html_parsing.set_parser_backend(parser_backend)
+    _worker_dataset = rebuild()
+
+def _load_in_worker(file_path):
+    """Load and split one file in a pool worker; its stage times go back to the parent with the items"""
+    _worker_dataset.timings.begin(os.path.basename(file_path))
+    try:
+        data = _worker_dataset.load(file_path)
+        items, error = (_worker_dataset.split(data) if data else []), None
+    except Exception as e:
+        items, error = None, str(e)
+    return items, error, _worker_dataset.timings.take()
+
+class Dataset:
+    """Everything PipelineEngine needs to know about one exported question set.
+    
+    The stages are plain functions taken from the existing scripts:
+    load(path) parses one HTML file, split(data) turns it into work items
+    (default: the file is one item), and each item is turned into a record
+    either by the LLM stage (build_prompt/complete) or, for datasets that need
+    no model, by direct(item). item_id(item) names items that are checkpointed
+    individually; files are checkpointed once all their items are done.
+    output_name(file_name, item) is the per-item JSON file written to
+    output_dir and wrap(item, record), when given, builds the saved result
+    around the record. Stage times go to `timings`, the script's StageTimings
+    when given so its loader's file_read/html_parse laps land in the same report.
+    build_compact_prompt is the script's shorter prompt; `prompt_templates`
+    decides per item which of the two is sent. dedup_text(item) returns the
+    question text findNearDuplicates.py indexes for datasets with one
+    question per file; only datasets of the same dedup_group are compared.
+    With a manifest_file, checkpointed files whose HTML, parser_version or
+    prompt_version changed are processed again (see InputManifest).
+    question_number(item) is stored with each record by a ResultsStore.
+    Stage times are appended to timings_file. --start/--end/--limit index
+    the files not yet checkpointed with an exclusive end, or with
+    range_over_all_files the full sorted file list with an inclusive end,
+    as the CR and RC scripts always have.
+    
+    The optional stages serve the engine's use_* modes. repair(record, item)
+    salvages a response that failed validation. extract(item) returns the
+    fields the HTML already gives completely (or None);
+    build_explanation_prompt(extracted, item) then asks only for
+    explanation_fields. build_batch_prompt(items) asks for all items of one
+    file in a single call and batch_records(parsed_json, items) returns the
+    finished records that passed validation by item id.
+    build_prefix_prompt(item) evaluates what the items of a file share, and
+    build_continuation_prompt / build_compact_continuation_prompt send one
+    item as a continuation of it.
+    """
+    
+    def __init__(self, name, html_dir, output_dir, checkpoint_file, error_log_file, load, output_name,
+                 split=None, item_id=None, build_prompt=None, complete=None, direct=None, wrap=None,
+                 options=None, timeout=DEFAULT_TIMEOUT, schema=None, required_keys=(),
+                 results_stream_file=None, legacy_results_file=None, model=DEFAULT_MODEL, file_pattern="*.html",
+                 timings=None, build_compact_prompt=None, prompt_templates=None, dedup_text=None, dedup_group=None,
+                 manifest_file=None, parser_version=None, prompt_version=None, question_number=None, timings_file=None,
+                 repair=None, extract=None, build_explanation_prompt=None, explanation_fields=(), explanation_options=None,
+                 build_batch_prompt=None, batch_records=None, batch_schema=None, batch_num_predict=None,
+                 build_prefix_prompt=None, build_continuation_prompt=None, build_compact_continuation_prompt=None,
+                 range_over_all_files=False):
+        if (build_prompt is None) == (direct is None):
+            raise ValueError(f"Dataset {name!r} needs exactly one of build_prompt and direct")
+        self.name = name
+        self.html_dir = html_dir
+        self.output_dir = output_dir
+        self.checkpoint_file = checkpoint_file
+        self.error_log_file = error_log_file
+        self.load = load
+        self.output_name = output_name
+        self.split = split or (lambda data: [data])
+        self.item_id = item_id
+        self.build_prompt = build_prompt
+        self.build_compact_prompt = build_compact_prompt
+        self.complete = complete or (lambda parsed, item: parsed)
+        self.direct = direct
+        self.wrap = wrap
+        self.options = options or {}
+        self.timeout = timeout
+        self.schema = schema
+        self.required_keys = list(required_keys)
+        self.results_stream_file = results_stream_file
+        self.legacy_results_file = legacy_results_file
+        self.model = model
+        self.file_pattern = file_pattern
+        self.timings = timings if timings is not None else StageTimings()
+        self.prompt_templates = prompt_templates if prompt_templates is not None else PromptTemplates()
+        self.dedup_text = dedup_text
+        self.dedup_group = dedup_group if dedup_group is not None else name
+        self.manifest_file = manifest_file
+        self.parser_version = parser_version
+        self.prompt_version = prompt_version
+        self.question_number = question_number or (lambda item: item.get("question_number"))
+        self.timings_file = timings_file
+        self.repair = repair
+        self.extract = extract
+        self.build_explanation_prompt = build_explanation_prompt
+        self.explanation_fields = list(explanation_fields)
+        self.explanation_options = explanation_options or self.options
+        self.build_batch_prompt = build_batch_prompt
+        self.batch_records = batch_records
+        self.batch_schema = batch_schema
+        self.batch_num_predict = batch_num_predict or self.options.get("num_predict")
+        self.build_prefix_prompt = build_prefix_prompt
+        self.build_continuation_prompt = build_continuation_prompt
+        self.build_compact_continuation_prompt = build_compact_continuation_prompt
+        self.range_over_all_files = range_over_all_files
+    
+    @property
+    def uses_llm(self):
+        return self.build_prompt is not None
+
+class PipelineEngine:
+    """Runs a Dataset through source -> parser -> LLM -> validator -> sink.
+    
+    Files are loaded lazily in the main thread and their items are kept in a
+    sliding window of `concurrency` workers, so a new request starts as soon
+    as any finishes. When the client has an AdaptiveConcurrency controller,
+    `concurrency` is the upper bound and the controller sets how many of the
+    workers' requests are sent at once. The checkpoint journal and results stream are only
+    written from the main thread. Items that fail validation are logged and
+    left out of the checkpoint so the next run retries them. With a
+    ResultsStore, checkpoint entries wait until their records are committed.
+    
+    Each item is answered by the cheapest source its modes allow: the HTML
+    extraction or an explanation-only call (use_tiered), its file's
+    passage-batched call (use_passage_batching), and otherwise its own call,
+    continuing from its file's evaluated prefix with use_passage_prefix.
+    With use_process_pool files are loaded in worker processes.
+    """
+    
+    def __init__(self, dataset, client=None, concurrency=1, structured=False):
+        if dataset.uses_llm and client is None:
+            raise ValueError(f"Dataset {dataset.name!r} needs an OllamaClient")
+        self.dataset = dataset
+        self.client = client
+        self.concurrency = concurrency
+        self.structured_output = StructuredOutput(dataset.schema) if dataset.schema is not None else None
+        if self.structured_output is not None:
+            self.structured_output.enabled = structured
+        elif structured:
+            print(f"Dataset {dataset.name} has no response schema; using free-form JSON output")
+        self.explanation_only = None
+        if dataset.build_explanation_prompt is not None:
+            self.explanation_only = ExplanationOnly(dataset.explanation_fields)
+            self.explanation_only.structured_output.enabled = structured
+        self.stats = {"files": 0, "file_errors": 0, "items": 0, "skipped": 0, "failed": 0}
+        self.sources = {"direct": 0, "explanation": 0, "batched": 0, "fallback": 0, "single": 0}
+        self.tier_stats = {"items": 0, "complete": 0}
+        self.prefix_stats = {"files": 0, "items": 0, "saved_seconds": 0.0}
+        self.timings = dataset.timings
+        if dataset.timings_file is not None:
+            self.timings.jsonl_path = dataset.timings_file
+        if client is not None:
+            client.use_stage_timings(self.timings)
+        self.throughput = None
+        self.metrics_log = None
+        self.near_duplicates = None
+        self.passage_store = None
+        self.results_store = None
+        self.tiered = None
+        self.passage_batching = False
+        self.passage_prefix = False
+        self.workers = None
+        self.rebuild = None
+        self._file_state = {}
+        self._lock = threading.Lock()
+        self._held = deque()
+        self._changed_files = set()
+        self._files_seen = 0
+        self._queued = 0
+    
+    def use_near_duplicates(self, near_duplicates):
+        """Answer members of near-duplicate clusters from one shared generation (a NearDuplicateResults)"""
+        if self.dataset.dedup_text is None:
+            raise ValueError(f"Dataset {self.dataset.name!r} is not indexed for near-duplicates")
+        self.near_duplicates = near_duplicates
+    
+    def use_passage_store(self, passage_store):
+        """Write results through a PassageStore, which keeps each RC passage in one shared file"""
+        self.passage_store = passage_store
+    
+    def use_results_store(self, results_store):
+        """Write results, LLM attempts and errors to a ResultsStore instead of one JSON file per item"""
+        self.results_store = results_store
+    
+    def use_tiered(self, mode):
+        """Check each item's HTML extraction first and save complete ones as extracted ("answers") or only ask for their explanation ("explanations")"""
+        if mode not in TIERED_MODES:
+            raise ValueError(f"Unknown tiered mode {mode!r}; choose one of {TIERED_MODES}")
+        if self.dataset.extract is None or self.explanation_only is None:
+            raise ValueError(f"Dataset {self.dataset.name!r} has no HTML extraction to answer items from")
+        # Datasets that ask the model for the answer do not have it in their extraction
+        if mode == "answers" and "correct_answer" in self.dataset.explanation_fields:
+            raise ValueError(f"Dataset {self.dataset.name!r} does not extract the correct answers; use explanations")
+        self.tiered = mode
+    
+    def use_passage_batching(self):
+        """Ask for all pending items of a file in one call, falling back to per-item calls for those that fail validation"""
+        if self.dataset.build_batch_prompt is None:
+            raise ValueError(f"Dataset {self.dataset.name!r} has no passage-batched prompt")
+        self.passage_batching = True
+    
+    def use_passage_prefix(self):
+        """Evaluate what a file's items share once and send each item as a continuation of the returned Ollama context"""
+        if self.dataset.build_prefix_prompt is None:
+            raise ValueError(f"Dataset {self.dataset.name!r} has no passage prefix prompt")
+        self.passage_prefix = True
+    
+    def use_process_pool(self, workers, rebuild):
+        """Load and parse files in `workers` processes; rebuild() returns the Dataset in a worker and must be picklable"""
+        self.workers = workers
+        self.rebuild = rebuild
+    
+    def checkpoint_add(self, checkpoint, kind, key):
+        """Checkpoint an item or file, holding it back until the results store has committed every record saved so far"""
+        if self.results_store is None:
+            checkpoint.add(kind, key)
+            return
+        self._held.append((self.results_store.saved, kind, key))
+        self.release_checkpoints(checkpoint)
+    
+    def release_checkpoints(self, checkpoint):
+        """Checkpoint the held items and files whose records are committed"""
+        while self._held and self._held[0][0] <= self.results_store.committed:
+            _, kind, key = self._held.popleft()
+            checkpoint.add(kind, key)
+    
+    def select_files(self, checkpoint, start_idx=None, end_idx=None, limit=None):
+        """List the dataset's HTML files that are not checkpointed yet, applying the custom range"""
+        html_files = sorted(glob.glob(os.path.join(self.dataset.html_dir, self.dataset.file_pattern)))
+        processed_files = checkpoint.items("processed_files")
+        print(f"Found {len(html_files)} HTML files, {len(processed_files)} already processed")
+        
+        if self.dataset.range_over_all_files:
+            # The range names the same files however many are checkpointed; those are skipped afterwards
+            if start_idx is not None or end_idx is not None or limit is not None:
+                start = start_idx or 0
+                end = end_idx + 1 if end_idx is not None else len(html_files)
+                if limit is not None:
+                    end = min(start + limit, end)
+                html_files = html_files[start:end]
+                print(f"Applied custom range: files {start} to {end-1} of all files (total: {len(html_files)})")
+            return [f for f in html_files if os.path.basename(f) not in processed_files]
+        
+        remaining_files = [f for f in html_files if os.path.basename(f) not in processed_files]
+        if start_idx is not None or end_idx is not None or limit is not None:
+            start = start_idx or 0
+            end = end_idx if end_idx is not None else len(remaining_files)
+            if limit is not None:
+                end = min(start + limit, end)
+            remaining_files = remaining_files[start:end]
+            print(f"Applied custom range: processing files {start} to {end-1} (total: {len(remaining_files)})")
+        return remaining_files
+    
+    def load_files(self, files):
+        """Yield (file_path, items, error) for each file, loading them in the process pool when there is one"""
+        if self.workers is None:
+            for file_path in files:
+                self.timings.begin(os.path.basename(file_path))
+                try:
+                    data = self.dataset.load(file_path)
+                    items, error = (self.dataset.split(data) if data else []), None
+                except Exception as e:
+                    items, error = None, str(e)
+                yield file_path, items, error
+            return
+        
+        # Parsing is CPU-bound, so files are spread over processes; everything else stays in this one
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.rebuild, html_parsing.parser_backend)) as executor:
+            for file_path, (items, error, timings) in zip(files, executor.map(_load_in_worker, files)):
+                self.timings.merge(timings)
+                self.timings.begin(os.path.basename(file_path))
+                yield file_path, items, error
+    
+    def iter_items(self, files, checkpoint, pending):
+        """Load each file and yield (file_name, item_id, item, extracted) for its unprocessed items.
+        
+        `pending` counts the outstanding items per file; a file with nothing
+        left to do is checkpointed straight away. Items of files whose HTML
+        changed are processed again even if they were checkpointed. In tiered
+        mode `extracted` holds the fields the HTML gives completely.
+        """
+        processed_questions = checkpoint.items("processed_questions")
+        for file_path, items, error in self.load_files(files):
+            file_name = os.path.basename(file_path)
+            self._files_seen += 1
+            if error is not None:
+                self.log_error(f"Error loading {file_name}: {error}", file_name)
+                self.stats["failed"] += 1
+                self.stats["file_errors"] += 1
+                self.timings.finish(file_name, ok=False)
+                continue
+            if not items:
+                self.log_error(f"No questions found in {file_name}", file_name)
+                self.stats["failed"] += 1
+                self.stats["file_errors"] += 1
+                self.timings.finish(file_name, ok=False)
+                continue
+            
+            self.stats["files"] += 1
+            todo = []
+            for item in items:
+                item_id = self.dataset.item_id(item) if self.dataset.item_id else None
+                if item_id is not None and item_id in processed_questions and file_name not in self._changed_files:
+                    self.stats["skipped"] += 1
+                else:
+                    todo.append((item_id, item))
+            pending[file_name] = {"left": len(todo), "failed": False}
+            self._queued += len(todo)
+            if not todo:
+                with self.timings.stage("checkpoint_write", file_name):
+                    self.checkpoint_add(checkpoint, "processed_files", file_name)
+                self.timings.finish(file_name)
+                continue
+            
+            extracted = [self.dataset.extract(item) if self.tiered else None for _, item in todo]
+            if self.tiered:
+                complete = sum(1 for fields in extracted if fields is not None)
+                self.tier_stats["items"] += len(todo)
+                self.tier_stats["complete"] += complete
+                print(f"{file_name}: {complete}/{len(todo)} items complete in the HTML")
+            if self.passage_batching or self.passage_prefix:
+                # Items the HTML answers stay out of the passage batch and the passage prefix
+                self._file_state[file_name] = {
+                    "lock": threading.Lock(),
+                    "batch_items": [item for (_, item), fields in zip(todo, extracted) if fields is None],
+                    "batch": None,
+                    "primed": False,
+                    "context": None
+                }
+            for (item_id, item), fields in zip(todo, extracted):
+                yield file_name, item_id, item, fields
+    
+    def payload(self, prompt, options):
+        return {
+            "model": self.dataset.model,
+            "prompt": prompt,
+            "stream": False,
+            "options": dict(options)
+        }
+    
+    def record_repair(self):
+        if self.structured_output is not None:
+            self.structured_output.record_repair()
+    
+    def parse_response(self, result):
+        """Return the JSON object in a free-form response, or a dict with an "error" key"""
+        if self.structured_output is not None:
+            self.structured_output.record_response(result)
+        with self.timings.stage("json_extract"):
+            response_text = result.get("response", "")
+            start_idx = response_text.find('{')
+            end_idx = response_text.rfind('}') + 1
+            if start_idx < 0 or end_idx <= start_idx:
+                self.record_repair()
+                return {"error": "Could not find JSON structure", "raw_response": response_text}
+            try:
+                return json.loads(response_text[start_idx:end_idx])
+            except json.JSONDecodeError as e:
+                self.record_repair()
+                return {"error": f"Invalid JSON format: {str(e)}", "raw_response": response_text}
+    
+    def generate(self, item, context=None):
+        """Ask Ollama for one item and return the parsed JSON, or a dict with an "error" key.
+        
+        With a passage context from prime_context only the continuation
+        prompt is sent, to the server that holds the evaluated prefix.
+        """
+        endpoint = None
+        with self.timings.stage("prompt_build"):
+            if context is not None:
+                prompt = "\n" + self.dataset.prompt_templates.build(self.timings.current_item(), self.dataset.build_continuation_prompt,
+                                                                    self.dataset.build_compact_continuation_prompt, item)
+            else:
+                prompt = self.dataset.prompt_templates.build(self.timings.current_item(), self.dataset.build_prompt, self.dataset.build_compact_prompt, item)
+            payload = self.payload(prompt, self.dataset.options)
+            if context is not None:
+                payload["context"] = context["context"]
+                endpoint = context["endpoint"]
+        
+        # Timeouts and 5xx responses are retried with backoff by the client's concurrency controller
+        try:
+            if self.structured_output is not None and self.structured_output.enabled:
+                try:
+                    parsed_json, result = self.structured_output.generate(self.client, payload, timeout=self.dataset.timeout, endpoint=endpoint)
+                except SchemaViolation as e:
+                    return {"error": f"Response did not match the schema: {str(e)}"}
+            else:
+                result = self.client.generate(payload, timeout=self.dataset.timeout, endpoint=endpoint)
+                parsed_json = None
+        except requests.exceptions.RequestException as e:
+            return {"error": request_failure(e)}
+        
+        if context is not None:
+            with self._lock:
+                context["items"] += 1
+                context["item_eval_ns"] += result.get("prompt_eval_duration", 0) or 0
+        return parsed_json if parsed_json is not None else self.parse_response(result)
+    
+    def explain(self, item, extracted):
+        """Ask only for the explanation fields of an item whose other fields the HTML gives, and merge them into its record"""
+        with self.timings.stage("prompt_build"):
+            self.dataset.prompt_templates.label("explanation")
+            payload = self.payload(self.dataset.build_explanation_prompt(extracted, item), self.dataset.explanation_options)
+        try:
+            generated = self.explanation_only.generate(self.client, payload, extracted, timeout=self.dataset.timeout)
+        except requests.exceptions.RequestException as e:
+            return {"error": request_failure(e)}
+        if "error" in generated:
+            return generated
+        return self.dataset.complete(dict(extracted, **generated), item)
+    
+    def generate_batch(self, file_name, items):
+        """Ask for every pending item of one file in a single call and return the valid records by item id"""
+        with self.timings.stage("prompt_build"):
+            self.dataset.prompt_templates.label("passage_batch")
+            payload = self.payload(self.dataset.build_batch_prompt(items),
+                                   dict(self.dataset.options, num_predict=self.dataset.batch_num_predict * len(items)))
+        structured = self.structured_output is not None and self.structured_output.enabled
+        if structured and self.dataset.batch_schema is not None:
+            # Invalid entries fall back to per-item calls, so the batch itself is not retried
+            payload["format"] = self.dataset.batch_schema
+        try:
+            print(f"Sending passage-batched request for {file_name} ({len(items)} items)...")
+            result = self.client.generate(payload, timeout=self.dataset.timeout * len(items))
+        except requests.exceptions.RequestException as e:
+            print(f"Passage-batched request failed for {file_name}: {request_failure(e)}")
+            return {}
+        parsed_json = self.parse_response(result)
+        if "error" in parsed_json:
+            print(f"Could not parse the passage-batched response for {file_name}: {parsed_json['error']}")
+            return {}
+        records = self.dataset.batch_records(parsed_json, items)
+        print(f"Passage-batched response for {file_name}: {len(records)}/{len(items)} items passed validation")
+        return records
+    
+    def batched_record(self, file_name, item):
+        """Return the item's record from its file's passage-batched call (made by the first item that asks), or None"""
+        state = self._file_state[file_name]
+        with state["lock"]:
+            if state["batch"] is None:
+                state["batch"] = self.generate_batch(file_name, state["batch_items"])
+        return state["batch"].get(self.dataset.item_id(item))
+    
+    def prime_context(self, file_name, item):
+        """Evaluate the file's shared prefix once and return its Ollama KV context, or None if there is none"""
+        with self.timings.stage("prompt_build"):
+            self.dataset.prompt_templates.label("passage_prefix")
+            payload = self.payload(self.dataset.build_prefix_prompt(item), dict(self.dataset.options, num_predict=PREFIX_NUM_PREDICT))
+        try:
+            print(f"Evaluating passage prefix for {file_name}...")
+            # The context only comes with the final response
+            result = self.client.generate(payload, timeout=self.dataset.timeout, stop_at_json=False)
+        except requests.exceptions.RequestException as e:
+            print(f"Passage prefix request failed for {file_name}: {request_failure(e)}")
+            return None
+        if not result.get("context"):
+            print(f"No context returned for {file_name}; using full prompts")
+            return None
+        return {
+            "context": result["context"],
+            "endpoint": result.get("endpoint"),  # The server that holds the evaluated prefix
+            "prefix_eval_count": result.get("prompt_eval_count", 0),
+            "prefix_eval_ns": result.get("prompt_eval_duration", 0),
+            "items": 0,
+            "item_eval_ns": 0
+        }
+    
+    def passage_context(self, file_name, item):
+        """Return the file's passage context, priming it before the first item that needs it"""
+        state = self._file_state[file_name]
+        with state["lock"]:
+            if not state["primed"]:
+                state["primed"] = True
+                state["context"] = self.prime_context(file_name, item)
+        return state["context"]
+    
+    def report_prefix_savings(self, file_name, context):
+        """Print the measured prefix evaluation cost and the time saved by continuing from it"""
+        prefix_seconds = context["prefix_eval_ns"] / 1e9
+        # Without the shared context every item would have evaluated the prefix again
+        saved_seconds = max(context["items"] - 1, 0) * prefix_seconds
+        self.prefix_stats["files"] += 1
+        self.prefix_stats["items"] += context["items"]
+        self.prefix_stats["saved_seconds"] += saved_seconds
+        print(f"{file_name} passage prefix: {context['prefix_eval_count']} tokens evaluated once in {prefix_seconds:.2f} seconds, "
+              f"{context['items']} continuations with {context['item_eval_ns'] / 1e9:.2f} seconds of prompt evaluation, {saved_seconds:.2f} seconds saved")
+    
+    def answer(self, file_name, item, extracted):
+        """Turn one item into a record from the cheapest source the modes allow and return (record, source)"""
+        if extracted is not None and self.tiered == "answers":
+            return self.dataset.complete(dict(extracted), item), "direct"
+        if extracted is not None:
+            return self.explain(item, extracted), "explanation"
+        if self.passage_batching:
+            record = self.batched_record(file_name, item)
+            if record is not None:
+                return record, "batched"
+        context = self.passage_context(file_name, item) if self.passage_prefix else None
+        if self.near_duplicates is not None:
+            # Only the generated fields are shared; complete() fills in the member's own stats
+            fields = list(self.dataset.schema["properties"]) if self.dataset.schema is not None else None
+            record = self.near_duplicates.resolve(f"{self.dataset.name}/{file_name}", lambda: self.generate(item, context), fields)
+        else:
+            record = self.generate(item, context)
+        if "error" not in record:
+            record = self.dataset.complete(record, item)
+        if self.dataset.repair is not None and self.validate(record) is not None:
+            if "error" not in record:
+                self.record_repair()
+            record = self.dataset.repair(record, item)
+        return record, "fallback" if self.passage_batching else "single"
+    
+    def validate(self, record):
+        """Return an error message for a record that is unusable, else None"""
+        if "error" in record:
+            return record["error"]
+        missing_keys = [key for key in self.dataset.required_keys if key not in record]
+        if missing_keys:
+            return f"Missing required keys in JSON: {missing_keys}"
+        return None
+    
+    def process_item(self, file_name, item, extracted=None):
+        """Run one item through the LLM (or direct) stage and the validator"""
+        self.timings.begin(self.dataset.item_id(item) if self.dataset.item_id else file_name)
+        if self.dataset.uses_llm:
+            record, source = self.answer(file_name, item, extracted)
+        else:
+            record, source = self.dataset.direct(item), None
+        # Records saved as extracted have no explanation, like those of the direct datasets
+        error = record.get("error") if source == "direct" else self.validate(record)
+        if error is None and source is not None:
+            with self._lock:
+                self.sources[source] += 1
+        if error is not None:
+            if self.results_store is not None:
+                # Kept with valid = 0 so failed generations can be inspected
+                self.save_result(file_name, item, record, error)
+            return None, error
+        
+        result = self.dataset.wrap(item, record) if self.dataset.wrap else record
+        # Save individual result immediately to avoid data loss
+        self.save_result(file_name, item, result)
+        return result, None
+    
+    def save_result(self, file_name, item, result, error=None):
+        """Write one item's result to its JSON file in the output directory, or to the results store"""
+        output_name = self.dataset.output_name(file_name, item)
+        output_file = os.path.join(self.dataset.output_dir, output_name)
+        with self.timings.stage("result_write"):
+            if self.results_store is not None:
+                self.results_store.save(output_name, result, file_name=file_name, error=error,
+                                        item_id=self.dataset.item_id(item) if self.dataset.item_id else None,
+                                        question_number=self.dataset.question_number(item))
+            elif self.passage_store is not None:
+                self.passage_store.save(output_file, result)
+            else:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, indent=2, ensure_ascii=False)
+    
+    def finish_item(self, file_name, item_id, result, error, checkpoint, results_stream, pending):
+        """Record an item's outcome in the checkpoint, results stream and error log (main thread only)"""
+        state = pending[file_name]
+        state["left"] -= 1
+        key = item_id if item_id is not None else file_name
+        self.throughput.record_item(error is None)
+        if error is not None:
+            state["failed"] = True
+            self.stats["failed"] += 1
+            self.log_error(f"{file_name}{f' ({item_id})' if item_id else ''}: {error}", file_name, item_id)
+        else:
+            self.stats["items"] += 1
+            if results_stream is not None:
+                with self.timings.stage("result_write", key):
+                    results_stream.append(result)
+            if item_id is not None:
+                with self.timings.stage("checkpoint_write", key):
+                    self.checkpoint_add(checkpoint, "processed_questions", item_id)
+        if item_id is not None:
+            self.timings.finish(item_id, ok=error is None)
+        if state["left"] == 0:
+            del pending[file_name]
+            file_state = self._file_state.pop(file_name, None)
+            if file_state is not None and file_state["context"] is not None:
+                self.report_prefix_savings(file_name, file_state["context"])
+            if not state["failed"]:
+                with self.timings.stage("checkpoint_write", file_name):
+                    self.checkpoint_add(checkpoint, "processed_files", file_name)
+            self.timings.finish(file_name, ok=not state["failed"])
+    
+    def log_error(self, message, file_name=None, item_id=None):
+        """Print and log an error"""
+        print(f"ERROR: {message}")
+        with open(self.dataset.error_log_file, 'a', encoding='utf-8') as f:
+            f.write(f"[{datetime.now().isoformat()}] {message}\n")
+        if self.results_store is not None:
+            self.results_store.add_error(message, file_name, item_id)
+    
+    def report_progress(self, file_count):
+        """Print the live progress line, extrapolating the item total from the files loaded so far"""
+        if self._files_seen:
+            self.throughput.total = round(self._queued + (file_count - self._files_seen) * self._queued / self._files_seen)
+        print(self.throughput.progress_line())
+    
+    def run(self, start_idx=None, end_idx=None, limit=None):
+        """Process the dataset and print a summary"""
+        os.makedirs(self.dataset.output_dir, exist_ok=True)
+        checkpoint = CheckpointJournal(self.dataset.checkpoint_file, kinds=("processed_files", "processed_questions"))
+        if self.dataset.manifest_file is not None:
+            self._changed_files = checkpoint.use_manifest(InputManifest(
+                self.dataset.manifest_file, self.dataset.html_dir, self.dataset.parser_version, self.dataset.prompt_version))
+        files = self.select_files(checkpoint, start_idx, end_idx, limit)
+        if not files:
+            print("All files have already been processed!")
+            checkpoint.close()
+            return self.stats
+        
+        results_stream = None
+        if self.dataset.results_stream_file:
+            results_stream = ResultsStream(self.dataset.results_stream_file, legacy_json_path=self.dataset.legacy_results_file)
+        
+        mode = f"{self.concurrency} concurrent requests" if self.dataset.uses_llm else "direct extraction"
+        if self.workers is not None:
+            mode += f", loading files in {self.workers} worker processes"
+        print(f"Processing {len(files)} files of {self.dataset.name} with {mode}")
+        started = time.time()
+        self.throughput = ThroughputTracker(total=len(files))
+        if self.client is not None:
+            self.client.use_throughput_tracker(self.throughput)
+            # Token counts and Ollama timings per item, kept next to the processed_<n>.json files
+            self.metrics_log = OllamaMetricsLog(os.path.join(self.dataset.output_dir, METRICS_FILE_NAME), timings=self.timings,
+                                                prompts=self.dataset.prompt_templates)
+            self.client.use_metrics_log(self.metrics_log)
+            if self.results_store is not None:
+                self.metrics_log.use_results_store(self.results_store)
+        pending = {}
+        items = self.iter_items(files, checkpoint, pending)
+        
+        try:
+            if self.concurrency > 1:
+                self._run_concurrently(items, checkpoint, results_stream, pending, len(files))
+            else:
+                for count, (file_name, item_id, item, extracted) in enumerate(items, 1):
+                    try:
+                        result, error = self.process_item(file_name, item, extracted)
+                    except Exception as e:
+                        result, error = None, str(e)
+                    self.finish_item(file_name, item_id, result, error, checkpoint, results_stream, pending)
+                    if count % REPORT_EVERY == 0:
+                        self.report_progress(len(files))
+        finally:
+            if results_stream is not None:
+                results_stream.close()
+            if self.results_store is not None:
+                self.results_store.flush()
+                self.release_checkpoints(checkpoint)
+            checkpoint.close()
+            self.timings.close()
+            if self.metrics_log is not None:
+                self.metrics_log.close()
+            if self.near_duplicates is not None:
+                self.near_duplicates.close()
+        
+        self.print_summary(time.time() - started)
+        return self.stats
+    
+    def _run_concurrently(self, items, checkpoint, results_stream, pending, file_count):
+        """Keep up to `concurrency` items in flight, topping the window up as each finishes"""
+        completed = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = {}
+            
+            def submit_next():
+                entry = next(items, None)
+                if entry is not None:
+                    file_name, item_id, item, extracted = entry
+                    in_flight[executor.submit(self.process_item, file_name, item, extracted)] = (file_name, item_id)
+                return entry is not None
+            
+            while len(in_flight) < self.concurrency and submit_next():
+                pass
+            
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_name, item_id = in_flight.pop(future)
+                    try:
+                        result, error = future.result()
+                    except Exception as e:
+                        result, error = None, str(e)
+                    self.finish_item(file_name, item_id, result, error, checkpoint, results_stream, pending)
+                    completed += 1
+                    if completed % REPORT_EVERY == 0:
+                        self.report_progress(file_count)
+                    submit_next()
+    
+    def print_summary(self, elapsed):
+        """Print item counts, throughput and the client and structured output statistics"""
+        print(f"\n{self.dataset.name} complete in {elapsed:.2f} seconds")
+        print(f"Files loaded: {self.stats['files']}")
+        print(f"Items saved: {self.stats['items']}")
+        print(f"Items skipped (already processed): {self.stats['skipped']}")
+        print(f"Items failed: {self.stats['failed']}")
+        print(f"Results saved to {self.results_store.db_path if self.results_store is not None else self.dataset.output_dir}")
+        if self.stats["failed"]:
+            print(f"Check {self.dataset.error_log_file} for the errors")
+        if elapsed > 0:
+            # Files that failed to load took their share of the time too
+            print(f"Files per second: {(self.stats['files'] + self.stats['file_errors']) / elapsed:.1f}")
+            print(f"Items per second: {self.stats['items'] / elapsed:.1f}")
+        if self.workers is not None:
+            print(f"Worker processes: {self.workers}")
+        if self.passage_batching:
+            print(f"Items answered by passage-batched calls: {self.sources['batched']}")
+            print(f"Items that fell back to per-item calls: {self.sources['fallback']}")
+        if self.passage_prefix:
+            print(f"Passages evaluated once as a shared prefix: {self.prefix_stats['files']}")
+            print(f"Items sent as continuations: {self.prefix_stats['items']}")
+            print(f"Prompt evaluation time saved: {self.prefix_stats['saved_seconds']:.2f} seconds")
+        if self.tiered:
+            print(f"Items complete in the HTML extraction: {self.tier_stats['complete']}/{self.tier_stats['items']}")
+            if self.stats["items"]:
+                print(f"Items saved without an LLM call: {self.sources['direct']}/{self.stats['items']} ({self.sources['direct'] / self.stats['items'] * 100:.1f}% of LLM calls avoided)")
+        if self.dataset.uses_llm:
+            self.client.print_summary()
+            if self.structured_output is not None:
+                self.structured_output.print_summary()
+            if self.explanation_only is not None:
+                self.explanation_only.print_summary()
+            self.metrics_log.print_summary()
+            if self.near_duplicates is not None:
+                self.near_duplicates.print_summary()
+        if self.passage_store is not None:
+            self.passage_store.print_summary()
+        if self.results_store is not None:
+            self.results_store.print_summary()
+        self.throughput.print_summary()
+        self.timings.print_summary()
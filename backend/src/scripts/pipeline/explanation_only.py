@@ -0,0 +1,129 @@
+import json
+import re
+import threading
+from pipeline.structured_output import StructuredOutput, SchemaViolation, question_schema, ANSWER_LETTERS
+
+CHARS_PER_TOKEN = 4  # Rough characters per Mistral token, for estimating output that was not generated
+
+# "A." / "A)" / "(A)" at the start of the text or after whitespace
+OPTION_MARKER = re.compile(r'(?:^|(?<=\s))\(?([A-E])[.)]\s+')
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+def split_options(text):
+    """Split text ending in options A-E into (text before the options, {letter: option}), or None.
+    
+    The markers are matched from the end, so an "A." inside the stimulus does
+    not start the options early. Every option must be non-empty.
+    """
+    markers = list(OPTION_MARKER.finditer(text))
+    chosen = []
+    limit = len(text)
+    for letter in reversed(ANSWER_LETTERS):
+        match = next((m for m in reversed(markers) if m.group(1) == letter and m.start() < limit), None)
+        if match is None:
+            return None
+        chosen.insert(0, match)
+        limit = match.start()
+    options = {}
+    for index, match in enumerate(chosen):
+        stop = chosen[index + 1].start() if index + 1 < len(chosen) else len(text)
+        options[match.group(1)] = text[match.end():stop].strip()
+    if not all(options.values()):
+        return None
+    return text[:chosen[0].start()].strip(), options
+
+def split_cr_question(question_text):
+    """Split a CR question's text into argument, question stem and options, or return None.
+    
+    The stem is the last sentence before the options and has to end in a
+    question mark or colon ("Which of the following ...?"); anything less
+    certain is left to the full prompt.
+    """
+    parts = split_options(question_text)
+    if parts is None:
+        return None
+    before, options = parts
+    sentences = SENTENCE_END.split(before)
+    stem = sentences[-1].strip()
+    if len(sentences) < 2 or not stem.endswith(("?", ":")):
+        return None
+    argument = before[:before.rfind(stem)].strip()
+    return {"argument": argument, "question_stem": stem, "options": options}
+
+class ExplanationOnly:
+    """Asks the model only for what the HTML cannot give, for questions whose structure is parsed.
+    
+    The full prompts have the model copy the question text and all five
+    options back before it explains anything. In explanation-only mode the
+    prompt carries the parsed structure and asks for `fields` alone (the
+    explanation and question type, plus the answer when the HTML has no key),
+    and the caller merges the result into the parsed record. With
+    structured_output enabled the fields' schema is sent as `format`.
+    PipelineEngine.use_tiered turns the mode on for a dataset.
+    
+    Output tokens generated are counted; the tokens saved are estimated from
+    the length of the copied fields as the model would have written them in
+    its JSON, at CHARS_PER_TOKEN.
+    """
+    
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.structured_output = StructuredOutput(question_schema(self.fields))
+        self.questions = 0
+        self.tokens_generated = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+    
+    def parse(self, response_text):
+        """Pull the requested fields out of a free-text response, or return a dict with an "error" key"""
+        start_idx = response_text.find('{')
+        end_idx = response_text.rfind('}') + 1
+        if start_idx < 0 or end_idx <= start_idx:
+            return {"error": "Could not find JSON structure", "raw_response": response_text}
+        try:
+            parsed = json.loads(response_text[start_idx:end_idx])
+        except json.JSONDecodeError as e:
+            return {"error": f"Invalid JSON format: {str(e)}", "raw_response": response_text}
+        if not isinstance(parsed, dict):
+            return {"error": "Response is not a JSON object", "raw_response": response_text}
+        missing_keys = [key for key in self.fields if not str(parsed.get(key, "")).strip()]
+        if missing_keys:
+            return {"error": f"Missing required keys in JSON: {missing_keys}", "raw_response": response_text}
+        if "correct_answer" in self.fields and str(parsed["correct_answer"]).strip() not in ANSWER_LETTERS:
+            return {"error": f"Invalid correct_answer {parsed['correct_answer']!r}", "raw_response": response_text}
+        return {key: parsed[key] for key in self.fields}
+    
+    def generate(self, client, payload, copied, timeout=None):
+        """Generate the missing fields for one question whose parsed fields are `copied`.
+        
+        Returns the fields as a dict, or a dict with an "error" key. Transport
+        errors propagate to the caller, as with OllamaClient.generate.
+        """
+        if self.structured_output.enabled:
+            try:
+                parsed, result = self.structured_output.generate(client, payload, timeout=timeout)
+            except SchemaViolation as e:
+                return {"error": f"Response did not match the schema: {str(e)}"}
+        else:
+            result = client.generate(payload, timeout=timeout)
+            self.structured_output.record_response(result)
+            parsed = self.parse(result.get("response", ""))
+            if "error" in parsed:
+                self.structured_output.record_repair()
+                return parsed
+        with self._lock:
+            self.questions += 1
+            self.tokens_generated += result.get("eval_count", 0) or 0
+            self.tokens_saved += len(json.dumps(copied, indent=2, ensure_ascii=False)) // CHARS_PER_TOKEN
+        return parsed
+    
+    def print_summary(self):
+        """Print the questions answered in explanation-only mode and the output tokens saved"""
+        with self._lock:
+            questions, generated, saved = self.questions, self.tokens_generated, self.tokens_saved
+        if not questions:
+            return
+        print(f"\nExplanation-only Generation:")
+        print(f"Questions answered from their parsed structure: {questions}")
+        print(f"Output tokens generated: {generated} ({generated / questions:.0f} per question)")
+        print(f"Output tokens saved by not copying the question back: about {saved} ({saved / questions:.0f} per question, {saved / max(generated + saved, 1) * 100:.0f}% of a full response)")
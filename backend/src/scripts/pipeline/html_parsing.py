@@ -0,0 +1,39 @@
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+
+# BeautifulSoup tree builders the loaders can run on; lxml is optional
+PARSER_BACKENDS = ["html.parser", "lxml"]
+DEFAULT_PARSER_BACKEND = "html.parser"
+
+# The exported pages wrap everything the loaders read in .question-container;
+# straining on these blocks skips the <head> and its large inline <style>
+CONTENT_CLASSES = ["question-container", "source-url", "metadata", "answer-stats", "session-stats", "reading-passage"]
+
+CONTENT_STRAINER = SoupStrainer(class_=CONTENT_CLASSES)
+
+parser_backend = DEFAULT_PARSER_BACKEND
+
+def available_parser_backends():
+    """Return the backends from PARSER_BACKENDS that are installed"""
+    return [name for name in PARSER_BACKENDS if builder_registry.lookup(name) is not None]
+
+def set_parser_backend(name):
+    """Select the tree builder used by parse_html, failing early if it is not installed"""
+    global parser_backend
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend {name!r}; choose from {PARSER_BACKENDS}")
+    if builder_registry.lookup(name) is None:
+        raise ValueError(f"HTML parser backend {name!r} is not installed (pip install {name})")
+    parser_backend = name
+
+def parse_html(content, strain=True):
+    """Parse an exported question page once with the selected backend.
+    
+    With strain=True only the content blocks are built into the tree. Pages
+    that have none of them are parsed in full so no loader sees an empty soup.
+    """
+    if strain:
+        soup = BeautifulSoup(content, parser_backend, parse_only=CONTENT_STRAINER)
+        if soup.contents:
+            return soup
+    return BeautifulSoup(content, parser_backend)
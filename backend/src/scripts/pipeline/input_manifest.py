@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+HASH_CHUNK = 1024 * 1024  # Bytes read at a time when hashing an input file
+
+def file_digest(file_path):
+    """sha256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class InputManifest:
+    """Content hash, parser version and prompt version of every checkpointed input file.
+    
+    Checkpoints only hold file names, so an HTML file that was exported again
+    with different content would be skipped. reconcile() compares each
+    checkpointed file with its manifest entry: a file whose size and mtime
+    are unchanged is trusted without being read, one whose stat changed is
+    hashed and only counts as changed if the hash differs, and a different
+    parser_version or prompt_version marks every file as changed. Bump the
+    script's PARSER_VERSION or PROMPT_VERSION to reprocess everything after
+    changing what is extracted or asked. Files checkpointed before the
+    manifest existed are adopted as they are on disk, so the first run does
+    not reprocess them.
+    
+    Entries are appended to a JSONL file as files are checkpointed (last
+    line wins) and the file is compacted on close.
+    """
+    
+    def __init__(self, manifest_path, html_dir, parser_version, prompt_version=None):
+        self.manifest_path = manifest_path
+        self.html_dir = html_dir
+        self.versions = {"parser_version": parser_version, "prompt_version": prompt_version}
+        self.entries = {}
+        self.stats = {"unchanged": 0, "hashed": 0, "changed": 0, "versions": 0, "adopted": 0}
+        self._lock = threading.Lock()
+        self._file = None
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from an interrupted write
+                        continue
+                    self.entries[entry["file"]] = entry
+    
+    def _stat_all(self):
+        """Size and mtime of every file in html_dir, from one directory scan"""
+        stats = {}
+        with os.scandir(self.html_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    st = entry.stat()
+                    stats[entry.name] = (st.st_size, st.st_mtime_ns)
+        return stats
+    
+    def _entry(self, file_name, stat, digest):
+        return dict({"file": file_name, "size": stat[0], "mtime_ns": stat[1], "sha256": digest}, **self.versions)
+    
+    def reconcile(self, processed_files):
+        """Return the checkpointed files that have to be processed again"""
+        started = time.time()
+        stats = self._stat_all() if os.path.isdir(self.html_dir) else {}
+        changed = set()
+        updates = []
+        for file_name in sorted(processed_files):
+            stat = stats.get(file_name)
+            if stat is None:
+                # No longer exported; leave its checkpoint alone
+                continue
+            entry = self.entries.get(file_name)
+            if entry is None:
+                updates.append(self._entry(file_name, stat, file_digest(os.path.join(self.html_dir, file_name))))
+                self.stats["adopted"] += 1
+            elif any(entry.get(key) != value for key, value in self.versions.items()):
+                changed.add(file_name)
+                self.stats["versions"] += 1
+            elif (entry["size"], entry["mtime_ns"]) == stat:
+                self.stats["unchanged"] += 1
+            else:
+                self.stats["hashed"] += 1
+                digest = file_digest(os.path.join(self.html_dir, file_name))
+                if digest == entry["sha256"]:
+                    # Touched but identical, e.g. exported again; remember the new stat so it is not hashed next time
+                    updates.append(self._entry(file_name, stat, digest))
+                    self.stats["unchanged"] += 1
+                else:
+                    changed.add(file_name)
+                    self.stats["changed"] += 1
+        for entry in updates:
+            self._append(entry)
+        print(f"Input manifest: {self.stats['unchanged']} unchanged ({self.stats['hashed']} hashed), {self.stats['changed']} with new content, "
+              f"{self.stats['versions']} with an older parser/prompt version, {self.stats['adopted']} adopted in {time.time() - started:.2f} seconds")
+        return changed
+    
+    def record(self, file_name):
+        """Record the current content and versions of a file that has just been processed"""
+        file_path = os.path.join(self.html_dir, file_name)
+        if not os.path.exists(file_path):
+            return
+        st = os.stat(file_path)
+        self._append(self._entry(file_name, (st.st_size, st.st_mtime_ns), file_digest(file_path)))
+    
+    def _append(self, entry):
+        with self._lock:
+            self.entries[entry["file"]] = entry
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+                self._file = open(self.manifest_path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+    
+    def close(self):
+        """Rewrite the manifest with one line per file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if not self.entries:
+                return
+            tmp_path = self.manifest_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for file_name in sorted(self.entries):
+                    f.write(json.dumps(self.entries[file_name], ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.manifest_path)
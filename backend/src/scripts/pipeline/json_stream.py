@@ -0,0 +1,42 @@
+class JsonObjectScanner:
+    """Find where the first top-level JSON object closes in text arriving in pieces.
+    
+    Text before the first "{" is skipped. Braces inside strings (including
+    escaped quotes) are ignored, so only the real closing brace counts.
+    """
+    
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+        self.closed = False
+    
+    def feed(self, text):
+        """Consume the next piece of text.
+        
+        Returns the index just past the closing brace within `text` once the
+        object is complete, otherwise None.
+        """
+        if self.closed:
+            return 0
+        for index, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.started:
+                    self.in_string = True
+            elif char == "{":
+                self.started = True
+                self.depth += 1
+            elif char == "}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.closed = True
+                    return index + 1
+        return None
@@ -0,0 +1,238 @@
+import json
+import os
+import random
+import re
+import threading
+import unicodedata
+import zlib
+from datetime import datetime
+
+NUM_PERM = 128  # MinHash signature length
+BANDS = 32  # LSH bands of NUM_PERM // BANDS rows; pairs around 0.4 Jaccard or more become candidates
+SHINGLE_SIZE = 3  # Words per shingle
+SIMILARITY_THRESHOLD = 0.8  # Shingle Jaccard similarity at which two questions are duplicates
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+SEED = 1  # Fixed so signatures are comparable between runs
+
+NON_WORD = re.compile(r'[^\w]+')
+
+def normalize_text(text):
+    """Lowercase, unify unicode forms and reduce punctuation and whitespace to single spaces"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return NON_WORD.sub(" ", text).strip()
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Set of `size`-word shingles of normalized text (the whole text when it is shorter)"""
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class MinHasher:
+    """MinHash signatures from NUM_PERM universal hash functions over crc32 shingle hashes"""
+    
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+    
+    def signature(self, shingle_set):
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingle_set] or [0]
+        return [min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes) for a, b in self.params]
+
+class NearDuplicateIndex:
+    """MinHash/LSH index that groups near-duplicate questions into clusters.
+    
+    Every question added is reduced to word shingles of its normalized text
+    and a MinHash signature; signatures that agree on any LSH band make the
+    two questions candidates, and candidates whose exact shingle Jaccard
+    reaches `threshold` are joined. Clusters are the connected components of
+    those pairs, so an export that repeats a question three times with small
+    differences ends up as one cluster. Keys are "<source>/<file name>";
+    questions are only compared within their `group`, so a Problem Solving
+    and a Critical Reasoning question never share a response.
+    """
+    
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.hasher = MinHasher(num_perm)
+        self.shingle_sets = {}
+        self.buckets = {}
+        self.candidates = 0
+    
+    def add(self, key, text, group=None):
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return
+        self.shingle_sets[key] = shingle_set
+        signature = self.hasher.signature(shingle_set)
+        for band in range(self.bands):
+            band_key = (group, band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            self.buckets.setdefault(band_key, []).append(key)
+    
+    def pairs(self):
+        """Yield (key, other, similarity) for every candidate pair at or above the threshold"""
+        seen = set()
+        for keys in self.buckets.values():
+            for i, key in enumerate(keys):
+                for other in keys[i + 1:]:
+                    pair = (key, other) if key < other else (other, key)
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                    self.candidates += 1
+                    similarity = jaccard(self.shingle_sets[key], self.shingle_sets[other])
+                    if similarity >= self.threshold:
+                        yield pair[0], pair[1], similarity
+    
+    def clusters(self, source_order=()):
+        """Return the clusters of two or more questions, largest first.
+        
+        The representative of a cluster is its first member from the earliest
+        source in `source_order`; every member carries its similarity to it.
+        """
+        parent = {}
+        
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+        
+        for key, other, _ in self.pairs():
+            parent.setdefault(key, key)
+            parent.setdefault(other, other)
+            root, other_root = find(key), find(other)
+            if root != other_root:
+                parent[max(root, other_root)] = min(root, other_root)
+        
+        groups = {}
+        for key in parent:
+            groups.setdefault(find(key), []).append(key)
+        rank = {source: i for i, source in enumerate(source_order)}
+        clusters = []
+        for members in groups.values():
+            members.sort(key=lambda key: (rank.get(key.split("/", 1)[0], len(rank)), key))
+            representative = members[0]
+            clusters.append({
+                "representative": representative,
+                "members": [
+                    {"key": key, "similarity": round(jaccard(self.shingle_sets[representative], self.shingle_sets[key]), 3)}
+                    for key in members
+                ]
+            })
+        clusters.sort(key=lambda cluster: (-len(cluster["members"]), cluster["representative"]))
+        for cluster_id, cluster in enumerate(clusters):
+            cluster["id"] = cluster_id
+        return clusters
+
+def write_cluster_report(path, clusters, sources, threshold, questions):
+    """Save the clusters with the settings and question count they were built from"""
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "threshold": threshold,
+        "sources": sources,
+        "questions": questions,
+        "clusters": clusters
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def load_cluster_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class NearDuplicateResults:
+    """Fans one generation per near-duplicate cluster out to the cluster's other members.
+    
+    Built from the report written by findNearDuplicates.py. The first member
+    of a cluster to reach the model (normally its representative) is
+    generated as usual and the parsed response is appended, under that
+    member's key, to a JSONL file shared by all datasets; every later member, in this run or a later one
+    and in any dataset, is given that response instead of a request. Only
+    the `fields` the model generates are kept, so each member's own stats and
+    metadata are still filled in from its HTML. Members of one cluster are
+    serialized, so concurrent workers never generate the same cluster twice.
+    """
+    
+    def __init__(self, report_path, results_path):
+        self.report_path = report_path
+        self.results_path = results_path
+        report = load_cluster_report(report_path)
+        self.cluster_of = {member["key"]: cluster["id"] for cluster in report["clusters"] for member in cluster["members"]}
+        self.records = {}
+        self.generated = 0
+        self.fanned_out = 0
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if os.path.exists(results_path):
+            with open(results_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    # Cluster ids change when the report is rebuilt, so responses are kept by the question they came from
+                    cluster_id = self.cluster_of.get(entry["source"])
+                    if cluster_id is not None:
+                        self.records[cluster_id] = entry
+        print(f"Loaded {len(report['clusters'])} near-duplicate clusters covering {len(self.cluster_of)} questions, {len(self.records)} with a stored response")
+    
+    def _cluster_lock(self, cluster_id):
+        with self._lock:
+            return self._locks.setdefault(cluster_id, threading.Lock())
+    
+    def resolve(self, key, generate, fields=None):
+        """Return the stored response of `key`'s cluster, or generate() it and store it for the others"""
+        cluster_id = self.cluster_of.get(key)
+        if cluster_id is None:
+            return generate()
+        with self._cluster_lock(cluster_id):
+            entry = self.records.get(cluster_id)
+            if entry is not None:
+                if entry["source"] != key:
+                    with self._lock:
+                        self.fanned_out += 1
+                record = json.loads(json.dumps(entry["record"]))
+                return {field: record[field] for field in fields if field in record} if fields else record
+            record = generate()
+            if "error" in record:
+                return record
+            stored = {field: record[field] for field in fields if field in record} if fields else record
+            entry = {"source": key, "record": stored}
+            with self._lock:
+                self.generated += 1
+                self.records[cluster_id] = entry
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.results_path) or ".", exist_ok=True)
+                    self._file = open(self.results_path, 'a', encoding='utf-8')
+                self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._file.flush()
+            return record
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    def print_summary(self):
+        """Print how many cluster members were generated and how many reused a stored response"""
+        if not self.generated and not self.fanned_out:
+            return
+        print(f"\nNear-duplicate Fan-out:")
+        print(f"Clusters generated this run: {self.generated}")
+        print(f"Duplicates answered from their cluster's response: {self.fanned_out} (LLM calls avoided)")
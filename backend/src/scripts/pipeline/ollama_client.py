@@ -0,0 +1,339 @@
+import json
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from pipeline.response_cache import cache_key
+from pipeline.json_stream import JsonObjectScanner
+from pipeline.endpoint_pool import EndpointPool, normalize_endpoint
+
+# Defaults for the shared Ollama client
+DEFAULT_POOL_SIZE = 4  # Keep-alive connections held open per Ollama host
+DEFAULT_TIMEOUT = 90  # Read timeout in seconds for a single generation
+CONNECT_TIMEOUT = 5  # Connect timeout in seconds
+TRANSPORT_RETRIES = 2  # Retries for refused connections and 502/503/504 responses
+TRANSPORT_BACKOFF = 0.5  # Backoff factor for transport-level retries
+
+class OllamaClient:
+    """Pooled keep-alive client for Ollama's /api/generate endpoint.
+    
+    One instance is shared by every request a script makes, so questions and
+    retries reuse the same TCP connections instead of opening a new one each
+    time. Connection-level failures and gateway errors are retried by the
+    transport adapter; read timeouts are left to the caller's retry logic
+    because a generation that timed out should not be silently re-run.
+    
+    When a ResponseCache is attached, identical payloads are answered from
+    disk without touching the network.
+    
+    In streaming mode the response is read token by token and the request is
+    closed as soon as a complete top-level JSON object has arrived, so the
+    model stops instead of writing commentary up to num_predict.
+    
+    With an AdaptiveConcurrency controller attached, every POST waits for a
+    slot under its limit, and timeouts, 5xx responses and refused connections
+    are retried by the controller after its backoff instead of by the
+    adapter, so that each of them lowers the limit.
+    
+    With several endpoints (use_endpoints) each request goes to the
+    least-loaded healthy server; a retry after a failure naturally lands on
+    another one.
+    """
+    
+    def __init__(self, api_url, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, transport_retries=TRANSPORT_RETRIES):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.adapter = None
+        self._lock = threading.Lock()
+        self._retired_requests = 0
+        self._retired_connections = 0
+        self.cache = None
+        self.refresh_cache = False
+        self.streaming = False
+        self.controller = None
+        self.endpoints = None
+        self.stage_timings = None
+        self.throughput = None
+        self.metrics_log = None
+        self.stream_stats = {"requests": 0, "early_stops": 0, "tokens_streamed": 0, "tokens_saved": 0, "first_token_seconds": 0.0}
+        self.configure(pool_size=pool_size, transport_retries=transport_retries)
+    
+    def configure(self, pool_size=None, timeout=None, transport_retries=None):
+        """Resize the connection pool and/or change the timeout and retry policy"""
+        if timeout is not None:
+            self.timeout = timeout
+        if pool_size is None and transport_retries is None:
+            return
+        
+        self.pool_size = pool_size if pool_size is not None else self.pool_size
+        self.transport_retries = transport_retries if transport_retries is not None else self.transport_retries
+        
+        retry = Retry(
+            total=self.transport_retries,
+            connect=self.transport_retries,
+            read=0,
+            status=self.transport_retries,
+            backoff_factor=TRANSPORT_BACKOFF,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False
+        )
+        # One connection pool per Ollama host
+        host_pools = max(4, len(self.endpoints.endpoints)) if self.endpoints is not None else 4
+        adapter = HTTPAdapter(pool_connections=host_pools, pool_maxsize=self.pool_size, max_retries=retry)
+        
+        with self._lock:
+            # Keep the counters of the adapter being replaced
+            if self.adapter is not None:
+                stats = self._adapter_stats(self.adapter)
+                self._retired_requests += stats["requests"]
+                self._retired_connections += stats["connections_opened"]
+                self.adapter.close()
+            self.adapter = adapter
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+    
+    def use_cache(self, cache, refresh=False):
+        """Consult `cache` before every POST; with refresh=True only write to it"""
+        self.cache = cache
+        self.refresh_cache = refresh
+    
+    def use_streaming(self, enabled=True):
+        """Stream generations and stop each one once its JSON object is complete"""
+        self.streaming = enabled
+    
+    def use_concurrency_controller(self, controller):
+        """Send every request through `controller` (an AdaptiveConcurrency)"""
+        self.controller = controller
+        if controller is not None:
+            # The controller has to see every failure to back off, so the adapter must not retry them
+            self.configure(transport_retries=0)
+    
+    def use_stage_timings(self, timings):
+        """Record generate()'s cache lookup as cache_read, its wait for a concurrency slot as queue_wait and the request itself as http_wait in `timings` (a StageTimings)"""
+        self.stage_timings = timings
+    
+    def use_throughput_tracker(self, tracker):
+        """Feed the eval_count/eval_duration of every generation to `tracker` (a ThroughputTracker)"""
+        self.throughput = tracker
+    
+    def use_metrics_log(self, metrics_log):
+        """Append the token and timing fields of every generation to `metrics_log` (an OllamaMetricsLog)"""
+        self.metrics_log = metrics_log
+    
+    def use_endpoints(self, urls):
+        """Send requests to `urls`; with more than one, health-check them and spread the load"""
+        if len(urls) == 1:
+            self.api_url = normalize_endpoint(urls[0])
+            self.endpoints = None
+            return
+        self.endpoints = EndpointPool(urls)
+        self.endpoints.check_all()
+        self.configure(pool_size=self.pool_size)
+    
+    def generate(self, payload, timeout=None, stop_at_json=True, endpoint=None):
+        """POST a generate payload and return the decoded JSON response.
+        
+        Pass stop_at_json=False when the caller needs fields that only arrive
+        with the final chunk (such as context); the request then runs to the end.
+        With several endpoints the result's "endpoint" names the server that
+        answered; pass it back as `endpoint` to prefer that server, for
+        instance to reuse a KV context it holds.
+        """
+        clock = self.stage_timings.clock() if self.stage_timings is not None else None
+        key = None
+        if self.cache is not None:
+            key = cache_key(payload)
+            if not self.refresh_cache:
+                cached = self.cache.get(key)
+                # Timed on a miss too, so the lookup is not counted as queue or HTTP time
+                if clock is not None:
+                    clock.lap("cache_read")
+                if cached is not None:
+                    return cached
+        
+        read_timeout = timeout if timeout is not None else self.timeout
+        
+        def send():
+            # Time spent waiting for a slot (and in overload cooldowns) is not HTTP time
+            if clock is not None and self.controller is not None:
+                clock.lap("queue_wait")
+            try:
+                return self._route(payload, read_timeout, stop_at_json, endpoint)
+            finally:
+                if clock is not None:
+                    clock.lap("http_wait")
+        
+        if self.controller is not None:
+            result = self.controller.run(send)
+        else:
+            result = send()
+        if self.throughput is not None:
+            self.throughput.record_generation(result)
+        if self.metrics_log is not None:
+            self.metrics_log.record(payload, result)
+        
+        # Only complete, non-empty generations are worth replaying
+        if key is not None and result.get("done", True) and result.get("response"):
+            self.cache.put(key, result, model=payload.get("model"))
+        return result
+    
+    def _route(self, payload, read_timeout, stop_at_json, preferred):
+        """Send to the single endpoint or to the least-loaded one of the pool"""
+        if self.endpoints is None:
+            return self._send(self.api_url, payload, read_timeout, stop_at_json)
+        endpoint = self.endpoints.acquire(preferred)
+        started = time.time()
+        try:
+            result = self._send(endpoint.url, payload, read_timeout, stop_at_json)
+        except Exception as e:
+            self.endpoints.release(endpoint, time.time() - started, error=e)
+            raise
+        self.endpoints.release(endpoint, time.time() - started, result=result)
+        result["endpoint"] = endpoint.url
+        return result
+    
+    def _send(self, url, payload, read_timeout, stop_at_json):
+        """POST one generation, streamed or not"""
+        if self.streaming and stop_at_json:
+            return self._generate_streaming(url, payload, read_timeout)
+        response = self.session.post(url, json=payload, timeout=(CONNECT_TIMEOUT, read_timeout))
+        response.raise_for_status()
+        return response.json()
+    
+    def _generate_streaming(self, url, payload, read_timeout):
+        """Stream a generation, closing the request once a top-level JSON object has closed.
+        
+        Returns a dict shaped like a non-streaming response, with the text cut
+        after the closing brace plus time_to_first_token and tokens_saved. A
+        request stopped early has no server-side timing fields; eval_count is
+        then the number of tokens received and eval_duration the time from the
+        first to the last of them as seen by the client. tokens_saved is the part of the
+        num_predict budget left unused, an upper bound on what was avoided.
+        """
+        scanner = JsonObjectScanner()
+        parts = []
+        tokens = 0
+        final = {}
+        early_stop = False
+        started = time.time()
+        first_token_at = None
+        
+        # Leaving the with block before the last chunk drops the connection, which makes Ollama stop generating
+        with self.session.post(url, json=dict(payload, stream=True), timeout=(CONNECT_TIMEOUT, read_timeout), stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise requests.exceptions.RequestException(f"Ollama error: {chunk['error']}")
+                text = chunk.get("response", "")
+                if text:
+                    if first_token_at is None:
+                        first_token_at = time.time()
+                    tokens += 1
+                    end = scanner.feed(text)
+                    if end is not None:
+                        parts.append(text[:end])
+                        early_stop = not chunk.get("done", False)
+                        if not early_stop:
+                            final = chunk
+                        break
+                    parts.append(text)
+                if chunk.get("done"):
+                    final = chunk
+                    break
+        
+        result = {key: value for key, value in final.items() if key != "response"}
+        # A stream that ended without a closing brace or a final chunk was cut off and must not be cached
+        result.update(model=payload.get("model"), response="".join(parts), done=early_stop or bool(final))
+        time_to_first_token = (first_token_at - started) if first_token_at is not None else None
+        tokens_saved = 0
+        if early_stop:
+            result["done_reason"] = "json_complete"
+            result["eval_count"] = tokens
+            result["eval_duration"] = int((time.time() - first_token_at) * 1e9)
+            tokens_saved = max(payload.get("options", {}).get("num_predict", tokens) - tokens, 0)
+        result["time_to_first_token"] = time_to_first_token
+        result["tokens_saved"] = tokens_saved
+        
+        with self._lock:
+            self.stream_stats["requests"] += 1
+            self.stream_stats["early_stops"] += 1 if early_stop else 0
+            self.stream_stats["tokens_streamed"] += tokens
+            self.stream_stats["tokens_saved"] += tokens_saved
+            self.stream_stats["first_token_seconds"] += time_to_first_token or 0.0
+        
+        first_token_text = f"{time_to_first_token:.2f}s" if time_to_first_token is not None else "n/a"
+        if early_stop:
+            print(f"First token after {first_token_text}; stopped after {tokens} tokens once the JSON object closed ({tokens_saved} tokens of budget unused)")
+        else:
+            print(f"First token after {first_token_text}; generation finished after {tokens} tokens")
+        return result
+    
+    @staticmethod
+    def _adapter_stats(adapter):
+        """Sum request and connection counters over an adapter's pools"""
+        requests_made = 0
+        connections_opened = 0
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_made += pool.num_requests
+            connections_opened += pool.num_connections
+        return {"requests": requests_made, "connections_opened": connections_opened}
+    
+    def connection_stats(self):
+        """Return how many HTTP requests were sent and how many reused a connection"""
+        with self._lock:
+            stats = self._adapter_stats(self.adapter)
+            requests_made = stats["requests"] + self._retired_requests
+            connections_opened = stats["connections_opened"] + self._retired_connections
+        return {
+            "requests": requests_made,
+            "connections_opened": connections_opened,
+            "connections_reused": max(requests_made - connections_opened, 0)
+        }
+    
+    def print_connection_summary(self):
+        """Print connection reuse counts for the run summary"""
+        stats = self.connection_stats()
+        print(f"\nConnection Statistics:")
+        print(f"HTTP requests sent: {stats['requests']}")
+        print(f"Connections opened: {stats['connections_opened']}")
+        print(f"Connections reused: {stats['connections_reused']}")
+    
+    def print_stream_summary(self):
+        """Print early-stop and time-to-first-token figures for streamed generations"""
+        with self._lock:
+            stats = dict(self.stream_stats)
+        print(f"\nStreaming Statistics:")
+        print(f"Streamed generations: {stats['requests']}")
+        print(f"Stopped early at the closing brace: {stats['early_stops']}")
+        print(f"Tokens received: {stats['tokens_streamed']}")
+        print(f"Tokens saved (unused num_predict budget, upper bound): {stats['tokens_saved']}")
+        if stats["requests"]:
+            print(f"Average time to first token: {stats['first_token_seconds'] / stats['requests']:.2f} seconds")
+    
+    def print_summary(self):
+        """Print connection, concurrency, streaming and cache statistics for the run summary"""
+        self.print_connection_summary()
+        if self.endpoints is not None:
+            self.endpoints.print_summary()
+        if self.controller is not None:
+            self.controller.print_summary()
+        if self.streaming:
+            self.print_stream_summary()
+        if self.cache is not None:
+            self.cache.print_summary()
+    
+    def close(self):
+        """Close all pooled connections and the response cache"""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+# Timing and token fields Ollama returns with the final chunk of a generation
+METRIC_FIELDS = ["prompt_eval_count", "prompt_eval_duration", "eval_count", "eval_duration", "load_duration", "total_duration"]
+METRICS_FILE_NAME = "ollama_metrics.jsonl"  # Written next to the processed_<n>.json files of a dataset
+RELOAD_THRESHOLD = 0.5  # Seconds of load_duration above which a generation had to load the model again
+
+def load_metrics(jsonl_path):
+    """Read the generation lines of a metrics file, skipping lines cut off by an interrupted run"""
+    records = []
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+def summarize_metrics(records, reload_threshold=RELOAD_THRESHOLD):
+    """Aggregate generation lines into token rates, the prompt-eval share of model time and reload events.
+    
+    Durations are Ollama's nanoseconds; the returned ones are seconds.
+    Streams stopped early by the client carry no server-side prompt or total
+    timing, so they count towards generation speed only and are reported as
+    `partial`.
+    """
+    summary = {
+        "generations": len(records),
+        "partial": 0,
+        "prompt_tokens": 0,
+        "output_tokens": 0,
+        "prompt_seconds": 0.0,
+        "eval_seconds": 0.0,
+        "load_seconds": 0.0,
+        "total_seconds": 0.0,
+        "reloads": []
+    }
+    timed_prompt_seconds = 0.0
+    for record in records:
+        summary["output_tokens"] += record.get("eval_count") or 0
+        summary["eval_seconds"] += (record.get("eval_duration") or 0) / 1e9
+        if record.get("total_duration") is None:
+            summary["partial"] += 1
+            continue
+        prompt_seconds = (record.get("prompt_eval_duration") or 0) / 1e9
+        load_seconds = (record.get("load_duration") or 0) / 1e9
+        summary["prompt_tokens"] += record.get("prompt_eval_count") or 0
+        summary["prompt_seconds"] += prompt_seconds
+        summary["load_seconds"] += load_seconds
+        summary["total_seconds"] += record["total_duration"] / 1e9
+        timed_prompt_seconds += prompt_seconds
+        if load_seconds >= reload_threshold:
+            summary["reloads"].append(record)
+    
+    summary["prompt_tokens_per_second"] = summary["prompt_tokens"] / summary["prompt_seconds"] if summary["prompt_seconds"] > 0 else None
+    summary["output_tokens_per_second"] = summary["output_tokens"] / summary["eval_seconds"] if summary["eval_seconds"] > 0 else None
+    summary["prompt_share"] = timed_prompt_seconds / summary["total_seconds"] if summary["total_seconds"] > 0 else None
+    summary["load_share"] = summary["load_seconds"] / summary["total_seconds"] if summary["total_seconds"] > 0 else None
+    return summary
+
+def item_costs(records):
+    """Return per-item totals (generations, tokens, model seconds), most expensive first"""
+    items = {}
+    for record in records:
+        item = items.setdefault(record.get("item"), {"item": record.get("item"), "generations": 0, "prompt_tokens": 0, "output_tokens": 0, "seconds": 0.0})
+        item["generations"] += 1
+        item["prompt_tokens"] += record.get("prompt_eval_count") or 0
+        item["output_tokens"] += record.get("eval_count") or 0
+        if record.get("total_duration") is not None:
+            item["seconds"] += record["total_duration"] / 1e9
+        else:
+            item["seconds"] += (record.get("eval_duration") or 0) / 1e9
+    return sorted(items.values(), key=lambda item: item["seconds"], reverse=True)
+
+def template_breakdown(records):
+    """Return {prompt_template: {generations, prompt_tokens, prompt_chars}} with per-generation means.
+    
+    Only generations that report prompt_eval_count are counted, so streams
+    stopped early do not pull the means down.
+    """
+    templates = {}
+    for record in records:
+        if record.get("prompt_template") is None or record.get("prompt_eval_count") is None:
+            continue
+        totals = templates.setdefault(record["prompt_template"], {"generations": 0, "prompt_tokens": 0, "prompt_chars": 0})
+        totals["generations"] += 1
+        totals["prompt_tokens"] += record["prompt_eval_count"]
+        totals["prompt_chars"] += record.get("prompt_chars") or 0
+    return {
+        template: {
+            "generations": totals["generations"],
+            "prompt_tokens": totals["prompt_tokens"] / totals["generations"],
+            "prompt_chars": totals["prompt_chars"] / totals["generations"]
+        }
+        for template, totals in sorted(templates.items())
+    }
+
+def print_template_breakdown(breakdown, indent=""):
+    """Print mean prompt tokens per template and the compact template's change against the full one"""
+    for template, means in breakdown.items():
+        line = f"{indent}{template}: {means['prompt_tokens']:.0f} prompt tokens ({means['prompt_chars']:.0f} chars) per generation over {means['generations']} generations"
+        if template == "compact" and "full" in breakdown and breakdown["full"]["prompt_tokens"]:
+            line += f", {(means['prompt_tokens'] / breakdown['full']['prompt_tokens'] - 1) * 100:+.1f}% vs full"
+        print(line)
+
+class OllamaMetricsLog:
+    """Per-generation Ollama token and timing fields, appended to a JSONL file.
+    
+    Attached to an OllamaClient (use_metrics_log), every response that came
+    from the network is written as one line with the METRIC_FIELDS, the model
+    and endpoint and the prompt length, so the numbers survive the run and
+    can be aggregated per dataset with ollamaMetricsReport.py. With a
+    StageTimings the line is attributed to the item the calling thread is
+    working on; retries of one item therefore show up as several lines. With
+    PromptTemplates the line also names the prompt template that was sent.
+    With a ResultsStore (use_results_store) every line is also kept as a row
+    of its attempts table.
+    """
+    
+    def __init__(self, jsonl_path, timings=None, prompts=None):
+        self.jsonl_path = jsonl_path
+        self.timings = timings
+        self.prompts = prompts
+        self.run_started = datetime.now().isoformat(timespec="seconds")
+        self.records = []
+        self.results_store = None
+        self._lock = threading.Lock()
+        self._file = None
+    
+    def use_results_store(self, results_store):
+        """Also write every generation to a ResultsStore's attempts table"""
+        self.results_store = results_store
+    
+    def record(self, payload, result):
+        """Append the metrics of one generation"""
+        line = {
+            "run": self.run_started,
+            "item": self.timings.current_item() if self.timings is not None else None,
+            "model": result.get("model") or payload.get("model"),
+            "endpoint": result.get("endpoint"),
+            "prompt_template": self.prompts.current() if self.prompts is not None else None,
+            "prompt_chars": len(payload.get("prompt", "")),
+            "done_reason": result.get("done_reason")
+        }
+        line.update({field: result.get(field) for field in METRIC_FIELDS})
+        with self._lock:
+            self.records.append(line)
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+                self._file = open(self.jsonl_path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(line) + "\n")
+            self._file.flush()
+        if self.results_store is not None:
+            self.results_store.add_attempt(line)
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    def print_summary(self):
+        """Print this run's token rates, prompt-eval share and model reloads"""
+        with self._lock:
+            records = list(self.records)
+        if not records:
+            return
+        summary = summarize_metrics(records)
+        print(f"\nOllama Generation Metrics:")
+        print(f"Generations recorded: {summary['generations']} ({summary['partial']} streams stopped early without server timings)")
+        if summary["prompt_tokens_per_second"] is not None:
+            print(f"Prompt evaluation: {summary['prompt_tokens']} tokens at {summary['prompt_tokens_per_second']:.1f} tokens/sec")
+        if summary["output_tokens_per_second"] is not None:
+            print(f"Generation: {summary['output_tokens']} tokens at {summary['output_tokens_per_second']:.1f} tokens/sec")
+        if summary["prompt_share"] is not None:
+            print(f"Prompt evaluation share of model time: {summary['prompt_share'] * 100:.1f}% (model loading {summary['load_share'] * 100:.1f}%)")
+        print(f"Model reloads: {len(summary['reloads'])}")
+        breakdown = template_breakdown(records)
+        if breakdown:
+            print(f"Prompt tokens by template:")
+            print_template_breakdown(breakdown, indent="  ")
+        print(f"Per-generation metrics written to {self.jsonl_path}")
@@ -0,0 +1,171 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+
+PASSAGES_DIR_NAME = "passages"  # Shared passage files, next to the rc_<rc>_<question>.json records
+QUESTION_METADATA_KEYS = ("rc_specific_type",)  # Metadata the model generates per question; it stays in the question record
+RECORD_PATTERN = "rc_*.json"
+
+def split_metadata(metadata):
+    """Split a record's metadata into the passage's shared part and the per-question part"""
+    shared = {key: value for key, value in metadata.items() if key not in QUESTION_METADATA_KEYS}
+    question = {key: value for key, value in metadata.items() if key in QUESTION_METADATA_KEYS}
+    return shared, question
+
+def passage_key(passage):
+    """Content hash of a passage entry ({"passage_text", "metadata"})"""
+    encoded = json.dumps(passage, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def reference_record(record, key, question_metadata):
+    """A record with its passage_text replaced by "passage_ref" and only the per-question metadata left"""
+    reference = {}
+    for field, value in record.items():
+        if field == "passage_text":
+            reference["passage_ref"] = key
+        elif field == "metadata":
+            reference["metadata"] = question_metadata
+        else:
+            reference[field] = value
+    return reference
+
+def embed_passage(record, passage):
+    """Inverse of reference_record(): put the passage text and shared metadata back into the record"""
+    expanded = {}
+    for field, value in record.items():
+        if field == "passage_ref":
+            expanded["passage_text"] = passage["passage_text"]
+        elif field == "metadata":
+            expanded["metadata"] = dict(passage["metadata"], **value)
+        else:
+            expanded[field] = value
+    return expanded
+
+def write_json(path, data, atomic=False):
+    """Write indented JSON and return the bytes written; `atomic` goes through a temporary file"""
+    text = json.dumps(data, indent=2, ensure_ascii=False)
+    target = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp" if atomic else path
+    with open(target, 'w', encoding='utf-8') as f:
+        f.write(text)
+    if atomic:
+        os.replace(target, path)
+    return len(text.encode("utf-8"))
+
+def nested_size(field, value):
+    """Bytes of `"field": value` as json.dump(indent=2) writes it one level into a record"""
+    text = f"{json.dumps(field)}: " + json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+    return len(text.encode("utf-8"))
+
+class PassageStore:
+    """Output layout for RC results that stores every passage once.
+    
+    save() writes a question record as rc_<rc>_<question>.json with its
+    passage_text and shared metadata replaced by "passage_ref", the content
+    hash of a passages/<hash>.json file holding them; metadata generated per
+    question (QUESTION_METADATA_KEYS) stays in the question record. load()
+    and iter_records() rebuild the usual per-question shape, reading each
+    passage file on first use only, and also accept records written in the
+    old embedded layout, so a directory may mix both.
+    
+    The bytes an embedded record would have taken are worked out from the
+    reference record's size by swapping the reference fields for the
+    embedded ones, which is computed once per passage.
+    Passage files are written atomically, since several processes may
+    write the same one.
+    """
+    
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.passages_dir = os.path.join(output_dir, PASSAGES_DIR_NAME)
+        self.records = 0
+        self.passages_written = 0
+        self.bytes_written = 0
+        self.embedded_bytes = 0
+        self.write_seconds = 0.0
+        self._embedded_sizes = {}
+        self._keys = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._known = set()
+        if os.path.isdir(self.passages_dir):
+            self._known = {name[:-len(".json")] for name in os.listdir(self.passages_dir) if name.endswith(".json")}
+    
+    def save(self, file_path, record):
+        """Write one question record, and its passage if the store does not have it yet"""
+        if "passage_text" not in record:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f, indent=2, ensure_ascii=False)
+            return
+        started = time.perf_counter()
+        shared, question_metadata = split_metadata(record.get("metadata") or {})
+        passage = {"passage_text": record["passage_text"], "metadata": shared}
+        
+        written = 0
+        with self._lock:
+            # The questions of a passage share its text, so it is hashed once rather than per record
+            keys = self._keys.setdefault(record["passage_text"], [])
+            key = next((key for metadata, key in keys if metadata == shared), None)
+            if key is None:
+                key = passage_key(passage)
+                keys.append((shared, key))
+            if key not in self._known:
+                os.makedirs(self.passages_dir, exist_ok=True)
+                written += write_json(os.path.join(self.passages_dir, f"{key}.json"), passage, atomic=True)
+                self._known.add(key)
+                self.passages_written += 1
+            size_key = (key, tuple(sorted(question_metadata.items())), "metadata" in record)
+            if size_key not in self._embedded_sizes:
+                # Bytes the embedded fields take beyond the reference fields that replace them
+                extra = nested_size("passage_text", record["passage_text"]) - nested_size("passage_ref", key)
+                if "metadata" in record:
+                    extra += nested_size("metadata", record["metadata"]) - nested_size("metadata", question_metadata)
+                self._embedded_sizes[size_key] = extra
+        
+        reference_bytes = write_json(file_path, reference_record(record, key, question_metadata))
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.records += 1
+            self.bytes_written += written + reference_bytes
+            self.embedded_bytes += reference_bytes + self._embedded_sizes[size_key]
+            self.write_seconds += elapsed
+    
+    def passage(self, key):
+        """Return a passage entry, reading its file the first time it is needed"""
+        with self._lock:
+            passage = self._cache.get(key)
+        if passage is None:
+            with open(os.path.join(self.passages_dir, f"{key}.json"), 'r', encoding='utf-8') as f:
+                passage = json.load(f)
+            with self._lock:
+                self._cache[key] = passage
+        return passage
+    
+    def expand(self, record):
+        """Rebuild the embedded per-question shape of a record; embedded records are returned as they are"""
+        if "passage_ref" not in record:
+            return record
+        return embed_passage(record, self.passage(record["passage_ref"]))
+    
+    def load(self, file_path):
+        """Read one rc_<rc>_<question>.json in the embedded shape, whichever layout it was written in"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return self.expand(json.load(f))
+    
+    def iter_records(self, pattern=RECORD_PATTERN):
+        """Yield (file path, expanded record) for every question record in the output directory, one at a time"""
+        for file_path in sorted(glob.glob(os.path.join(self.output_dir, pattern))):
+            yield file_path, self.load(file_path)
+    
+    def print_summary(self):
+        """Print the passages shared and the disk and write time saved against embedding every passage"""
+        with self._lock:
+            records, passages, written, embedded, seconds = self.records, self.passages_written, self.bytes_written, self.embedded_bytes, self.write_seconds
+        if not records:
+            return
+        print(f"\nShared Passage Storage:")
+        print(f"Question records written: {records}, new passages stored: {passages} (in {self.passages_dir})")
+        print(f"Bytes written: {written / 1024:.1f} KB instead of about {embedded / 1024:.1f} KB with embedded passages ({(1 - written / max(embedded, 1)) * 100:.1f}% saved)")
+        print(f"Write time: {seconds * 1000 / records:.2f} ms per record (convertRCOutputs.py --benchmark times both layouts)")
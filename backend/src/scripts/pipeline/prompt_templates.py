@@ -0,0 +1,49 @@
+import json
+import threading
+import zlib
+
+PROMPT_MODES = ["full", "compact", "ab"]  # "ab" splits items between the full and compact templates
+AB_TEMPLATES = ["full", "compact"]
+
+def compact_json(data):
+    """JSON without indentation or spaces, for data embedded in a compact prompt"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+class PromptTemplates:
+    """Chooses between a script's full and compact prompt for every item.
+    
+    In "full" or "compact" mode every item gets that template; in "ab" mode
+    each item key is hashed to one of them, so a run compares both on the
+    same data and an item keeps its template across retries and reruns. The
+    template chosen last on a thread is available as current(), which the
+    OllamaMetricsLog writes next to each generation's prompt_eval_count.
+    """
+    
+    def __init__(self, mode="full"):
+        if mode not in PROMPT_MODES:
+            raise ValueError(f"Unknown prompt mode {mode!r}; expected one of {PROMPT_MODES}")
+        self.mode = mode
+        self._local = threading.local()
+    
+    def select(self, key):
+        """Return the template for the item `key` and make it this thread's current one"""
+        if self.mode == "ab":
+            template = AB_TEMPLATES[zlib.crc32(str(key).encode("utf-8")) % len(AB_TEMPLATES)]
+        else:
+            template = self.mode
+        self.label(template)
+        return template
+    
+    def label(self, template):
+        """Name the prompt this thread sends next, for prompts that have a single template"""
+        self._local.template = template
+    
+    def current(self):
+        return getattr(self._local, "template", None)
+    
+    def build(self, key, full, compact, *args):
+        """Build the prompt for `key` with full(*args) or compact(*args); without a compact builder always full"""
+        if compact is None:
+            self.label("full")
+            return full(*args)
+        return compact(*args) if self.select(key) == "compact" else full(*args)
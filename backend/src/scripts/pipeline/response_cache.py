@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # Evict least recently used responses past 512 MB
+
+# Payload fields that do not change what the model generates
+NON_GENERATIVE_FIELDS = ("stream", "keep_alive")
+
+def cache_key(payload):
+    """Hash of everything in a generate payload that affects the output.
+    
+    That is the model name, options and prompt plus any other generation
+    inputs (format, system, context, ...). Keys are sorted so the same
+    request always hashes the same regardless of dict ordering.
+    """
+    material = {k: v for k, v in payload.items() if k not in NON_GENERATIVE_FIELDS}
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Content-addressed on-disk cache of Ollama /api/generate responses.
+    
+    Responses live in a single SQLite file so concurrent threads and several
+    scripts can share it. The total stored size is bounded; when a write pushes
+    it past max_bytes the least recently used entries are deleted.
+    """
+    
+    def __init__(self, db_path, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    
+    def get(self, key):
+        """Return the cached response for a key, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+    
+    def put(self, key, response, model=None):
+        """Store a response and evict old entries if the cache is over its size bound"""
+        encoded = json.dumps(response, ensure_ascii=False)
+        size = len(encoded.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, encoded, size, now, now)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self.writes += 1
+            self._evict()
+            self._conn.commit()
+    
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC").fetchall()
+        for key, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_bytes -= size
+            self.evictions += 1
+    
+    def stats(self):
+        """Return hit/miss counters and the current cache size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": self._total_bytes
+        }
+    
+    def print_summary(self):
+        """Print cache counters for the run summary"""
+        stats = self.stats()
+        print(f"\nResponse Cache Statistics:")
+        print(f"Cache hits: {stats['hits']}")
+        print(f"Cache misses: {stats['misses']}")
+        print(f"Hit rate: {stats['hit_rate']*100:.1f}%")
+        print(f"Evictions: {stats['evictions']}")
+        print(f"Cache size: {stats['entries']} responses, {stats['size_bytes']/1024/1024:.1f} MB")
+    
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,253 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pipeline.ollama_metrics import METRIC_FIELDS
+from pipeline.passage_store import split_metadata, passage_key, reference_record, embed_passage
+
+BATCH_SIZE = 200  # Rows buffered before they are written in one transaction
+BATCH_SECONDS = 5.0  # ...or after this many seconds, whichever comes first
+
+ATTEMPT_FIELDS = ["run", "item", "model", "endpoint", "prompt_template", "prompt_chars", "done_reason"] + METRIC_FIELDS
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS items (
+        dataset TEXT NOT NULL,
+        output_name TEXT NOT NULL,
+        file_name TEXT,
+        item_id TEXT,
+        question_number INTEGER,
+        valid INTEGER NOT NULL,
+        error TEXT,
+        passage_ref TEXT,
+        record TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (dataset, output_name)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_items_question ON items (dataset, question_number)",
+    "CREATE INDEX IF NOT EXISTS idx_items_valid ON items (dataset, valid)",
+    """
+    CREATE TABLE IF NOT EXISTS passages (
+        key TEXT PRIMARY KEY,
+        passage TEXT NOT NULL
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS attempts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dataset TEXT NOT NULL,
+        {", ".join(ATTEMPT_FIELDS)},
+        created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_attempts_item ON attempts (dataset, item)",
+    """
+    CREATE TABLE IF NOT EXISTS errors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dataset TEXT NOT NULL,
+        file_name TEXT,
+        item_id TEXT,
+        message TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_errors_dataset ON errors (dataset, file_name)"
+]
+
+# An invalid record never replaces a valid one, just as a failed item never overwrites its JSON file
+UPSERT_ITEM = """
+    INSERT INTO items (dataset, output_name, file_name, item_id, question_number, valid, error, passage_ref, record, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (dataset, output_name) DO UPDATE SET
+        file_name = excluded.file_name, item_id = excluded.item_id, question_number = excluded.question_number,
+        valid = excluded.valid, error = excluded.error, passage_ref = excluded.passage_ref,
+        record = excluded.record, updated_at = excluded.updated_at
+    WHERE excluded.valid >= items.valid
+"""
+
+def encode(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+class ResultsStore:
+    """SQLite sink for one dataset's results, LLM attempts and errors.
+    
+    Replaces the per-item JSON files: save() keeps each record in the items
+    table under the file name it would have been written to, with its
+    question number and whether it passed validation. RC passages go to the
+    passages table once per content hash and records refer to them with
+    "passage_ref", as in PassageStore. Attached to an OllamaMetricsLog,
+    every generation is kept as a row of attempts.
+    
+    Rows are buffered and written in one transaction per BATCH_SIZE rows or
+    BATCH_SECONDS; `saved` counts the records handed to save() and
+    `committed` how many of them are on disk, so callers can hold back their
+    checkpoint until a record is committed. The database runs in WAL mode
+    so it can be read (or exported with exportResults.py) during a run.
+    """
+    
+    def __init__(self, db_path, dataset=None, batch_size=BATCH_SIZE, batch_seconds=BATCH_SECONDS):
+        self.db_path = db_path
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.saved = 0
+        self.committed = 0
+        self.stats = {"items": 0, "invalid": 0, "passages": 0, "attempts": 0, "errors": 0, "commits": 0, "commit_seconds": 0.0}
+        self._rows = {"items": [], "passages": [], "attempts": [], "errors": []}
+        self._pending = 0
+        self._batch_started = None
+        self._keys = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self._known = {row[0] for row in self._conn.execute("SELECT key FROM passages")}
+    
+    def _passage_ref(self, record):
+        """Queue the record's passage unless it is stored already and return its key and per-question metadata"""
+        shared, question_metadata = split_metadata(record.get("metadata") or {})
+        # The questions of a passage share its text, so it is hashed once rather than per record
+        keys = self._keys.setdefault(record["passage_text"], [])
+        key = next((key for metadata, key in keys if metadata == shared), None)
+        if key is None:
+            passage = {"passage_text": record["passage_text"], "metadata": shared}
+            key = passage_key(passage)
+            keys.append((shared, key))
+            if key not in self._known:
+                self._rows["passages"].append((key, encode(passage)))
+                self._known.add(key)
+                self._pending += 1
+        return key, question_metadata
+    
+    def save(self, output_name, record, file_name=None, item_id=None, question_number=None, error=None):
+        """Queue one item's record; `error` marks a record that failed validation. Returns True if a batch was committed"""
+        with self._lock:
+            key = None
+            if "passage_text" in record:
+                key, question_metadata = self._passage_ref(record)
+                record = reference_record(record, key, question_metadata)
+            self._rows["items"].append((self.dataset, output_name, file_name, item_id, question_number,
+                                        int(error is None), error, key, encode(record), time.time()))
+            self.saved += 1
+            self.stats["invalid" if error is not None else "items"] += 1
+            return self._queued()
+    
+    def add_attempt(self, line):
+        """Queue one generation as written by OllamaMetricsLog"""
+        with self._lock:
+            self._rows["attempts"].append((self.dataset,) + tuple(line.get(field) for field in ATTEMPT_FIELDS) + (time.time(),))
+            self.stats["attempts"] += 1
+            return self._queued()
+    
+    def add_error(self, message, file_name=None, item_id=None):
+        with self._lock:
+            self._rows["errors"].append((self.dataset, file_name, item_id, message, time.time()))
+            self.stats["errors"] += 1
+            return self._queued()
+    
+    def _queued(self):
+        """Count a queued row and commit the batch if it is full or old enough"""
+        self._pending += 1
+        if self._batch_started is None:
+            self._batch_started = time.time()
+        if self._pending >= self.batch_size or time.time() - self._batch_started >= self.batch_seconds:
+            self._commit()
+            return True
+        return False
+    
+    def _commit(self):
+        """Write every queued row in one transaction"""
+        if not self._pending:
+            return
+        started = time.perf_counter()
+        rows = self._rows
+        with self._conn:
+            if rows["passages"]:
+                self._conn.executemany("INSERT OR IGNORE INTO passages (key, passage) VALUES (?, ?)", rows["passages"])
+            if rows["items"]:
+                self._conn.executemany(UPSERT_ITEM, rows["items"])
+            if rows["attempts"]:
+                self._conn.executemany(
+                    f"INSERT INTO attempts (dataset, {', '.join(ATTEMPT_FIELDS)}, created_at) VALUES ({', '.join('?' * (len(ATTEMPT_FIELDS) + 2))})",
+                    rows["attempts"])
+            if rows["errors"]:
+                self._conn.executemany("INSERT INTO errors (dataset, file_name, item_id, message, created_at) VALUES (?, ?, ?, ?, ?)", rows["errors"])
+        self.stats["passages"] += len(rows["passages"])
+        self.stats["commits"] += 1
+        self.stats["commit_seconds"] += time.perf_counter() - started
+        self._rows = {table: [] for table in rows}
+        self._pending = 0
+        self._batch_started = None
+        self.committed = self.saved
+    
+    def flush(self):
+        """Commit whatever is queued"""
+        with self._lock:
+            self._commit()
+    
+    def passage(self, key):
+        """Return a stored passage entry, reading it from the database the first time it is needed"""
+        passage = self._cache.get(key)
+        if passage is None:
+            with self._lock:
+                row = self._conn.execute("SELECT passage FROM passages WHERE key = ?", (key,)).fetchone()
+            passage = self._cache[key] = json.loads(row[0])
+        return passage
+    
+    def datasets(self):
+        """Return {dataset: {"valid", "invalid", "attempts", "errors"}} for everything in the database"""
+        counts = {}
+        with self._lock:
+            for dataset, valid, count in self._conn.execute("SELECT dataset, valid, COUNT(*) FROM items GROUP BY dataset, valid"):
+                counts.setdefault(dataset, {"valid": 0, "invalid": 0, "attempts": 0, "errors": 0})["valid" if valid else "invalid"] = count
+            for table in ("attempts", "errors"):
+                for dataset, count in self._conn.execute(f"SELECT dataset, COUNT(*) FROM {table} GROUP BY dataset"):
+                    counts.setdefault(dataset, {"valid": 0, "invalid": 0, "attempts": 0, "errors": 0})[table] = count
+        return counts
+    
+    def iter_records(self, dataset, valid=True):
+        """Yield (output_name, record) for a dataset's items in question order, with RC passages embedded again"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT output_name, record FROM items WHERE dataset = ? AND valid = ? ORDER BY question_number, output_name",
+                (dataset, int(valid))).fetchall()
+        for output_name, encoded in rows:
+            record = json.loads(encoded)
+            if "passage_ref" in record:
+                record = embed_passage(record, self.passage(record["passage_ref"]))
+            yield output_name, record
+    
+    def export(self, dataset, output_dir):
+        """Write a dataset's valid records to output_dir as the indented JSON files the scripts write, and return how many"""
+        os.makedirs(output_dir, exist_ok=True)
+        count = 0
+        for output_name, record in self.iter_records(dataset):
+            with open(os.path.join(output_dir, output_name), 'w', encoding='utf-8') as f:
+                json.dump(record, f, indent=2, ensure_ascii=False)
+            count += 1
+        return count
+    
+    def print_summary(self):
+        """Print the rows written this run and the time spent committing them"""
+        stats = self.stats
+        print(f"\nResults Database:")
+        print(f"Records stored: {stats['items']} valid, {stats['invalid']} invalid; new passages: {stats['passages']}")
+        print(f"LLM attempts: {stats['attempts']}, errors: {stats['errors']}")
+        if stats["commits"]:
+            print(f"Transactions: {stats['commits']} in {stats['commit_seconds']:.2f} seconds ({stats['commit_seconds'] * 1000 / max(stats['items'] + stats['invalid'], 1):.2f} ms per record)")
+        print(f"Database: {self.db_path} (exportResults.py writes the JSON files)")
+    
+    def close(self):
+        """Commit whatever is queued and close the database connection"""
+        with self._lock:
+            self._commit()
+            self._conn.close()
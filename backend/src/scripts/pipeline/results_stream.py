@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+
+class ResultsStream:
+    """Append-only JSONL stream of processed results.
+    
+    Each result is written as one line the moment it is produced, replacing
+    the per-batch read-merge-rewrite of the whole all_processed_questions.json.
+    If a legacy JSON array exists and the stream does not, its entries are
+    imported once so compaction still covers earlier runs.
+    """
+    
+    def __init__(self, jsonl_path, legacy_json_path=None):
+        self.jsonl_path = jsonl_path
+        self.count = 0
+        self._lock = threading.Lock()
+        
+        if not os.path.exists(jsonl_path) and legacy_json_path and os.path.exists(legacy_json_path):
+            self._import_legacy(legacy_json_path)
+        
+        self._file = open(jsonl_path, 'a', encoding='utf-8')
+    
+    def _import_legacy(self, legacy_json_path):
+        """Seed the stream from an existing JSON array of results"""
+        try:
+            with open(legacy_json_path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Could not import {legacy_json_path}: {str(e)}")
+            return
+        
+        with open(self.jsonl_path, 'w', encoding='utf-8') as out:
+            # Oldest first, so entries from this run supersede them during compaction
+            for result in reversed(previous):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"Imported {len(previous)} results from {legacy_json_path}")
+    
+    def append(self, result):
+        """Append a single result"""
+        line = json.dumps(result, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.count += 1
+    
+    def close(self):
+        """Close the stream"""
+        with self._lock:
+            self._file.close()
+
+def compact_results(jsonl_path, json_path, key="question_number"):
+    """Consolidate a results stream into a JSON array in a single streaming pass.
+    
+    Only byte offsets are kept in memory: the stream is read once to find the
+    latest line for each key (a result re-processed in a later run supersedes
+    the earlier one), then those lines are copied into the array one at a
+    time. Returns the number of results written.
+    """
+    latest_offsets = {}
+    with open(jsonl_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                try:
+                    item_key = json.loads(line).get(key, offset)
+                except json.JSONDecodeError:
+                    # A torn final line from an interrupted write
+                    item_key = None
+                if item_key is not None:
+                    # Re-inserting moves the key to the end, preserving latest-write order
+                    latest_offsets.pop(item_key, None)
+                    latest_offsets[item_key] = offset
+            offset += len(line)
+    
+    tmp_path = json_path + ".tmp"
+    with open(jsonl_path, 'rb') as src, open(tmp_path, 'w', encoding='utf-8') as out:
+        out.write("[")
+        for index, line_offset in enumerate(latest_offsets.values()):
+            src.seek(line_offset)
+            result = json.loads(src.readline())
+            out.write(",\n" if index else "\n")
+            out.write(json.dumps(result, indent=2, ensure_ascii=False))
+        out.write("\n]\n")
+    os.replace(tmp_path, json_path)
+    return len(latest_offsets)
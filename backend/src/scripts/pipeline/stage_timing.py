@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pipeline.adaptive_concurrency import percentile
+
+# Pipeline stages in the order an item goes through them
+STAGES = ["file_read", "html_parse", "prompt_build", "cache_read", "queue_wait", "http_wait", "json_extract", "result_write", "checkpoint_write"]
+HISTOGRAM_WIDTH = 30  # Bar length in the summary for a stage that takes all of the time
+
+class StageClock:
+    """Stopwatch for consecutive stages of one item; lap(stage) records the time since the previous lap"""
+    
+    def __init__(self, timings, item):
+        self.timings = timings
+        self.item = item
+        self._last = time.perf_counter()
+    
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.timings.record(stage, now - self._last, self.item)
+        self._last = now
+
+class StageTimings:
+    """Wall time per pipeline stage for every item, written as JSONL.
+    
+    Stages are timed with `with timings.stage("http_wait"):` or with a
+    StageClock, and are attributed to the item passed in or else to the item
+    the current thread last passed to begin(), so a worker thread and the
+    main thread (which writes the checkpoint) can both add to one item.
+    finish(item) appends the item's stage times to jsonl_path as one line;
+    close() adds a summary line with p50/p95/p99 per stage, which
+    print_summary() also prints as a histogram of where the time went.
+    """
+    
+    def __init__(self, jsonl_path=None):
+        self.jsonl_path = jsonl_path
+        self.run_started = datetime.now().isoformat(timespec="seconds")
+        self.samples = {}
+        self._open = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = None
+    
+    def begin(self, item):
+        """Attribute stages timed on this thread without an explicit item to `item`"""
+        self._local.item = item
+    
+    def current_item(self):
+        """The item this thread last passed to begin(), or None"""
+        return getattr(self._local, "item", None)
+    
+    def _current(self, item):
+        return item if item is not None else self.current_item()
+    
+    def record(self, stage, seconds, item=None):
+        """Add `seconds` to one stage of an item"""
+        item = self._current(item)
+        with self._lock:
+            stages = self._open.setdefault(item, {})
+            stages[stage] = stages.get(stage, 0.0) + seconds
+    
+    @contextmanager
+    def stage(self, stage, item=None):
+        """Time the enclosed block as `stage`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, item)
+    
+    def clock(self, item=None):
+        """Start a StageClock for an item (default: this thread's current item)"""
+        return StageClock(self, self._current(item))
+    
+    def take(self):
+        """Remove and return the unfinished items, to hand them from a worker process to the parent"""
+        with self._lock:
+            taken, self._open = self._open, {}
+        return taken
+    
+    def merge(self, taken):
+        """Add unfinished items returned by take() in another process"""
+        for item, stages in taken.items():
+            for stage, seconds in stages.items():
+                self.record(stage, seconds, item)
+    
+    def finish(self, item=None, ok=True):
+        """Close an item: count its stage times in the summary and append its JSONL line"""
+        item = self._current(item)
+        if getattr(self._local, "item", None) == item:
+            self._local.item = None
+        with self._lock:
+            stages = self._open.pop(item, None)
+            if stages is None:
+                return
+            for stage, seconds in stages.items():
+                self.samples.setdefault(stage, []).append(seconds)
+            if self.jsonl_path is None:
+                return
+            if self._file is None:
+                self._file = open(self.jsonl_path, 'a', encoding='utf-8')
+            line = {
+                "run": self.run_started,
+                "item": item,
+                "ok": ok,
+                "stages": {stage: round(seconds, 6) for stage, seconds in stages.items()},
+                "total": round(sum(stages.values()), 6)
+            }
+            self._file.write(json.dumps(line) + "\n")
+            self._file.flush()
+    
+    def summary(self):
+        """Return {stage: {items, total, p50, p95, p99}} in seconds, in pipeline order"""
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+        ordered = [s for s in STAGES if s in samples] + sorted(s for s in samples if s not in STAGES)
+        return {
+            stage: {
+                "items": len(samples[stage]),
+                "total": sum(samples[stage]),
+                "p50": percentile(samples[stage], 50),
+                "p95": percentile(samples[stage], 95),
+                "p99": percentile(samples[stage], 99)
+            }
+            for stage in ordered
+        }
+    
+    def close(self):
+        """Append the run's summary line and close the JSONL file"""
+        summary = {stage: {k: round(v, 6) for k, v in s.items()} for stage, s in self.summary().items()}
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps({"run": self.run_started, "summary": summary}) + "\n")
+            self._file.close()
+            self._file = None
+    
+    def print_summary(self):
+        """Print per-stage percentiles in milliseconds with a bar for each stage's share of the time"""
+        summary = self.summary()
+        if not summary:
+            return
+        grand_total = sum(s["total"] for s in summary.values()) or 1
+        print(f"\nStage Timings (ms per item):")
+        print(f"{'Stage':<18}{'Items':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'Total s':>10}  Share")
+        for stage, s in summary.items():
+            share = s["total"] / grand_total
+            bar = "#" * round(share * HISTOGRAM_WIDTH)
+            print(f"{stage:<18}{s['items']:>7}{s['p50'] * 1000:>10.2f}{s['p95'] * 1000:>10.2f}{s['p99'] * 1000:>10.2f}{s['total']:>10.2f}  {bar} {share * 100:.1f}%")
+        if self.jsonl_path is not None:
+            print(f"Per-item timings written to {self.jsonl_path}")
@@ -0,0 +1,200 @@
+import json
+import threading
+
+ANSWER_LETTERS = ["A", "B", "C", "D", "E"]
+SCHEMA_RETRIES = 2  # Extra generations allowed when a response violates the schema
+
+# The five answer choices every question record carries
+OPTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {letter: {"type": "string", "minLength": 1} for letter in ANSWER_LETTERS},
+    "required": ANSWER_LETTERS
+}
+
+JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool
+}
+
+class SchemaViolation(ValueError):
+    """A model response that is not valid JSON or does not match the response schema"""
+
+def question_schema(fields, enums=None):
+    """Build the response schema for a question record.
+    
+    `fields` lists the keys in the order the model should write them. "options"
+    and "correct_answer" get the A-E structure and "question_number" is an
+    integer; every other field is a non-empty string, restricted to the
+    values in `enums` when given.
+    """
+    enums = enums or {}
+    properties = {}
+    for field in fields:
+        if field == "options":
+            properties[field] = OPTIONS_SCHEMA
+        elif field == "question_number":
+            properties[field] = {"type": "integer"}
+        elif field == "correct_answer":
+            properties[field] = {"type": "string", "enum": ANSWER_LETTERS}
+        elif field in enums:
+            properties[field] = {"type": "string", "enum": list(enums[field])}
+        else:
+            properties[field] = {"type": "string", "minLength": 1}
+    return {"type": "object", "properties": properties, "required": list(fields)}
+
+def compile_schema(schema):
+    """Turn a JSON schema into a validator function, walking the schema only once.
+    
+    Supports the subset used for Ollama's `format` field: type, properties,
+    required, items, enum, minLength and minItems. The returned function raises
+    SchemaViolation naming the first offending path.
+    """
+    checks = []
+    
+    expected_type = schema.get("type")
+    if expected_type is not None:
+        python_type = JSON_TYPES[expected_type]
+        def check_type(value, path):
+            # bool is an int subclass, but JSON true/false is not a number
+            if not isinstance(value, python_type) or (isinstance(value, bool) and expected_type != "boolean"):
+                raise SchemaViolation(f"{path}: expected {expected_type}")
+        checks.append(check_type)
+    
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        def check_enum(value, path):
+            if value not in allowed:
+                raise SchemaViolation(f"{path}: {value!r} is not one of {allowed}")
+        checks.append(check_enum)
+    
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+        def check_min_length(value, path):
+            if len(value.strip()) < min_length:
+                raise SchemaViolation(f"{path}: shorter than {min_length} characters")
+        checks.append(check_min_length)
+    
+    if "required" in schema:
+        required = list(schema["required"])
+        def check_required(value, path):
+            missing = [key for key in required if key not in value]
+            if missing:
+                raise SchemaViolation(f"{path}: missing required keys {missing}")
+        checks.append(check_required)
+    
+    if "properties" in schema:
+        property_validators = {key: compile_schema(sub) for key, sub in schema["properties"].items()}
+        def check_properties(value, path):
+            for key, validate in property_validators.items():
+                if key in value:
+                    validate(value[key], f"{path}.{key}")
+        checks.append(check_properties)
+    
+    if "minItems" in schema:
+        min_items = schema["minItems"]
+        def check_min_items(value, path):
+            if len(value) < min_items:
+                raise SchemaViolation(f"{path}: fewer than {min_items} items")
+        checks.append(check_min_items)
+    
+    if "items" in schema:
+        validate_item = compile_schema(schema["items"])
+        def check_items(value, path):
+            for index, item in enumerate(value):
+                validate_item(item, f"{path}[{index}]")
+        checks.append(check_items)
+    
+    def validate(value, path="$"):
+        for check in checks:
+            check(value, path)
+        return value
+    return validate
+
+class StructuredOutput:
+    """Ollama `format` mode for one response shape, plus generation counters.
+    
+    When enabled, the schema is sent as the generate payload's `format` so the
+    model can only emit JSON of that shape, and the response is checked
+    against the compiled schema. Only schema violations are retried, each with
+    a different seed so the retry is a new generation rather than a replay.
+    
+    The counters are kept in both modes so runs with and without --structured
+    can be compared on retries and tokens generated.
+    """
+    
+    def __init__(self, schema, max_retries=SCHEMA_RETRIES):
+        self.schema = schema
+        self.validate = compile_schema(schema)
+        self.max_retries = max_retries
+        self.enabled = False
+        self.responses = 0
+        self.tokens_generated = 0
+        self.retries = 0
+        self.repairs = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+    
+    def parse(self, response_text):
+        """Decode a structured response and validate it, raising SchemaViolation"""
+        try:
+            value = json.loads(response_text)
+        except json.JSONDecodeError as e:
+            raise SchemaViolation(f"invalid JSON: {str(e)}")
+        return self.validate(value)
+    
+    def generate(self, client, payload, timeout=None, endpoint=None):
+        """Generate with the schema as `format` and return (validated object, raw result).
+        
+        Transport errors propagate to the caller's own retry logic; after
+        max_retries schema violations the last SchemaViolation is raised.
+        """
+        payload = dict(payload, format=self.schema)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                self.record_retry()
+                payload["options"] = dict(payload.get("options", {}), seed=attempt)
+            result = client.generate(payload, timeout=timeout, endpoint=endpoint)
+            self.record_response(result)
+            try:
+                return self.parse(result.get("response", "")), result
+            except SchemaViolation as e:
+                self.record_repair()
+                last_error = e
+                print(f"Response did not match the schema ({str(e)}), attempt {attempt + 1}/{self.max_retries + 1}")
+        with self._lock:
+            self.failures += 1
+        raise last_error
+    
+    def record_response(self, result):
+        """Count one Ollama response and the tokens it generated"""
+        with self._lock:
+            self.responses += 1
+            self.tokens_generated += result.get("eval_count", 0) or 0
+    
+    def record_retry(self):
+        """Count a repeated generation for the same item"""
+        with self._lock:
+            self.retries += 1
+    
+    def record_repair(self):
+        """Count a response that was unusable as returned (bad JSON, missing keys, schema violation)"""
+        with self._lock:
+            self.repairs += 1
+    
+    def print_summary(self):
+        """Print retry and token counts for the run summary"""
+        print(f"\nGeneration Statistics:")
+        print(f"Output mode: {'JSON schema (format)' if self.enabled else 'free text'}")
+        print(f"Responses received: {self.responses}")
+        print(f"Tokens generated: {self.tokens_generated}")
+        if self.responses:
+            print(f"Average tokens per response: {self.tokens_generated / self.responses:.1f}")
+        print(f"Retries: {self.retries}")
+        print(f"Unusable responses: {self.repairs}")
+        if self.enabled:
+            print(f"Items that failed schema validation after retries: {self.failures}")
@@ -0,0 +1,103 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+EWMA_ALPHA = 0.2  # Weight of the newest sample; about the last 10 items dominate the average
+
+def format_duration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}h {minutes}m {seconds}s"
+
+class ThroughputTracker:
+    """Smoothed item and token throughput, and the ETA derived from it.
+    
+    record_item() is called once per finished item (saved or failed). The
+    gap between finishes is averaged with an exponentially weighted moving
+    average, so the rate follows the current speed without jumping on a
+    single slow question, and the ETA is the remaining item count times that
+    smoothed gap. Attached to an OllamaClient (use_throughput_tracker), every
+    generation also feeds eval_count/eval_duration into a token rate, which
+    shows how fast the model itself is running independent of retries,
+    parsing or I/O. `total` is the number of items this run will process and
+    may be updated while the run learns it.
+    """
+    
+    def __init__(self, total=None, alpha=EWMA_ALPHA):
+        self.total = total
+        self.alpha = alpha
+        self.started = time.time()
+        self.items = 0
+        self.failed = 0
+        self.generations = 0
+        self.eval_count = 0
+        self.eval_seconds = 0.0
+        self.item_interval = None
+        self.token_rate = None
+        self._last_item = self.started
+        self._lock = threading.Lock()
+    
+    def _smooth(self, average, sample):
+        return sample if average is None else self.alpha * sample + (1 - self.alpha) * average
+    
+    def record_item(self, ok=True):
+        """Count a finished item and update the smoothed time between items"""
+        now = time.time()
+        with self._lock:
+            self.items += 1
+            if not ok:
+                self.failed += 1
+            self.item_interval = self._smooth(self.item_interval, now - self._last_item)
+            self._last_item = now
+    
+    def record_generation(self, result):
+        """Add the eval_count/eval_duration of one Ollama response to the token rate"""
+        eval_count = result.get("eval_count") or 0
+        eval_seconds = (result.get("eval_duration") or 0) / 1e9
+        with self._lock:
+            self.generations += 1
+            if eval_count and eval_seconds > 0:
+                self.eval_count += eval_count
+                self.eval_seconds += eval_seconds
+                self.token_rate = self._smooth(self.token_rate, eval_count / eval_seconds)
+    
+    def items_per_second(self):
+        """Smoothed item throughput"""
+        with self._lock:
+            return 1 / self.item_interval if self.item_interval else 0.0
+    
+    def eta_seconds(self):
+        """Seconds until `total` items are done at the smoothed rate, or None if unknown"""
+        with self._lock:
+            if self.total is None or self.item_interval is None:
+                return None
+            return max(self.total - self.items, 0) * self.item_interval
+    
+    def progress_line(self):
+        """One-line progress: items done, smoothed rates and ETA"""
+        with self._lock:
+            done, total, token_rate = self.items, self.total, self.token_rate
+        parts = [f"{done}/{total} items ({done / total * 100:.1f}%)" if total else f"{done} items"]
+        parts.append(f"{self.items_per_second():.2f} items/sec")
+        if token_rate is not None:
+            parts.append(f"{token_rate:.1f} tokens/sec")
+        eta = self.eta_seconds()
+        if eta is not None:
+            finish = datetime.now() + timedelta(seconds=eta)
+            parts.append(f"ETA {format_duration(eta)} ({finish.strftime('%H:%M:%S')})")
+        return "Progress: " + ", ".join(parts)
+    
+    def print_summary(self):
+        """Print overall and smoothed throughput for the run report"""
+        elapsed = time.time() - self.started
+        with self._lock:
+            items, failed, generations = self.items, self.failed, self.generations
+            eval_count, eval_seconds, token_rate = self.eval_count, self.eval_seconds, self.token_rate
+        print(f"\nThroughput Statistics:")
+        print(f"Items finished: {items} ({failed} failed) in {format_duration(elapsed)}")
+        if elapsed > 0:
+            print(f"Average throughput: {items / elapsed:.2f} items/sec")
+        print(f"Recent throughput (EWMA): {self.items_per_second():.2f} items/sec")
+        if eval_seconds > 0:
+            print(f"Tokens generated: {eval_count} in {generations} generations ({eval_count / max(items, 1):.0f} per item)")
+            print(f"Generation speed: {eval_count / eval_seconds:.1f} tokens/sec overall, {token_rate:.1f} tokens/sec recent (EWMA)")
@@ -1,38 +1,36 @@
 #!/usr/bin/env python3
 import os
-import json
-import glob
-import requests
-import time
-import random
-import argparse
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from pipeline.structured_output import question_schema
+from pipeline.stage_timing import StageTimings
+from pipeline.explanation_only import split_cr_question
+from pipeline.html_parsing import parse_html
 
 # Constants for CR GMAT Prep Questions - Sequential Version
 HTML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/html_cr_gmatprep')
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/processed_cr_gmatprep_mistral7b_sequential')
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
-MODEL_NAME = "mistral:7b"  # Using the Mistral 7B model
 CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/mistral_cr_gmatprep_sequential_checkpoint.json')
 ERROR_LOG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/mistral_cr_gmatprep_sequential_errors.log')
-BATCH_SIZE = 10  # Process in batches for checkpoint frequency
-MAX_RETRIES = 3  # Maximum retries for API calls
-RETRY_DELAY = 3  # Delay between retries in seconds
-MIN_REQUEST_DELAY = 0.2  # Minimum delay between requests
-MAX_REQUEST_DELAY = 0.8  # Maximum delay between requests
-TEST_MODE_LIMIT = 3  # Limit to 3 questions for initial testing
+TIMINGS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/mistral_cr_gmatprep_sequential_timings.jsonl')  # Per-item stage timings, appended every run
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/mistral_cr_gmatprep_sequential_manifest.jsonl')  # Content hash and parser/prompt version of every checkpointed HTML file
+PROMPT_TEMPLATE = "full"  # Default prompt: full, compact, or ab to split questions between both (see --prompt)
+PARSER_VERSION = 1  # Bump when load_html_file changes what it extracts; checkpointed files are then processed again
+PROMPT_VERSION = 1  # Bump when the prompts change, for the same reason
+RESPONSE_SCHEMA = question_schema(["argument", "question_stem", "options", "correct_answer", "explanation", "cr_specific_type"])
+REQUIRED_KEYS = ["argument", "question_stem", "options", "correct_answer", "explanation", "question_type"]
+EXPLANATION_FIELDS = ["correct_answer", "explanation", "cr_specific_type"]  # Asked for with --explanation-only when the question splits cleanly
 
-# Create output directory if it doesn't exist
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Wall time of file_read and html_parse, recorded into the pipeline engine's report
+stage_timings = StageTimings()
 
 def load_html_file(file_path):
     """Load and parse HTML file"""
+    clock = stage_timings.clock()
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
+    clock.lap("file_read")
     
     # Parse HTML
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = parse_html(content)
     
     # Extract question number from filename
     question_number = os.path.basename(file_path).replace('cr_', '').replace('.html', '')
@@ -118,6 +116,7 @@ def load_html_file(file_path):
     
     # Get the HTML content
     html_content = str(soup.select_one('.question-container'))
+    clock.lap("html_parse")
     
     return {
         "question_number": question_number,
@@ -129,18 +128,29 @@ def load_html_file(file_path):
         "html_content": html_content
     }
 
-def extract_text_from_html(html_content):
-    """Extract plain text from HTML content"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    return soup.get_text(separator=' ', strip=True)
+def complete_parsed_response(parsed_json, question_data):
+    """Add stats and metadata to a parsed CR response and fix its question type"""
+    # Add the original stats and metadata if they're missing in the response
+    if "answer_stats" not in parsed_json:
+        parsed_json["answer_stats"] = question_data["answer_stats"]
+    if "session_stats" not in parsed_json:
+        parsed_json["session_stats"] = question_data["session_stats"]
+    
+    # Create metadata from original and add CR specific type
+    metadata = question_data["metadata"].copy()
+    if "cr_specific_type" in parsed_json:
+        metadata["cr_specific_type"] = parsed_json.pop("cr_specific_type")
+    parsed_json["metadata"] = metadata
+    
+    # Ensure question_type is "Critical Reasoning"
+    parsed_json["question_type"] = "Critical Reasoning"
+    
+    return parsed_json
 
-def generate_response(question_data, retry_count=0):
-    """Generate response using Ollama API with Mistral 7B specially designed for CR questions"""
-    # Extract plain text to help the model
-    plain_text = extract_text_from_html(question_data["html_content"])
-    
+def build_prompt(question_data):
+    """Build the Ollama prompt for a CR question"""
     # Create prompt for the model specifically for CR questions
-    prompt = f"""
+    return f"""
 You are an expert GMAT tutor. I will give you a GMAT Critical Reasoning (CR) question with multiple choice options. Your task is to ACCURATELY EXTRACT (not reformulate) the components of the question:
 
 1. VERBATIM EXTRACTION: Extract the exact argument/stimulus text as it appears in the original question. Do not reformulate, rephrase, or summarize.
@@ -173,94 +183,30 @@ IMPORTANT: Format your response ONLY as a valid JSON object with this exact stru
 I NEED THE EXACT ORIGINAL TEXT for the argument, question stem, and options - not your rephrased or reformulated versions. Use copy-paste, not rewording.
 """
 
-    # Send request to Ollama API with retry logic
-    try:
-        print(f"Sending API request to Ollama for question {question_data['question_number']}...")
-        timeout = 60  # Reduced timeout for faster processing
-        
-        response = requests.post(
-            OLLAMA_API_URL,
-            json={
-                "model": MODEL_NAME,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.05,  # Reduced temperature for more deterministic outputs
-                    "top_p": 0.95,
-                    "num_predict": 1500  # Reduced token limit for faster processing
-                }
-            },
-            timeout=timeout
-        )
-        
-        response.raise_for_status()
-        result = response.json()
-        
-        # Extract the response text
-        response_text = result.get("response", "")
-        
-        # Try to extract JSON from the response
-        try:
-            # Find the first { and the last }
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                
-                # Try to parse the JSON
-                try:
-                    parsed_json = json.loads(json_str)
-                    
-                    # Add the original stats and metadata if they're missing in the response
-                    if "answer_stats" not in parsed_json:
-                        parsed_json["answer_stats"] = question_data["answer_stats"]
-                    if "session_stats" not in parsed_json:
-                        parsed_json["session_stats"] = question_data["session_stats"]
-                    
-                    # Create metadata from original and add CR specific type
-                    metadata = question_data["metadata"].copy()
-                    if "cr_specific_type" in parsed_json:
-                        metadata["cr_specific_type"] = parsed_json.pop("cr_specific_type")
-                    parsed_json["metadata"] = metadata
-                    
-                    # Ensure question_type is "Critical Reasoning"
-                    parsed_json["question_type"] = "Critical Reasoning"
-                    
-                    # Validate the structure
-                    required_keys = ["argument", "question_stem", "options", "correct_answer", "explanation", "question_type"]
-                    missing_keys = [key for key in required_keys if key not in parsed_json]
-                    
-                    if missing_keys:
-                        # If keys are missing, try to manually extract them
-                        return manually_extract_components(response_text, question_data)
-                    
-                    return parsed_json
-                except json.JSONDecodeError:
-                    print(f"Error parsing JSON for question {question_data['question_number']}. Attempting manual extraction...")
-                    return manually_extract_components(response_text, question_data)
-            else:
-                print(f"Couldn't find valid JSON delimiters in response for question {question_data['question_number']}. Attempting manual extraction...")
-                return manually_extract_components(response_text, question_data)
-        except Exception as e:
-            print(f"Error processing response text: {str(e)}")
-            if retry_count < MAX_RETRIES:
-                print(f"Retrying ({retry_count + 1}/{MAX_RETRIES}) after {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
-                return generate_response(question_data, retry_count + 1)
-            else:
-                return {"error": f"Failed to extract valid JSON after {MAX_RETRIES} retries"}
-    
-    except requests.exceptions.RequestException as e:
-        print(f"API request error: {str(e)}")
-        if retry_count < MAX_RETRIES:
-            # Exponential backoff with jitter
-            delay = RETRY_DELAY * (2 ** retry_count) + random.uniform(0, 1)
-            print(f"Retrying ({retry_count + 1}/{MAX_RETRIES}) after {delay:.2f} seconds...")
-            time.sleep(delay)
-            return generate_response(question_data, retry_count + 1)
-        else:
-            return {"error": f"API request failed after {MAX_RETRIES} retries: {str(e)}"}
+def build_compact_prompt(question_data):
+    """Build the compact CR prompt: the verbatim-extraction rule stated once, with a one-line output format"""
+    return f"""You are an expert GMAT tutor. Below is a GMAT Critical Reasoning question with options A-E.
+Copy the argument, the question stem and every option EXACTLY as written (no rephrasing), then pick the correct answer, name the CR question type (Assumption, Strengthen, Weaken, Inference, ...) and explain why it is correct.
+
+{question_data["question_text"]}
+
+Reply with only this JSON object:
+{{"argument": "...", "question_stem": "...", "options": {{"A": "...", "B": "...", "C": "...", "D": "...", "E": "..."}}, "correct_answer": "A-E", "explanation": "...", "question_type": "Critical Reasoning", "cr_specific_type": "..."}}
+"""
+
+def build_explanation_prompt(structure):
+    """Build the explanation-only CR prompt from the parsed argument, stem and options"""
+    options = "\n".join(f"{letter}: {structure['options'][letter]}" for letter in "ABCDE")
+    return f"""You are an expert GMAT tutor. Below is a GMAT Critical Reasoning question, already split into argument, question stem and options.
+Pick the correct answer, explain why it is correct, and name the CR question type (Assumption, Strengthen, Weaken, Inference, ...).
+
+Argument: {structure["argument"]}
+Question: {structure["question_stem"]}
+{options}
+
+Reply with only this JSON object:
+{{"correct_answer": "A-E", "explanation": "why the correct answer is correct", "cr_specific_type": "..."}}
+"""
 
 def manually_extract_components(text, question_data):
     """Attempt to manually extract components from the response text"""
@@ -343,182 +289,25 @@ def manually_extract_components(text, question_data):
     
     return result
 
-def save_result(file_path, result):
-    """Save result to a JSON file"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
-
-def load_checkpoint():
-    """Load checkpoint file if it exists"""
-    try:
-        if os.path.exists(CHECKPOINT_FILE):
-            with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"processed_files": []}
-    except Exception as e:
-        print(f"Error loading checkpoint: {str(e)}")
-        return {"processed_files": []}
-
-def save_checkpoint(processed_files):
-    """Save checkpoint information"""
-    try:
-        with open(CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
-            json.dump({"processed_files": processed_files}, f, indent=2)
-    except Exception as e:
-        print(f"Error saving checkpoint: {str(e)}")
-
-def process_file_sequentially(html_file, processed_files):
-    """Process a single file and return results"""
-    file_name = os.path.basename(html_file)
-    
-    # Check if already processed
-    if file_name in processed_files:
-        print(f"Skipping already processed file: {file_name}")
-        return {
-            "status": "skipped", 
-            "file_name": file_name,
-            "processing_time": 0
-        }
-    
-    print(f"\nProcessing file: {file_name}")
-    start_time = time.time()
-    
-    try:
-        # Load and parse HTML file
-        question_data = load_html_file(html_file)
-        
-        # Generate response
-        result = generate_response(question_data)
-        
-        # Check for errors
-        if "error" in result:
-            print(f"Error processing file {file_name}: {result['error']}")
-            with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"{timestamp} - {file_name}: {result['error']}\n")
-            processing_time = time.time() - start_time
-            print(f"Processing time for {file_name} (error): {processing_time:.2f} seconds")
-            return {
-                "status": "error", 
-                "file_name": file_name,
-                "processing_time": processing_time
-            }
-        
-        # Save result
-        output_file = os.path.join(OUTPUT_DIR, f"processed_{file_name.replace('.html', '.json')}")
-        save_result(output_file, result)
-        print(f"Saved processed result to {output_file}")
-        
-        # Calculate processing time
-        processing_time = time.time() - start_time
-        print(f"Processing time for {file_name}: {processing_time:.2f} seconds")
-        
-        return {
-            "status": "processed", 
-            "file_name": file_name,
-            "processing_time": processing_time
-        }
-    
-    except Exception as e:
-        processing_time = time.time() - start_time
-        print(f"Processing time for {file_name} (error): {processing_time:.2f} seconds")
-        print(f"Error processing file {file_name}: {str(e)}")
-        with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"{timestamp} - {file_name}: {str(e)}\n")
-        return {
-            "status": "error", 
-            "file_name": file_name,
-            "processing_time": processing_time
-        }
+def repair_record(record, question_data):
+    """Salvage a response that failed validation from its raw text, or fill its gaps with empty fields"""
+    if "raw_response" in record:
+        return manually_extract_components(record["raw_response"], question_data)
+    if "error" in record:
+        # Request failures and schema violations have no text to salvage
+        return record
+    repaired = manually_extract_components("", question_data)
+    repaired.update(record)
+    return repaired
 
-def process_all_files_sequentially(start_idx=None, end_idx=None, limit=None, test_mode=False):
-    """Process all HTML files in the directory sequentially (one at a time)"""
-    # Get list of all HTML files
-    html_files = sorted(glob.glob(os.path.join(HTML_DIR, "*.html")))
-    print(f"Found {len(html_files)} HTML files to process")
-    
-    # Load checkpoint
-    checkpoint = load_checkpoint()
-    processed_files = checkpoint.get("processed_files", [])
-    print(f"Found {len(processed_files)} already processed files in checkpoint")
-    
-    # Filter files based on parameters
-    if start_idx is not None and end_idx is not None:
-        html_files = html_files[start_idx:end_idx+1]
-        print(f"Processing files from index {start_idx} to {end_idx} ({len(html_files)} files)")
-    elif start_idx is not None:
-        html_files = html_files[start_idx:]
-        print(f"Processing files from index {start_idx} onwards ({len(html_files)} files)")
-    elif limit is not None:
-        html_files = html_files[:limit]
-        print(f"Processing first {limit} files")
-    elif test_mode:
-        html_files = html_files[:TEST_MODE_LIMIT]
-        print(f"TEST MODE: Processing first {TEST_MODE_LIMIT} files")
-    
-    # Process files one by one
-    num_processed = 0
-    num_skipped = 0
-    num_errors = 0
-    total_processing_time = 0
-    processing_times = []
-    
-    for i, html_file in enumerate(html_files):
-        print(f"Processing file {i+1}/{len(html_files)}")
-        result = process_file_sequentially(html_file, processed_files)
-        
-        if result["status"] == "processed":
-            num_processed += 1
-            processed_files.append(result["file_name"])
-            save_checkpoint(processed_files)
-            
-            # Track processing time
-            if result["processing_time"] > 0:
-                total_processing_time += result["processing_time"]
-                processing_times.append(result["processing_time"])
-        elif result["status"] == "error":
-            num_errors += 1
-        elif result["status"] == "skipped":
-            num_skipped += 1
-        
-        # Add a small delay between files to avoid overloading the API
-        if i < len(html_files) - 1:  # Don't delay after the last file
-            delay = random.uniform(MIN_REQUEST_DELAY, MAX_REQUEST_DELAY)
-            print(f"Waiting {delay:.2f} seconds before next file...")
-            time.sleep(delay)
-    
-    print(f"\nProcessing complete!")
-    print(f"Processed: {num_processed}")
-    print(f"Skipped (already processed): {num_skipped}")
-    print(f"Errors: {num_errors}")
-    print(f"Total files considered: {len(html_files)}")
-    
-    # Print timing statistics
-    if processing_times:
-        avg_time = total_processing_time / len(processing_times)
-        min_time = min(processing_times) if processing_times else 0
-        max_time = max(processing_times) if processing_times else 0
-        print(f"\nTiming Statistics:")
-        print(f"Average processing time: {avg_time:.2f} seconds per question")
-        print(f"Fastest processing time: {min_time:.2f} seconds")
-        print(f"Slowest processing time: {max_time:.2f} seconds")
-        print(f"Total processing time: {total_processing_time:.2f} seconds")
+def split_question(question_data):
+    """Return the argument, stem and options parsed from the question text, or None to use the full prompt"""
+    structure = split_cr_question(question_data["question_text"])
+    if structure is None:
+        print(f"Could not split question {question_data['question_number']} into argument, stem and options; using the full prompt")
+    return structure
 
 if __name__ == "__main__":
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description='Process CR GMAT Prep HTML files with Mistral 7B sequentially.')
-    parser.add_argument('--start', type=int, help='Starting index (0-based) of files to process')
-    parser.add_argument('--end', type=int, help='Ending index (0-based) of files to process')
-    parser.add_argument('--limit', type=int, help='Limit number of files to process')
-    parser.add_argument('--test', action='store_true', help='Run in test mode with limited files')
-    
-    args = parser.parse_args()
-    
-    # Process files
-    process_all_files_sequentially(
-        start_idx=args.start,
-        end_idx=args.end,
-        limit=args.limit,
-        test_mode=args.test
-    ) 
\ No newline at end of file
+    # Runs the "cr_gmatprep" dataset of runPipeline.py, which takes the same options
+    from runPipeline import main
+    main("cr_gmatprep", description='Process CR GMAT Prep HTML files with Mistral 7B.')
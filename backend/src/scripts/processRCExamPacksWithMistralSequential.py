@@ -1,39 +1,47 @@
 #!/usr/bin/env python3
 import os
-import json
-import glob
-import requests
-import time
-import random
-import argparse
 import re
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from pipeline.structured_output import question_schema
+from pipeline.stage_timing import StageTimings
+from pipeline.html_parsing import parse_html
 
 # Constants for RC Exam Packs Questions - Sequential Version
 HTML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/html_rc_exampacks')
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/processed_rc_exampacks_mistral7b_sequential_v2')
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
-MODEL_NAME = "mistral:7b"  # Using the Mistral 7B model
 CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/mistral_rc_exampacks_sequential_v2_checkpoint.json')
 ERROR_LOG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/mistral_rc_exampacks_sequential_v2_errors.log')
-BATCH_SIZE = 10  # Process in batches for checkpoint frequency
-MAX_RETRIES = 3  # Maximum retries for API calls
-RETRY_DELAY = 3  # Delay between retries in seconds
-MIN_REQUEST_DELAY = 0.2  # Minimum delay between requests
-MAX_REQUEST_DELAY = 0.8  # Maximum delay between requests
-TEST_MODE_LIMIT = 3  # Limit to 3 RC passages for initial testing
+TIMINGS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/mistral_rc_exampacks_sequential_v2_timings.jsonl')  # Per-item stage timings, appended every run
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/mistral_rc_exampacks_sequential_v2_manifest.jsonl')  # Content hash and parser/prompt version of every checkpointed HTML file
+PASSAGE_BATCH_NUM_PREDICT = 700  # Output token budget per question in passage-batched mode
+REQUIRED_KEYS = ["question_text", "options", "correct_answer", "explanation", "question_type"]
+PROMPT_TEMPLATE = "full"  # Default prompt: full, compact, or ab to split questions between both (see --prompt)
+PARSER_VERSION = 1  # Bump when load_html_file changes what it extracts; checkpointed files are then processed again
+PROMPT_VERSION = 1  # Bump when the prompts change, for the same reason
+RESPONSE_SCHEMA = question_schema(["question_text", "options", "correct_answer", "explanation", "rc_specific_type"])
+PASSAGE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": question_schema(["question_number", "question_text", "options", "correct_answer", "explanation", "rc_specific_type"])
+        }
+    },
+    "required": ["questions"]
+}
+EXPLANATION_FIELDS = ["explanation", "rc_specific_type"]  # Asked for with --tiered explanations; the HTML gives the rest
 
-# Create output directory if it doesn't exist
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Wall time of file_read and html_parse, recorded into the pipeline engine's report
+stage_timings = StageTimings()
 
 def load_html_file(file_path):
     """Load and parse HTML file with RC structure (passage + multiple questions)"""
+    clock = stage_timings.clock()
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
+    clock.lap("file_read")
     
     # Parse HTML
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = parse_html(content)
     
     # Extract RC number from filename
     rc_number = os.path.basename(file_path).replace('rc_', '').replace('.html', '')
@@ -244,6 +252,7 @@ def load_html_file(file_path):
             "session_stats": session_stats,
             "html_content": html_content
         })
+    clock.lap("html_parse")
     
     return {
         "rc_number": rc_number,
@@ -253,19 +262,99 @@ def load_html_file(file_path):
         "questions": questions
     }
 
-def extract_text_from_html(html_content):
-    """Extract plain text from HTML content"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    return soup.get_text(separator=' ', strip=True)
+def build_question_record(parsed_json, rc_data, question_data):
+    """Merge a parsed model response with the passage and question data into the saved record"""
+    # Add the original passage text
+    parsed_json["passage_text"] = rc_data["passage_text"]
+    
+    # Add RC number and question number
+    parsed_json["rc_number"] = rc_data["rc_number"]
+    parsed_json["question_number"] = question_data["question_number"]
+    
+    # Add the original stats if they're missing in the response
+    parsed_json["answer_stats"] = question_data["answer_stats"]
+    parsed_json["session_stats"] = question_data["session_stats"]
+    
+    # Create metadata from original and add RC specific type
+    metadata = rc_data["metadata"].copy()
+    if "rc_specific_type" in parsed_json:
+        metadata["rc_specific_type"] = parsed_json.pop("rc_specific_type")
+    parsed_json["metadata"] = metadata
+    
+    # Ensure question_type is "Reading Comprehension"
+    parsed_json["question_type"] = "Reading Comprehension"
+    
+    return parsed_json
+
+def is_complete_record(record):
+    """Check that a record has question text, five non-empty options, a letter answer and an explanation"""
+    if any(key not in record for key in REQUIRED_KEYS):
+        return False
+    options = record.get("options")
+    if not isinstance(options, dict) or not all(str(options.get(letter, "")).strip() for letter in "ABCDE"):
+        return False
+    return (
+        str(record.get("question_text", "")).strip() != ""
+        and str(record.get("correct_answer", "")).strip() in ("A", "B", "C", "D", "E")
+        and str(record.get("explanation", "")).strip() != ""
+    )
+
+def is_complete_extraction(question_data):
+    """Check that the HTML gave question text, five non-empty options and a letter answer"""
+    options = question_data.get("options") or {}
+    return (
+        str(question_data.get("question_text", "")).strip() != ""
+        and all(str(options.get(letter, "")).strip() for letter in "ABCDE")
+        and str(question_data.get("correct_answer", "")).strip() in ("A", "B", "C", "D", "E")
+    )
 
-def generate_response_for_question(rc_data, question_data, retry_count=0):
-    """Generate response using Ollama API with Mistral 7B specially designed for RC questions"""
-    # Extract plain text to help the model
-    plain_text = extract_text_from_html(question_data["html_content"])
+def extracted_fields(question_data):
+    """The fields the model would otherwise copy back verbatim, taken from the HTML"""
+    return {
+        "question_text": question_data["question_text"],
+        "options": dict(question_data["options"]),
+        "correct_answer": question_data["correct_answer"].strip()
+    }
+
+def extract_question(rc_data, question_data):
+    """Return the fields the HTML gives for a question if they are complete, else None"""
+    return extracted_fields(question_data) if is_complete_extraction(question_data) else None
+
+def build_explanation_prompt(rc_data, question_data):
+    """Build the explanation-only RC prompt: passage, question, options and the known answer"""
+    options = "\n".join(f"{letter}: {question_data['options'][letter]}" for letter in "ABCDE")
+    return f"""You are an expert GMAT tutor. Below is a GMAT Reading Comprehension passage, one of its questions with the answer options, and the correct answer.
+Explain why the correct answer is correct based on the passage, and name the RC question type.
+
+Passage:
+{rc_data["passage_text"]}
+
+Question: {question_data["question_text"]}
+{options}
+Correct answer: {question_data["correct_answer"].strip()}
+
+Reply with only this JSON object:
+{{"explanation": "why the correct answer is correct", "rc_specific_type": "Main Idea/Detail/Inference/..."}}
+"""
+
+def build_passage_batch_prompt(rc_data, questions):
+    """Build the prompt asking for every question of one passage, so the passage is evaluated once"""
+    questions_block = ""
+    for question_data in questions:
+        questions_block += f"""
+Question #{question_data["question_number"]}:
+{question_data["question_text"]}
+
+Options:
+A: {question_data["options"].get("A", "")}
+B: {question_data["options"].get("B", "")}
+C: {question_data["options"].get("C", "")}
+D: {question_data["options"].get("D", "")}
+E: {question_data["options"].get("E", "")}
+"""
     
-    # Create prompt for the model specifically for RC questions
-    prompt = f"""
-You are an expert GMAT tutor. I will give you a GMAT Reading Comprehension (RC) passage and a question with multiple choice options. Your task is to ACCURATELY EXTRACT (not reformulate) the components of the question:
+    return f"""
+You are an expert GMAT tutor. I will give you a GMAT Reading Comprehension (RC) passage followed by ALL of its questions with multiple choice options. For EVERY question, ACCURATELY EXTRACT (not reformulate) its components:
 
 1. VERBATIM EXTRACTION: Extract the exact question text as it appears.
 2. VERBATIM EXTRACTION: Extract all answer choices (A-E) exactly as they appear. DO NOT change, rephrase or rewrite the options in any way!
@@ -276,7 +365,60 @@ You are an expert GMAT tutor. I will give you a GMAT Reading Comprehension (RC)
 Here is the GMAT Reading Comprehension passage:
 {rc_data["passage_text"]}
 
-Here is question #{question_data["question_number"]} for this passage:
+Here are the {len(questions)} questions for this passage:
+{questions_block}
+IMPORTANT: Format your response ONLY as a valid JSON object with this exact structure, with one entry per question in the order given:
+{{
+  "questions": [
+    {{
+      "question_number": the question number shown above,
+      "question_text": "THE EXACT ORIGINAL TEXT of the question being asked - do not modify or rephrase",
+      "options": {{
+        "A": "THE EXACT ORIGINAL TEXT of option A",
+        "B": "THE EXACT ORIGINAL TEXT of option B",
+        "C": "THE EXACT ORIGINAL TEXT of option C",
+        "D": "THE EXACT ORIGINAL TEXT of option D",
+        "E": "THE EXACT ORIGINAL TEXT of option E"
+      }},
+      "correct_answer": "The letter of the correct answer (A, B, C, D, or E)",
+      "explanation": "Your explanation for why this answer is correct based on the passage",
+      "rc_specific_type": "Main Idea/Detail/Inference/etc."
+    }}
+  ]
+}}
+
+CRITICAL: DO NOT REPLACE, REPHRASE, OR REGENERATE the question text or options. Copy them EXACTLY as they appear in the prompt above.
+"""
+
+def passage_batch_records(parsed_json, rc_data, questions):
+    """Match the answers of a passage-batched response to their questions.
+    
+    Returns a dict of question_number -> record for the answers that pass
+    is_complete_record; the other questions fall back to per-question calls.
+    """
+    answers = parsed_json.get("questions", [])
+    if not isinstance(answers, list):
+        return {}
+    
+    # Match answers to questions by number, falling back to position
+    questions_by_number = {str(q["question_number"]): q for q in questions}
+    records = {}
+    for position, answer in enumerate(answers):
+        if not isinstance(answer, dict):
+            continue
+        question_data = questions_by_number.get(str(answer.pop("question_number", "")))
+        if question_data is None and position < len(questions):
+            question_data = questions[position]
+        if question_data is None or question_data["question_number"] in records:
+            continue
+        record = build_question_record(answer, rc_data, question_data)
+        if is_complete_record(record):
+            records[question_data["question_number"]] = record
+    return records
+
+def build_question_section(question_data):
+    """Build the question-specific tail of the RC prompt (question, options and output format)"""
+    return f"""Here is question #{question_data["question_number"]} for this passage:
 {question_data["question_text"]}
 
 Options:
@@ -305,99 +447,60 @@ IMPORTANT: Format your response ONLY as a valid JSON object with this exact stru
 CRITICAL: DO NOT REPLACE, REPHRASE, OR REGENERATE the question text or options. Copy them EXACTLY as they appear in the prompt above. Copy and paste the text rather than rewriting or rewording it.
 """
 
-    # Send request to Ollama API with retry logic
-    try:
-        print(f"Sending API request to Ollama for RC {rc_data['rc_number']} question {question_data['question_number']}...")
-        timeout = 60  # Reduced timeout for faster processing
-        
-        response = requests.post(
-            OLLAMA_API_URL,
-            json={
-                "model": MODEL_NAME,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.05,  # Reduced temperature for more deterministic outputs
-                    "top_p": 0.95,
-                    "num_predict": 1500  # Reduced token limit for faster processing
-                }
-            },
-            timeout=timeout
-        )
-        
-        response.raise_for_status()
-        result = response.json()
-        
-        # Extract the response text
-        response_text = result.get("response", "")
-        
-        # Try to extract JSON from the response
-        try:
-            # Find the first { and the last }
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                
-                # Try to parse the JSON
-                try:
-                    parsed_json = json.loads(json_str)
-                    
-                    # Add the original passage text
-                    parsed_json["passage_text"] = rc_data["passage_text"]
-                    
-                    # Add RC number and question number
-                    parsed_json["rc_number"] = rc_data["rc_number"]
-                    parsed_json["question_number"] = question_data["question_number"]
-                    
-                    # Add the original stats if they're missing in the response
-                    parsed_json["answer_stats"] = question_data["answer_stats"]
-                    parsed_json["session_stats"] = question_data["session_stats"]
-                    
-                    # Create metadata from original and add RC specific type
-                    metadata = rc_data["metadata"].copy()
-                    if "rc_specific_type" in parsed_json:
-                        metadata["rc_specific_type"] = parsed_json.pop("rc_specific_type")
-                    parsed_json["metadata"] = metadata
-                    
-                    # Ensure question_type is "Reading Comprehension"
-                    parsed_json["question_type"] = "Reading Comprehension"
-                    
-                    # Validate the structure
-                    required_keys = ["question_text", "options", "correct_answer", "explanation", "question_type"]
-                    missing_keys = [key for key in required_keys if key not in parsed_json]
-                    
-                    if missing_keys:
-                        # If keys are missing, try to manually extract them
-                        return manually_extract_components(response_text, rc_data, question_data)
-                    
-                    return parsed_json
-                except json.JSONDecodeError:
-                    print(f"Error parsing JSON for RC {rc_data['rc_number']} question {question_data['question_number']}. Attempting manual extraction...")
-                    return manually_extract_components(response_text, rc_data, question_data)
-            else:
-                print(f"Couldn't find valid JSON delimiters in response for RC {rc_data['rc_number']} question {question_data['question_number']}. Attempting manual extraction...")
-                return manually_extract_components(response_text, rc_data, question_data)
-        except Exception as e:
-            print(f"Error processing response text: {str(e)}")
-            if retry_count < MAX_RETRIES:
-                print(f"Retrying ({retry_count + 1}/{MAX_RETRIES}) after {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
-                return generate_response_for_question(rc_data, question_data, retry_count + 1)
-            else:
-                return {"error": f"Failed to extract valid JSON after {MAX_RETRIES} retries"}
-    
-    except requests.exceptions.RequestException as e:
-        print(f"API request error: {str(e)}")
-        if retry_count < MAX_RETRIES:
-            # Exponential backoff with jitter
-            delay = RETRY_DELAY * (2 ** retry_count) + random.uniform(0, 1)
-            print(f"Retrying ({retry_count + 1}/{MAX_RETRIES}) after {delay:.2f} seconds...")
-            time.sleep(delay)
-            return generate_response_for_question(rc_data, question_data, retry_count + 1)
-        else:
-            return {"error": f"API request failed after {MAX_RETRIES} retries: {str(e)}"}
+def build_question_prompt(rc_data, question_data):
+    """Build the full single-question RC prompt: instructions, passage and question section"""
+    # Create prompt for the model specifically for RC questions
+    return f"""
+You are an expert GMAT tutor. I will give you a GMAT Reading Comprehension (RC) passage and a question with multiple choice options. Your task is to ACCURATELY EXTRACT (not reformulate) the components of the question:
+
+1. VERBATIM EXTRACTION: Extract the exact question text as it appears.
+2. VERBATIM EXTRACTION: Extract all answer choices (A-E) exactly as they appear. DO NOT change, rephrase or rewrite the options in any way!
+3. Determine the correct answer for the question based on the passage.
+4. Identify the specific RC question type (main idea, detail, inference, etc.)
+5. Provide your explanation of why the correct answer is correct.
+
+Here is the GMAT Reading Comprehension passage:
+{rc_data["passage_text"]}
+
+""" + build_question_section(question_data)
+
+def build_compact_question_section(question_data):
+    """Build the compact question tail: the question, its options and a one-line output format"""
+    options = "\n".join(f"{letter}: {question_data['options'].get(letter, '')}" for letter in "ABCDE")
+    return f"""Question #{question_data["question_number"]}:
+{question_data["question_text"]}
+{options}
+
+Reply with only this JSON object, question and options copied EXACTLY as given:
+{{"question_text": "...", "options": {{"A": "...", "B": "...", "C": "...", "D": "...", "E": "..."}}, "correct_answer": "A-E", "explanation": "...", "question_type": "Reading Comprehension", "rc_specific_type": "Main Idea/Detail/Inference/..."}}
+"""
+
+def build_compact_question_prompt(rc_data, question_data):
+    """Build the compact single-question RC prompt: the extraction rules stated once, passage and compact question section"""
+    return f"""You are an expert GMAT tutor. Below is a GMAT Reading Comprehension passage and one of its questions.
+Copy the question text and options A-E EXACTLY (no rephrasing), pick the correct answer from the passage, name the RC question type and explain why it is correct.
+
+Passage:
+{rc_data["passage_text"]}
+
+""" + build_compact_question_section(question_data)
+
+def build_passage_prefix_prompt(rc_data):
+    """Build the instructions and passage evaluated once with --passage-prefix; the question sections continue from them"""
+    return f"""
+You are an expert GMAT tutor. I will give you a GMAT Reading Comprehension (RC) passage and then its questions with multiple choice options, one at a time. For each question, your task is to ACCURATELY EXTRACT (not reformulate) the components of the question:
+
+1. VERBATIM EXTRACTION: Extract the exact question text as it appears.
+2. VERBATIM EXTRACTION: Extract all answer choices (A-E) exactly as they appear. DO NOT change, rephrase or rewrite the options in any way!
+3. Determine the correct answer for the question based on the passage.
+4. Identify the specific RC question type (main idea, detail, inference, etc.)
+5. Provide your explanation of why the correct answer is correct.
+
+Here is the GMAT Reading Comprehension passage:
+{rc_data["passage_text"]}
+
+Reply only with OK. The questions follow.
+"""
 
 def manually_extract_components(text, rc_data, question_data):
     """Attempt to manually extract components from the response text for RC questions"""
@@ -468,279 +571,18 @@ def manually_extract_components(text, rc_data, question_data):
     
     return result
 
-def save_result(file_path, result):
-    """Save result to a JSON file"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
-    print(f"Saved result to {file_path}")
-
-def load_checkpoint():
-    """Load checkpoint file if it exists"""
-    try:
-        if os.path.exists(CHECKPOINT_FILE):
-            with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"processed_files": [], "processed_questions": []}
-    except Exception as e:
-        print(f"Error loading checkpoint: {str(e)}")
-        return {"processed_files": [], "processed_questions": []}
-
-def save_checkpoint(processed_files, processed_questions):
-    """Save checkpoint information"""
-    try:
-        with open(CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
-            json.dump({
-                "processed_files": processed_files,
-                "processed_questions": processed_questions
-            }, f, indent=2)
-    except Exception as e:
-        print(f"Error saving checkpoint: {str(e)}")
-
-def process_rc_questions_sequentially(rc_data, processed_questions):
-    """Process all questions in an RC passage sequentially"""
-    results = []
-    rc_number = rc_data["rc_number"]
-    
-    for question_data in rc_data["questions"]:
-        question_number = question_data["question_number"]
-        question_id = f"{rc_number}_{question_number}"
-        
-        # Check if already processed
-        if question_id in processed_questions:
-            print(f"Skipping already processed question: RC {rc_number} Question {question_number}")
-            results.append({
-                "status": "skipped", 
-                "rc_number": rc_number,
-                "question_number": question_number,
-                "question_id": question_id,
-                "processing_time": 0
-            })
-            continue
-        
-        print(f"\nProcessing RC {rc_number} Question {question_number}")
-        start_time = time.time()
-        
-        try:
-            # Generate response for this question
-            result = generate_response_for_question(rc_data, question_data)
-            
-            # Check for errors
-            if "error" in result:
-                print(f"Error processing RC {rc_number} Question {question_number}: {result['error']}")
-                with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    f.write(f"{timestamp} - RC {rc_number} Question {question_number}: {result['error']}\n")
-                processing_time = time.time() - start_time
-                print(f"Processing time for RC {rc_number} Question {question_number} (error): {processing_time:.2f} seconds")
-                results.append({
-                    "status": "error", 
-                    "rc_number": rc_number,
-                    "question_number": question_number,
-                    "question_id": question_id,
-                    "processing_time": processing_time
-                })
-                continue
-            
-            # Save result - use the format rc_[number]_[question_number].json
-            output_file = os.path.join(OUTPUT_DIR, f"rc_{rc_number}_{question_number}.json")
-            save_result(output_file, result)
-            print(f"Saved processed result to {output_file}")
-            
-            # Calculate processing time
-            processing_time = time.time() - start_time
-            print(f"Processing time for RC {rc_number} Question {question_number}: {processing_time:.2f} seconds")
-            
-            results.append({
-                "status": "processed", 
-                "rc_number": rc_number,
-                "question_number": question_number,
-                "question_id": question_id,
-                "processing_time": processing_time
-            })
-            
-            # Add a small delay between questions to avoid overloading the API
-            if question_number < len(rc_data["questions"]):  # Don't delay after the last question
-                delay = random.uniform(MIN_REQUEST_DELAY, MAX_REQUEST_DELAY)
-                print(f"Waiting {delay:.2f} seconds before next question...")
-                time.sleep(delay)
-        
-        except Exception as e:
-            processing_time = time.time() - start_time
-            print(f"Processing time for RC {rc_number} Question {question_number} (error): {processing_time:.2f} seconds")
-            print(f"Error processing RC {rc_number} Question {question_number}: {str(e)}")
-            with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"{timestamp} - RC {rc_number} Question {question_number}: {str(e)}\n")
-            results.append({
-                "status": "error", 
-                "rc_number": rc_number,
-                "question_number": question_number,
-                "question_id": question_id,
-                "processing_time": processing_time
-            })
-    
-    return results
-
-def process_file_sequentially(html_file, processed_files, processed_questions):
-    """Process a single RC HTML file and all its questions sequentially"""
-    file_name = os.path.basename(html_file)
-    
-    # Check if already processed completely
-    if file_name in processed_files:
-        print(f"Skipping already processed file: {file_name}")
-        return {
-            "status": "skipped", 
-            "file_name": file_name,
-            "processing_time": 0,
-            "question_results": []
-        }
-    
-    print(f"\nProcessing file: {file_name}")
-    start_time = time.time()
-    
-    try:
-        # Load and parse HTML file
-        rc_data = load_html_file(html_file)
-        
-        # Process all questions in this RC passage
-        question_results = process_rc_questions_sequentially(rc_data, processed_questions)
-        
-        # Calculate total processing time
-        processing_time = time.time() - start_time
-        print(f"Total processing time for {file_name}: {processing_time:.2f} seconds")
-        
-        return {
-            "status": "processed", 
-            "file_name": file_name,
-            "processing_time": processing_time,
-            "question_results": question_results
-        }
-    
-    except Exception as e:
-        processing_time = time.time() - start_time
-        print(f"Processing time for {file_name} (error): {processing_time:.2f} seconds")
-        print(f"Error processing file {file_name}: {str(e)}")
-        with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"{timestamp} - {file_name}: {str(e)}\n")
-        return {
-            "status": "error", 
-            "file_name": file_name,
-            "processing_time": processing_time,
-            "question_results": []
-        }
-
-def process_all_files_sequentially(start_idx=None, end_idx=None, limit=None, test_mode=False):
-    """Process all RC HTML files in the directory sequentially (one at a time)"""
-    # Get list of all HTML files
-    html_files = sorted(glob.glob(os.path.join(HTML_DIR, "*.html")))
-    print(f"Found {len(html_files)} RC HTML files to process")
-    
-    # Load checkpoint
-    checkpoint = load_checkpoint()
-    processed_files = checkpoint.get("processed_files", [])
-    processed_questions = checkpoint.get("processed_questions", [])
-    print(f"Found {len(processed_files)} already processed files in checkpoint")
-    print(f"Found {len(processed_questions)} already processed questions in checkpoint")
-    
-    # Filter files based on parameters
-    if start_idx is not None and end_idx is not None:
-        html_files = html_files[start_idx:end_idx+1]
-        print(f"Processing files from index {start_idx} to {end_idx} ({len(html_files)} files)")
-    elif start_idx is not None:
-        html_files = html_files[start_idx:]
-        print(f"Processing files from index {start_idx} onwards ({len(html_files)} files)")
-    elif limit is not None:
-        html_files = html_files[:limit]
-        print(f"Processing first {limit} files")
-    elif test_mode:
-        html_files = html_files[:TEST_MODE_LIMIT]
-        print(f"TEST MODE: Processing first {TEST_MODE_LIMIT} files")
-    
-    # Process files one by one
-    num_files_processed = 0
-    num_files_skipped = 0
-    num_files_errors = 0
-    num_questions_processed = 0
-    num_questions_skipped = 0
-    num_questions_errors = 0
-    total_processing_time = 0
-    processing_times = []
-    
-    for i, html_file in enumerate(html_files):
-        print(f"Processing file {i+1}/{len(html_files)}")
-        result = process_file_sequentially(html_file, processed_files, processed_questions)
-        
-        if result["status"] == "processed":
-            num_files_processed += 1
-            file_name = result["file_name"]
-            
-            # Add to processed files only if all questions were successfully processed
-            if not any(q["status"] == "error" for q in result["question_results"]):
-                processed_files.append(file_name)
-            
-            # Update question processing stats
-            for q_result in result["question_results"]:
-                if q_result["status"] == "processed":
-                    num_questions_processed += 1
-                    processed_questions.append(q_result["question_id"])
-                elif q_result["status"] == "error":
-                    num_questions_errors += 1
-                elif q_result["status"] == "skipped":
-                    num_questions_skipped += 1
-            
-            # Save checkpoint after each file
-            save_checkpoint(processed_files, processed_questions)
-            
-            # Track processing time
-            if result["processing_time"] > 0:
-                total_processing_time += result["processing_time"]
-                processing_times.append(result["processing_time"])
-        elif result["status"] == "error":
-            num_files_errors += 1
-        elif result["status"] == "skipped":
-            num_files_skipped += 1
-        
-        # Add a small delay between files to avoid overloading the API
-        if i < len(html_files) - 1:  # Don't delay after the last file
-            delay = random.uniform(MIN_REQUEST_DELAY, MAX_REQUEST_DELAY)
-            print(f"Waiting {delay:.2f} seconds before next file...")
-            time.sleep(delay)
-    
-    print(f"\nProcessing complete!")
-    print(f"Files processed: {num_files_processed}")
-    print(f"Files skipped: {num_files_skipped}")
-    print(f"Files with errors: {num_files_errors}")
-    print(f"Total files considered: {len(html_files)}")
-    print(f"\nQuestions processed: {num_questions_processed}")
-    print(f"Questions skipped: {num_questions_skipped}")
-    print(f"Questions with errors: {num_questions_errors}")
-    
-    # Print timing statistics
-    if processing_times:
-        avg_time = total_processing_time / len(processing_times)
-        min_time = min(processing_times) if processing_times else 0
-        max_time = max(processing_times) if processing_times else 0
-        print(f"\nTiming Statistics:")
-        print(f"Average processing time: {avg_time:.2f} seconds per RC file")
-        print(f"Fastest processing time: {min_time:.2f} seconds")
-        print(f"Slowest processing time: {max_time:.2f} seconds")
-        print(f"Total processing time: {total_processing_time:.2f} seconds")
+def repair_record(record, rc_data, question_data):
+    """Salvage a response that failed validation from its raw text, or fill its gaps from the HTML"""
+    if "raw_response" in record:
+        return manually_extract_components(record["raw_response"], rc_data, question_data)
+    if "error" in record:
+        # Request failures and schema violations have no text to salvage
+        return record
+    repaired = manually_extract_components("", rc_data, question_data)
+    repaired.update(record)
+    return repaired
 
 if __name__ == "__main__":
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description='Process RC Exam Packs HTML files with Mistral 7B sequentially.')
-    parser.add_argument('--start', type=int, help='Starting index (0-based) of files to process')
-    parser.add_argument('--end', type=int, help='Ending index (0-based) of files to process')
-    parser.add_argument('--limit', type=int, help='Limit number of files to process')
-    parser.add_argument('--test', action='store_true', help='Run in test mode with limited files')
-    
-    args = parser.parse_args()
-    
-    # Process files
-    process_all_files_sequentially(
-        start_idx=args.start,
-        end_idx=args.end,
-        limit=args.limit,
-        test_mode=args.test
-    ) 
\ No newline at end of file
+    # Runs the "rc_exampacks" dataset of runPipeline.py, which takes the same options
+    from runPipeline import main
+    main("rc_exampacks", description='Process RC Exam Packs HTML files with Mistral 7B.')
@@ -1,9 +1,9 @@
 import os
 import json
 import glob
-from bs4 import BeautifulSoup
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import torch
+from pipeline.html_parsing import parse_html
 
 # Constants
 HTML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/html')
@@ -19,7 +19,7 @@ def load_html_file(file_path):
         content = f.read()
     
     # Parse HTML
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = parse_html(content)
     
     # Extract question number from filename
     question_number = os.path.basename(file_path).replace('question_', '').replace('.html', '')
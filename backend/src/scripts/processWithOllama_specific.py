@@ -2,24 +2,34 @@ import os
 import json
 import glob
 import requests
-from bs4 import BeautifulSoup
+from pipeline.ollama_client import OllamaClient
+from pipeline.response_cache import ResponseCache
+from pipeline.results_stream import ResultsStream, compact_results
+from pipeline.html_parsing import parse_html
 
 # Constants
 HTML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/html_specific')
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/processed_specific')
 OLLAMA_API_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma:7b"  # Using the Gemma 7B model
+OLLAMA_POOL_SIZE = 4  # Keep-alive connections held open to Ollama
+CACHE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/ollama_response_cache.sqlite')  # Shared by all Ollama scripts
+ALL_RESULTS_FILE = os.path.join(OUTPUT_DIR, "all_processed_questions.json")  # Compacted from the stream at the end of a run
+RESULTS_STREAM_FILE = os.path.join(OUTPUT_DIR, "all_processed_questions.jsonl")  # Appended to as each result is produced
 
 # Create output directory if it doesn't exist
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Shared keep-alive client so every question and retry reuses pooled connections
+ollama_client = OllamaClient(OLLAMA_API_URL, pool_size=OLLAMA_POOL_SIZE, timeout=None)
+
 def load_html_file(file_path):
     """Load and parse HTML file"""
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
     # Parse HTML
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = parse_html(content)
     
     # Extract question number from filename
     question_number = os.path.basename(file_path).replace('question_', '').replace('.html', '')
@@ -93,16 +103,8 @@ def load_html_file(file_path):
         "html_content": html_content
     }
 
-def extract_text_from_html(html_content):
-    """Extract plain text from HTML content"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    return soup.get_text(separator=' ', strip=True)
-
 def generate_response(question_data):
     """Generate response using Ollama API"""
-    # Extract plain text to help the model
-    plain_text = extract_text_from_html(question_data["html_content"])
-    
     # Create prompt for the model with improved JSON instructions
     prompt = f"""
 You are an expert GMAT tutor. I will give you a GMAT question with multiple choice options and statistics. Your task is to:
@@ -147,9 +149,8 @@ Remember, your entire response must be a valid JSON object with the structure sh
 
     # Send request to Ollama API
     try:
-        response = requests.post(
-            OLLAMA_API_URL,
-            json={
+        result = ollama_client.generate(
+            {
                 "model": MODEL_NAME,
                 "prompt": prompt,
                 "stream": False,
@@ -161,9 +162,6 @@ Remember, your entire response must be a valid JSON object with the structure sh
             }
         )
         
-        response.raise_for_status()
-        result = response.json()
-        
         # Extract the response text
         response_text = result.get("response", "")
         
@@ -278,6 +276,7 @@ def process_all_files():
     html_files = glob.glob(os.path.join(HTML_DIR, 'question_*.html'))
     
     results = []
+    results_stream = ResultsStream(RESULTS_STREAM_FILE)
     
     for file_path in html_files:
         print(f"Processing {os.path.basename(file_path)}...")
@@ -304,17 +303,20 @@ def process_all_files():
             json.dump(result, f, indent=2, ensure_ascii=False)
         
         results.append(result)
+        results_stream.append(result)
         print(f"Processed and saved {output_file}")
     
+    results_stream.close()
+    
     # Save all results
-    all_results_file = os.path.join(OUTPUT_DIR, "all_processed_questions.json")
-    with open(all_results_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    compact_results(RESULTS_STREAM_FILE, ALL_RESULTS_FILE)
     
-    print(f"All results saved to {all_results_file}")
+    print(f"All results saved to {ALL_RESULTS_FILE}")
+    ollama_client.print_summary()
     return results
 
 if __name__ == "__main__":
     print("Starting improved Gemma processing with Ollama for specific HTML files...")
+    ollama_client.use_cache(ResponseCache(CACHE_FILE))
     process_all_files()
     print("Processing complete!") 
\ No newline at end of file
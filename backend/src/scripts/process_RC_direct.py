@@ -1,37 +1,30 @@
 #!/usr/bin/env python3
 import os
-import json
-import glob
-import requests
-import time
-import random
-import argparse
 import re
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from pipeline.stage_timing import StageTimings
+from pipeline.html_parsing import parse_html
 
 # Constants for RC Exam Packs Questions - Sequential Version
 HTML_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/html_rc_exampacks')
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/processed_rc_exampacks_direct_extraction')
 CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/rc_exampacks_direct_extraction_checkpoint.json')
 ERROR_LOG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/rc_exampacks_direct_extraction_errors.log')
-BATCH_SIZE = 10  # Process in batches for checkpoint frequency
-MAX_RETRIES = 3  # Maximum retries for extraction
-RETRY_DELAY = 3  # Delay between retries in seconds
-MIN_REQUEST_DELAY = 0.2  # Minimum delay between files
-MAX_REQUEST_DELAY = 0.8  # Maximum delay between files
-TEST_MODE_LIMIT = 3  # Limit to 3 RC passages for initial testing
+TIMINGS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/rc_exampacks_direct_extraction_timings.jsonl')  # Per-item stage timings, appended every run
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports/rc_exampacks_direct_extraction_manifest.jsonl')  # Content hash and parser version of every checkpointed HTML file
+PARSER_VERSION = 1  # Bump when load_html_file changes what it extracts; checkpointed files are then processed again
 
-# Create output directory if it doesn't exist
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Wall time of file_read and html_parse, recorded into the pipeline engine's report
+stage_timings = StageTimings()
 
-def load_html_file(file_path):
-    """Load and parse HTML file with RC structure (passage + multiple questions)"""
+def load_html_file(file_path, default_source=''):
+    """Load and parse HTML file with RC structure (passage + multiple questions); default_source fills in a missing Source"""
+    clock = stage_timings.clock()
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
+    clock.lap("file_read")
     
     # Parse HTML
-    soup = BeautifulSoup(content, 'html.parser')
+    soup = parse_html(content)
     
     # Extract RC number from filename
     rc_number = os.path.basename(file_path).replace('rc_', '').replace('.html', '')
@@ -41,7 +34,7 @@ def load_html_file(file_path):
     
     # Extract metadata
     metadata = {
-        'source': '',
+        'source': default_source,
         'type': '',
         'difficulty_level': '',
         'topic': '',
@@ -100,7 +93,7 @@ def load_html_file(file_path):
                 if content:
                     next_elements.append(content)
             current_element = current_element.next_sibling
-            
+        
         if next_elements:
             # Get the text after the timer placeholder
             question_text = " ".join(next_elements)
@@ -301,6 +294,7 @@ def load_html_file(file_path):
     
     # Print a summary of what was found
     print(f"Found {len(questions)} questions for RC {rc_number}")
+    clock.lap("html_parse")
     return {
         "rc_number": rc_number,
         "source_url": source_url,
@@ -309,273 +303,22 @@ def load_html_file(file_path):
         "questions": questions
     }
 
-def save_result(file_path, result):
-    """Save result to a JSON file"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
-    print(f"Saved result to {file_path}")
-
-def load_checkpoint():
-    """Load checkpoint file if it exists"""
-    try:
-        if os.path.exists(CHECKPOINT_FILE):
-            with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"processed_files": [], "processed_questions": []}
-    except Exception as e:
-        print(f"Error loading checkpoint: {str(e)}")
-        return {"processed_files": [], "processed_questions": []}
-
-def save_checkpoint(processed_files, processed_questions):
-    """Save checkpoint information"""
-    try:
-        with open(CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
-            json.dump({
-                "processed_files": processed_files,
-                "processed_questions": processed_questions
-            }, f, indent=2)
-    except Exception as e:
-        print(f"Error saving checkpoint: {str(e)}")
-
-def process_rc_questions_sequentially(rc_data, processed_questions):
-    """Process all questions in an RC passage sequentially"""
-    results = []
-    rc_number = rc_data["rc_number"]
-    
-    for question_data in rc_data["questions"]:
-        question_number = question_data["question_number"]
-        question_id = f"{rc_number}_{question_number}"
-        
-        # Check if already processed
-        if question_id in processed_questions:
-            print(f"Skipping already processed question: RC {rc_number} Question {question_number}")
-            results.append({
-                "status": "skipped", 
-                "rc_number": rc_number,
-                "question_number": question_number,
-                "question_id": question_id,
-                "processing_time": 0
-            })
-            continue
-        
-        print(f"\nProcessing RC {rc_number} Question {question_number}")
-        start_time = time.time()
-        
-        try:
-            # Create the output structure
-            result = {
-                "passage_text": rc_data["passage_text"],
-                "question_text": question_data["question_text"],
-                "options": question_data["options"],
-                "correct_answer": question_data["correct_answer"],
-                "question_type": "Reading Comprehension",
-                "rc_number": rc_number,
-                "question_number": question_number,
-                "answer_stats": question_data["answer_stats"],
-                "session_stats": question_data["session_stats"],
-                "metadata": rc_data["metadata"]
-            }
-            
-            # Save result - use the format rc_[number]_[question_number].json
-            output_file = os.path.join(OUTPUT_DIR, f"rc_{rc_number}_{question_number}.json")
-            save_result(output_file, result)
-            print(f"Saved processed result to {output_file}")
-            
-            # Calculate processing time
-            processing_time = time.time() - start_time
-            print(f"Processing time for RC {rc_number} Question {question_number}: {processing_time:.2f} seconds")
-            
-            results.append({
-                "status": "processed", 
-                "rc_number": rc_number,
-                "question_number": question_number,
-                "question_id": question_id,
-                "processing_time": processing_time
-            })
-            
-            # Add a small delay between questions to avoid overloading the system
-            if question_number < len(rc_data["questions"]):  # Don't delay after the last question
-                delay = random.uniform(MIN_REQUEST_DELAY, MAX_REQUEST_DELAY)
-                print(f"Waiting {delay:.2f} seconds before next question...")
-                time.sleep(delay)
-        
-        except Exception as e:
-            processing_time = time.time() - start_time
-            print(f"Processing time for RC {rc_number} Question {question_number} (error): {processing_time:.2f} seconds")
-            print(f"Error processing RC {rc_number} Question {question_number}: {str(e)}")
-            with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"{timestamp} - RC {rc_number} Question {question_number}: {str(e)}\n")
-            results.append({
-                "status": "error", 
-                "rc_number": rc_number,
-                "question_number": question_number,
-                "question_id": question_id,
-                "processing_time": processing_time
-            })
-    
-    return results
-
-def process_file_sequentially(html_file, processed_files, processed_questions):
-    """Process a single RC HTML file and all its questions sequentially"""
-    file_name = os.path.basename(html_file)
-    
-    # Check if already processed completely
-    if file_name in processed_files:
-        print(f"Skipping already processed file: {file_name}")
-        return {
-            "status": "skipped", 
-            "file_name": file_name,
-            "processing_time": 0,
-            "question_results": []
-        }
-    
-    print(f"\nProcessing file: {file_name}")
-    start_time = time.time()
-    
-    try:
-        # Load and parse HTML file
-        rc_data = load_html_file(html_file)
-        
-        # Process all questions in this RC passage
-        question_results = process_rc_questions_sequentially(rc_data, processed_questions)
-        
-        # Calculate total processing time
-        processing_time = time.time() - start_time
-        print(f"Total processing time for {file_name}: {processing_time:.2f} seconds")
-        
-        return {
-            "status": "processed", 
-            "file_name": file_name,
-            "processing_time": processing_time,
-            "question_results": question_results
-        }
-    
-    except Exception as e:
-        processing_time = time.time() - start_time
-        print(f"Processing time for {file_name} (error): {processing_time:.2f} seconds")
-        print(f"Error processing file {file_name}: {str(e)}")
-        with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"{timestamp} - {file_name}: {str(e)}\n")
-        return {
-            "status": "error", 
-            "file_name": file_name,
-            "processing_time": processing_time,
-            "question_results": []
-        }
-
-def process_all_files_sequentially(start_idx=None, end_idx=None, limit=None, test_mode=False):
-    """Process all RC HTML files in the directory sequentially (one at a time)"""
-    # Get list of all HTML files
-    html_files = sorted(glob.glob(os.path.join(HTML_DIR, "*.html")))
-    print(f"Found {len(html_files)} RC HTML files to process")
-    
-    # Load checkpoint
-    checkpoint = load_checkpoint()
-    processed_files = checkpoint.get("processed_files", [])
-    processed_questions = checkpoint.get("processed_questions", [])
-    print(f"Found {len(processed_files)} already processed files in checkpoint")
-    print(f"Found {len(processed_questions)} already processed questions in checkpoint")
-    
-    # Filter files based on parameters
-    if start_idx is not None and end_idx is not None:
-        html_files = html_files[start_idx:end_idx+1]
-        print(f"Processing files from index {start_idx} to {end_idx} ({len(html_files)} files)")
-    elif start_idx is not None:
-        html_files = html_files[start_idx:]
-        print(f"Processing files from index {start_idx} onwards ({len(html_files)} files)")
-    elif limit is not None:
-        html_files = html_files[:limit]
-        print(f"Processing first {limit} files")
-    elif test_mode:
-        html_files = html_files[:TEST_MODE_LIMIT]
-        print(f"TEST MODE: Processing first {TEST_MODE_LIMIT} files")
-    
-    # Process files one by one
-    num_files_processed = 0
-    num_files_skipped = 0
-    num_files_errors = 0
-    num_questions_processed = 0
-    num_questions_skipped = 0
-    num_questions_errors = 0
-    total_processing_time = 0
-    processing_times = []
-    
-    for i, html_file in enumerate(html_files):
-        print(f"Processing file {i+1}/{len(html_files)}")
-        result = process_file_sequentially(html_file, processed_files, processed_questions)
-        
-        if result["status"] == "processed":
-            num_files_processed += 1
-            file_name = result["file_name"]
-            
-            # Add to processed files only if all questions were successfully processed
-            if not any(q["status"] == "error" for q in result["question_results"]):
-                processed_files.append(file_name)
-            
-            # Update question processing stats
-            for q_result in result["question_results"]:
-                if q_result["status"] == "processed":
-                    num_questions_processed += 1
-                    processed_questions.append(q_result["question_id"])
-                elif q_result["status"] == "error":
-                    num_questions_errors += 1
-                elif q_result["status"] == "skipped":
-                    num_questions_skipped += 1
-            
-            # Save checkpoint after each file
-            save_checkpoint(processed_files, processed_questions)
-            
-            # Track processing time
-            if result["processing_time"] > 0:
-                total_processing_time += result["processing_time"]
-                processing_times.append(result["processing_time"])
-        elif result["status"] == "error":
-            num_files_errors += 1
-        elif result["status"] == "skipped":
-            num_files_skipped += 1
-        
-        # Add a small delay between files to avoid overloading the system
-        if i < len(html_files) - 1:  # Don't delay after the last file
-            delay = random.uniform(MIN_REQUEST_DELAY, MAX_REQUEST_DELAY)
-            print(f"Waiting {delay:.2f} seconds before next file...")
-            time.sleep(delay)
-    
-    print(f"\nProcessing complete!")
-    print(f"Files processed: {num_files_processed}")
-    print(f"Files skipped: {num_files_skipped}")
-    print(f"Files with errors: {num_files_errors}")
-    print(f"Total files considered: {len(html_files)}")
-    print(f"\nQuestions processed: {num_questions_processed}")
-    print(f"Questions skipped: {num_questions_skipped}")
-    print(f"Questions with errors: {num_questions_errors}")
-    
-    # Print timing statistics
-    if processing_times:
-        avg_time = total_processing_time / len(processing_times)
-        min_time = min(processing_times) if processing_times else 0
-        max_time = max(processing_times) if processing_times else 0
-        print(f"\nTiming Statistics:")
-        print(f"Average processing time: {avg_time:.2f} seconds per RC file")
-        print(f"Fastest processing time: {min_time:.2f} seconds")
-        print(f"Slowest processing time: {max_time:.2f} seconds")
-        print(f"Total processing time: {total_processing_time:.2f} seconds")
+def build_result(rc_data, question_data):
+    """Build the output record for one RC question straight from the extracted HTML data"""
+    return {
+        "passage_text": rc_data["passage_text"],
+        "question_text": question_data["question_text"],
+        "options": question_data["options"],
+        "correct_answer": question_data["correct_answer"],
+        "question_type": "Reading Comprehension",
+        "rc_number": rc_data["rc_number"],
+        "question_number": question_data["question_number"],
+        "answer_stats": question_data["answer_stats"],
+        "session_stats": question_data["session_stats"],
+        "metadata": rc_data["metadata"]
+    }
 
 if __name__ == "__main__":
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description='Process RC Exam Packs HTML files with direct extraction.')
-    parser.add_argument('--start', type=int, help='Starting index (0-based) of files to process')
-    parser.add_argument('--end', type=int, help='Ending index (0-based) of files to process')
-    parser.add_argument('--limit', type=int, help='Limit number of files to process')
-    parser.add_argument('--test', action='store_true', help='Run in test mode with limited files')
-    
-    args = parser.parse_args()
-    
-    # Process files
-    process_all_files_sequentially(
-        start_idx=args.start,
-        end_idx=args.end,
-        limit=args.limit,
-        test_mode=args.test
-    ) 
\ No newline at end of file
+    # Runs the "rc_exampacks_direct" dataset of runPipeline.py, which takes the same options
+    from runPipeline import main
+    main("rc_exampacks_direct", description='Process RC Exam Packs HTML files with direct extraction.')
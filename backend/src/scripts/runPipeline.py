@@ -0,0 +1,331 @@
+import os
+import time
+import argparse
+import functools
+import importlib
+from pipeline.engine import Dataset, PipelineEngine, TIERED_MODES
+from pipeline.ollama_client import OllamaClient, DEFAULT_POOL_SIZE
+from pipeline.response_cache import ResponseCache
+from pipeline.adaptive_concurrency import AdaptiveConcurrency
+from pipeline.html_parsing import PARSER_BACKENDS, DEFAULT_PARSER_BACKEND, set_parser_backend
+from pipeline.prompt_templates import PromptTemplates, PROMPT_MODES
+from pipeline.near_duplicates import NearDuplicateResults
+from pipeline.passage_store import PassageStore
+from pipeline.results_store import ResultsStore
+
+# Constants
+OLLAMA_API_URL = "http://localhost:11434/api/generate"
+EXPORTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'exports')
+CACHE_FILE = os.path.join(EXPORTS_DIR, 'ollama_response_cache.sqlite')  # Shared by all Ollama scripts
+NEAR_DUPLICATES_FILE = os.path.join(EXPORTS_DIR, 'near_duplicate_clusters.json')  # Written by findNearDuplicates.py
+NEAR_DUPLICATE_RESULTS_FILE = os.path.join(EXPORTS_DIR, 'near_duplicate_results.jsonl')  # One response per cluster, shared by all datasets
+RESULTS_DB_FILE = os.path.join(EXPORTS_DIR, 'pipeline_results.sqlite')  # --results-db sink for all datasets; exportResults.py writes the JSON files
+TEST_MODE_LIMIT = 3  # Files processed with --test
+
+# Generation options and timeouts, as used by the per-dataset scripts
+PS_OPTIONS = {"temperature": 0.1, "top_p": 0.9, "num_predict": 2048}
+PS_TIMEOUT = 90
+CR_RC_OPTIONS = {"temperature": 0.05, "top_p": 0.95, "num_predict": 1500}
+CR_RC_TIMEOUT = 60
+
+def problem_solving_dataset(name, module):
+    """One LLM call per question file, saved as processed_<n>.json and streamed to all_processed_questions.jsonl"""
+    return Dataset(
+        name=name,
+        html_dir=module.HTML_DIR,
+        output_dir=module.OUTPUT_DIR,
+        checkpoint_file=module.CHECKPOINT_FILE,
+        error_log_file=module.ERROR_LOG_FILE,
+        file_pattern="question_*.html",
+        load=module.load_html_file,
+        build_prompt=module.build_prompt,
+        build_compact_prompt=module.build_compact_prompt,
+        prompt_templates=PromptTemplates(module.PROMPT_TEMPLATE),
+        complete=module.complete_parsed_response,
+        options=PS_OPTIONS,
+        timeout=PS_TIMEOUT,
+        schema=module.RESPONSE_SCHEMA,
+        required_keys=module.REQUIRED_KEYS,
+        wrap=lambda question_data, analysis: {
+            "question_number": question_data["question_number"],
+            "source_url": question_data["source_url"],
+            "metadata": question_data["metadata"],
+            "analysis": analysis
+        },
+        output_name=lambda file_name, question_data: f"processed_{question_data['question_number']}.json",
+        results_stream_file=module.RESULTS_STREAM_FILE,
+        legacy_results_file=module.ALL_RESULTS_FILE,
+        timings=module.stage_timings,
+        timings_file=module.TIMINGS_FILE,
+        dedup_text=lambda question_data: question_data["question_text"],
+        dedup_group="problem_solving",
+        manifest_file=module.MANIFEST_FILE,
+        parser_version=module.PARSER_VERSION,
+        prompt_version=module.PROMPT_VERSION
+    )
+
+def official_guide_dataset(name, module):
+    """The OG Problem Solving export, which has the same HTML layout as html_specific"""
+    dataset = problem_solving_dataset(name, module)
+    dataset.html_dir = os.path.join(EXPORTS_DIR, 'html_specific_og')
+    dataset.output_dir = os.path.join(EXPORTS_DIR, 'processed_specific_og_mistral7b')
+    dataset.checkpoint_file = os.path.join(EXPORTS_DIR, 'mistral_og_checkpoint.json')
+    dataset.error_log_file = os.path.join(EXPORTS_DIR, 'mistral_og_errors.log')
+    dataset.manifest_file = os.path.join(EXPORTS_DIR, 'mistral_og_manifest.jsonl')
+    dataset.timings_file = os.path.join(EXPORTS_DIR, 'mistral_og_timings.jsonl')
+    dataset.results_stream_file = os.path.join(dataset.output_dir, 'all_processed_questions.jsonl')
+    dataset.legacy_results_file = None
+    return dataset
+
+def critical_reasoning_dataset(name, module):
+    """One LLM call per CR question file, saved as processed_<file name>.json; explanation-only for questions that split cleanly"""
+    return Dataset(
+        name=name,
+        html_dir=module.HTML_DIR,
+        output_dir=module.OUTPUT_DIR,
+        checkpoint_file=module.CHECKPOINT_FILE,
+        error_log_file=module.ERROR_LOG_FILE,
+        load=module.load_html_file,
+        build_prompt=module.build_prompt,
+        build_compact_prompt=module.build_compact_prompt,
+        prompt_templates=PromptTemplates(module.PROMPT_TEMPLATE),
+        complete=module.complete_parsed_response,
+        repair=module.repair_record,
+        options=CR_RC_OPTIONS,
+        timeout=CR_RC_TIMEOUT,
+        schema=module.RESPONSE_SCHEMA,
+        required_keys=module.REQUIRED_KEYS,
+        extract=module.split_question,
+        build_explanation_prompt=lambda structure, question_data: module.build_explanation_prompt(structure),
+        explanation_fields=module.EXPLANATION_FIELDS,
+        output_name=lambda file_name, question_data: f"processed_{file_name.replace('.html', '.json')}",
+        timings=module.stage_timings,
+        timings_file=module.TIMINGS_FILE,
+        dedup_text=lambda question_data: question_data["question_text"],
+        dedup_group="critical_reasoning",
+        manifest_file=module.MANIFEST_FILE,
+        parser_version=module.PARSER_VERSION,
+        prompt_version=module.PROMPT_VERSION,
+        range_over_all_files=True
+    )
+
+def split_passage(rc_data):
+    """Turn an RC passage into one (rc_data, question_data) item per question"""
+    return [(rc_data, question_data) for question_data in rc_data["questions"]]
+
+def rc_question_id(item):
+    rc_data, question_data = item
+    return f"{rc_data['rc_number']}_{question_data['question_number']}"
+
+def rc_output_name(file_name, item):
+    rc_data, question_data = item
+    return f"rc_{rc_data['rc_number']}_{question_data['question_number']}.json"
+
+def rc_question_number(item):
+    rc_data, question_data = item
+    return question_data["question_number"]
+
+def passage_items(items):
+    """Split the items of one passage back into its rc_data and its questions"""
+    return items[0][0], [question_data for _, question_data in items]
+
+def rc_batch_records(module):
+    """batch_records for an RC script: the records of its passage-batched response, by item id"""
+    def batch_records(parsed_json, items):
+        rc_data, questions = passage_items(items)
+        records = module.passage_batch_records(parsed_json, rc_data, questions)
+        return {f"{rc_data['rc_number']}_{question_number}": record for question_number, record in records.items()}
+    return batch_records
+
+def reading_comprehension_dataset(name, module):
+    """One LLM call per RC question, saved as rc_<rc>_<question>.json, with the passage-batched, passage-prefix and tiered stages"""
+    return Dataset(
+        name=name,
+        html_dir=module.HTML_DIR,
+        output_dir=module.OUTPUT_DIR,
+        checkpoint_file=module.CHECKPOINT_FILE,
+        error_log_file=module.ERROR_LOG_FILE,
+        load=module.load_html_file,
+        split=split_passage,
+        item_id=rc_question_id,
+        build_prompt=lambda item: module.build_question_prompt(*item),
+        build_compact_prompt=lambda item: module.build_compact_question_prompt(*item),
+        prompt_templates=PromptTemplates(module.PROMPT_TEMPLATE),
+        complete=lambda parsed_json, item: module.build_question_record(parsed_json, *item),
+        repair=lambda record, item: module.repair_record(record, *item),
+        options=CR_RC_OPTIONS,
+        timeout=CR_RC_TIMEOUT,
+        schema=module.RESPONSE_SCHEMA,
+        required_keys=module.REQUIRED_KEYS,
+        extract=lambda item: module.extract_question(*item),
+        build_explanation_prompt=lambda fields, item: module.build_explanation_prompt(*item),
+        explanation_fields=module.EXPLANATION_FIELDS,
+        explanation_options=dict(CR_RC_OPTIONS, num_predict=module.PASSAGE_BATCH_NUM_PREDICT),
+        build_batch_prompt=lambda items: module.build_passage_batch_prompt(*passage_items(items)),
+        batch_records=rc_batch_records(module),
+        batch_schema=module.PASSAGE_RESPONSE_SCHEMA,
+        batch_num_predict=module.PASSAGE_BATCH_NUM_PREDICT,
+        build_prefix_prompt=lambda item: module.build_passage_prefix_prompt(item[0]),
+        build_continuation_prompt=lambda item: module.build_question_section(item[1]),
+        build_compact_continuation_prompt=lambda item: module.build_compact_question_section(item[1]),
+        output_name=rc_output_name,
+        question_number=rc_question_number,
+        timings=module.stage_timings,
+        timings_file=module.TIMINGS_FILE,
+        manifest_file=module.MANIFEST_FILE,
+        parser_version=module.PARSER_VERSION,
+        prompt_version=module.PROMPT_VERSION,
+        range_over_all_files=True
+    )
+
+def reading_comprehension_direct_dataset(name, module):
+    """RC questions taken straight from the HTML without a model, saved as rc_<rc>_<question>.json"""
+    return Dataset(
+        name=name,
+        html_dir=module.HTML_DIR,
+        output_dir=module.OUTPUT_DIR,
+        checkpoint_file=module.CHECKPOINT_FILE,
+        error_log_file=module.ERROR_LOG_FILE,
+        load=module.load_html_file,
+        split=split_passage,
+        item_id=rc_question_id,
+        direct=lambda item: module.build_result(*item),
+        output_name=rc_output_name,
+        question_number=rc_question_number,
+        timings=module.stage_timings,
+        timings_file=module.TIMINGS_FILE,
+        manifest_file=module.MANIFEST_FILE,
+        parser_version=module.PARSER_VERSION,
+        range_over_all_files=True
+    )
+
+# Dataset name -> (script module providing the constants and stage functions, dataset builder)
+DATASETS = {
+    "specific": ("processWithMistral_sequential", problem_solving_dataset),
+    "specific_og": ("processWithMistral_sequential", official_guide_dataset),
+    "specific_exampacks": ("processExamPacksWithMistral", problem_solving_dataset),
+    "cr_gmatprep": ("processCRGMATprepWithMistralSequential", critical_reasoning_dataset),
+    "cr_ogquestions": ("processCROGQuestionsWithMistralSequential", critical_reasoning_dataset),
+    "rc_exampacks": ("processRCExamPacksWithMistralSequential", reading_comprehension_dataset),
+    "rc_exampacks_direct": ("process_RC_direct", reading_comprehension_direct_dataset),
+    "rc_gmatprep_direct": ("process_RC_gmatprep_direct", reading_comprehension_direct_dataset),
+    "rc_ogquestions_direct": ("process_RC_ogquestions_direct", reading_comprehension_direct_dataset),
+}
+
+def build_dataset(name):
+    """Import the dataset's script module and build its Dataset"""
+    module_name, builder = DATASETS[name]
+    return builder(name, importlib.import_module(module_name))
+
+def main(dataset_name=None, description=None):
+    """Parse the command line and run one dataset; the per-dataset scripts call this with their own dataset"""
+    parser = argparse.ArgumentParser(description=description or 'Run any exported question set through the shared source -> parser -> LLM -> validator -> sink pipeline.')
+    if dataset_name is None:
+        parser.add_argument('--dataset', choices=sorted(DATASETS), help='Dataset to process')
+        parser.add_argument('--list', action='store_true', help='List the datasets and the scripts they are built from')
+    parser.add_argument('--start', type=int, default=None, help='Start index (0-based) for processing files; the CR and RC datasets count checkpointed files too')
+    parser.add_argument('--end', type=int, default=None, help='End index (0-based) for processing files, exclusive; inclusive and counting checkpointed files for the CR and RC datasets')
+    parser.add_argument('--limit', type=int, default=None, help='Limit the number of files to process')
+    parser.add_argument('--test', action='store_true', help=f'Run in test mode with the first {TEST_MODE_LIMIT} files')
+    parser.add_argument('--concurrency', type=int, default=1, help='Maximum number of Ollama requests in flight; the limit starts at 1 and adapts to latency (match OLLAMA_NUM_PARALLEL on the server)')
+    parser.add_argument('--endpoints', nargs='+', default=[OLLAMA_API_URL], help='Ollama servers to spread requests over, as host:port or full /api/generate URLs (default: OLLAMA_API_URL)')
+    parser.add_argument('--pool-size', type=int, default=DEFAULT_POOL_SIZE, help='Keep-alive connections to hold open to Ollama')
+    parser.add_argument('--no-cache', action='store_true', help='Always call Ollama and do not read or write the response cache')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached responses but store the new ones')
+    parser.add_argument('--stream', action='store_true', help='Stream generations and stop each one as soon as its JSON object is complete')
+    parser.add_argument('--structured', action='store_true', help='Constrain Ollama output to the response JSON schema and retry only on schema violations')
+    parser.add_argument('--html-parser', choices=PARSER_BACKENDS, default=DEFAULT_PARSER_BACKEND, help='BeautifulSoup tree builder used to parse the exported HTML')
+    parser.add_argument('--parallel', action='store_true', help='Load and parse the HTML files in a process pool')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for --parallel (default: CPU count)')
+    parser.add_argument('--tiered', choices=TIERED_MODES, help='Extract from the HTML first; items it answers completely are saved as extracted (answers) or sent to the model with an explanation-only prompt (explanations)')
+    parser.add_argument('--explanation-only', action='store_true', help='Same as --tiered explanations: only ask for what the HTML cannot give when the question structure is parsed')
+    parser.add_argument('--batch-passage', action='store_true', help='RC: ask for all questions of a passage in one Ollama call, retrying per question only on validation failures')
+    parser.add_argument('--passage-prefix', action='store_true', help='RC: evaluate each passage once and send its questions as continuations of the returned Ollama context')
+    parser.add_argument('--dedup', action='store_true', help='Generate one response per near-duplicate cluster (see findNearDuplicates.py) and reuse it for the other members')
+    parser.add_argument('--shared-passages', action='store_true', help='RC datasets: store each passage once under passages/ and reference it by content hash from the question files')
+    parser.add_argument('--results-db', action='store_true', help=f'Write results, LLM attempts and errors to {os.path.basename(RESULTS_DB_FILE)} instead of one JSON file per item (exportResults.py writes the JSON files)')
+    parser.add_argument('--prompt', choices=PROMPT_MODES, default=None, help='Prompt template: full, compact, or ab to split items between both (default: the dataset script\'s PROMPT_TEMPLATE)')
+    args = parser.parse_args()
+    
+    if dataset_name is None:
+        if args.list:
+            for name in sorted(DATASETS):
+                print(f"{name:<24}{DATASETS[name][0]}.py")
+            raise SystemExit(0)
+        if args.dataset is None:
+            parser.error("--dataset is required (use --list to see the choices)")
+        dataset_name = args.dataset
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.explanation_only and args.tiered not in (None, "explanations"):
+        parser.error("--explanation-only is --tiered explanations; leave out one of them")
+    try:
+        set_parser_backend(args.html_parser)
+    except ValueError as e:
+        parser.error(str(e))
+    limit = args.limit
+    if args.test and limit is None:
+        limit = TEST_MODE_LIMIT
+        print(f"TEST MODE: Processing first {TEST_MODE_LIMIT} files")
+    
+    dataset = build_dataset(dataset_name)
+    if args.prompt is not None:
+        dataset.prompt_templates.mode = args.prompt
+    client = None
+    if dataset.uses_llm:
+        # Every in-flight request needs its own pooled connection
+        client = OllamaClient(OLLAMA_API_URL, pool_size=max(args.pool_size, args.concurrency))
+        if not args.no_cache:
+            client.use_cache(ResponseCache(CACHE_FILE), refresh=args.refresh)
+        client.use_streaming(args.stream)
+        client.use_endpoints(args.endpoints)
+        client.use_concurrency_controller(AdaptiveConcurrency(max_limit=args.concurrency))
+    
+    print(f"Starting pipeline for {dataset.name}...")
+    if args.start is not None or args.end is not None or limit is not None:
+        print(f"Processing with custom range - Start: {args.start}, End: {args.end}, Limit: {limit}")
+    
+    start_time = time.time()
+    engine = PipelineEngine(dataset, client=client, concurrency=args.concurrency, structured=args.structured)
+    try:
+        if args.tiered or args.explanation_only:
+            engine.use_tiered(args.tiered or "explanations")
+        if args.batch_passage:
+            engine.use_passage_batching()
+        if args.passage_prefix:
+            engine.use_passage_prefix()
+    except ValueError as e:
+        parser.error(str(e))
+    if args.parallel or args.workers is not None:
+        # Workers build the dataset again by name, since its stage functions cannot be pickled
+        engine.use_process_pool(args.workers or os.cpu_count() or 1, functools.partial(build_dataset, dataset_name))
+    if args.dedup:
+        if dataset.dedup_text is None:
+            parser.error(f"--dedup is not supported for {dataset.name}; near-duplicates are only indexed for one-question-per-file datasets")
+        if not os.path.exists(NEAR_DUPLICATES_FILE):
+            parser.error(f"{NEAR_DUPLICATES_FILE} not found; run findNearDuplicates.py first")
+        engine.use_near_duplicates(NearDuplicateResults(NEAR_DUPLICATES_FILE, NEAR_DUPLICATE_RESULTS_FILE))
+    if args.shared_passages:
+        if dataset.split is not split_passage:
+            parser.error(f"--shared-passages only applies to the RC datasets, not {dataset.name}")
+        engine.use_passage_store(PassageStore(dataset.output_dir))
+    results_store = None
+    if args.results_db:
+        if args.shared_passages:
+            parser.error("--results-db already stores each RC passage once; leave out --shared-passages")
+        results_store = ResultsStore(RESULTS_DB_FILE, dataset.name)
+        engine.use_results_store(results_store)
+    try:
+        engine.run(args.start, args.end, limit)
+    finally:
+        if client is not None:
+            client.close()
+        if results_store is not None:
+            results_store.close()
+    execution_time = time.time() - start_time
+    hours, remainder = divmod(execution_time, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    print(f"Processing complete! Total execution time: {int(hours)}h {int(minutes)}m {int(seconds)}s")
+
+if __name__ == "__main__":
+    main()